@@ -0,0 +1,938 @@
+import argparse
+import base64
+import email.parser
+import email.policy
+import glob
+import hashlib
+import json
+import os
+import queue
+import re
+import struct
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import script2workflow
+
+# --- CONSTANTS ---
+SIM_HOST = "127.0.0.1"
+SIM_PORT = 8188
+SIM_VRAM_GB = 24.0
+SIM_RAM_GB = 64.0
+SIM_TIME_SCALE = 0.01
+SIM_OUTPUT_DIR = "sim_output"
+SIM_INPUT_DIR = "sim_input"
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Simulated model sizes (GB) by GGUF quantization; baked fp8 UNets use the default
+SIM_UNET_GB_BY_QUANT = {
+    "F32": 57.2,
+    "BF16": 28.6,
+    "F16": 28.6,
+    "Q8_0": 15.4,
+    "Q6_K": 12.0,
+    "Q5_K_M": 10.8,
+    "Q5_K_S": 10.1,
+    "Q5_1": 10.8,
+    "Q5_0": 10.1,
+    "Q4_K_M": 9.6,
+    "Q4_K_S": 8.8,
+    "Q4_1": 9.0,
+    "Q4_0": 8.5,
+    "Q3_K_L": 7.8,
+    "Q3_K_M": 7.2,
+    "Q3_K_S": 6.5,
+    "Q2_K": 5.3,
+}
+SIM_UNET_GB_DEFAULT = 14.3
+SIM_TEXT_ENCODER_GB = 5.0
+SIM_UPSCALE_GB = 2.0
+
+# Simulated durations (seconds, before --time-scale)
+SIM_STEP_SECONDS = 6.0
+SIM_REFERENCE_SIZE = (1280, 720, 81)
+SIM_NODE_SECONDS = {
+    "UnetLoaderGGUF": 20.0,
+    "UNETLoader": 15.0,
+    "CLIPLoaderGGUF": 10.0,
+    "VAELoader": 2.0,
+    "CLIPTextEncode": 1.5,
+    "UpscaleModelLoader": 1.0,
+    "VHS_VideoCombine": 3.0,
+    "SaveImage": 0.5,
+    "SaveLatent": 1.0,
+    "LoadLatent": 0.5,
+    "ModelSave": 60.0,
+}
+SIM_SECONDS_PER_FRAME = {
+    "VAEDecode": 0.35,
+    "VAEDecodeTiled": 0.5,
+    "RIFE VFI": 0.05,
+    "FILM VFI": 0.15,
+    "ImageUpscaleToSize (script2workflow)": 0.4,
+    "VHS_LoadVideo": 0.02,
+}
+SIM_MODEL_SPEEDUPS = {
+    "PathchSageAttentionKJ": 0.75,
+    "TorchCompileModelWanVideoV2": 0.85,
+    "WanVideoTeaCacheKJ": 0.6,
+    "MagCache": 0.55,
+}
+SIM_OUTPUT_EXTENSIONS = {
+    "VHS_VideoCombine": ("gifs", "{prefix}_{counter:05}.mp4"),
+    "SaveImage": ("images", "{prefix}_{counter:05}_.png"),
+    "SaveLatent": ("latents", "{prefix}_{counter:05}_.latent"),
+    "ModelSave": ("models", "{prefix}_{counter:05}_.safetensors"),
+}
+
+
+class SimulatedOOM(Exception):
+    pass
+
+
+def create_object_info():
+    object_info = {}
+    for node_type, template in script2workflow.NODE_TEMPLATES.items():
+        required, optional = {}, {}
+        for node_input in template.get("inputs", []):
+            input_type = node_input["type"]
+            options = {}
+            if input_type in script2workflow.SCHEMA_WIDGET_TYPES:
+                if "widget" not in node_input:
+                    options["forceInput"] = True
+                if node_input["name"] in script2workflow.SCHEMA_CONTROL_WIDGET_NAMES:
+                    options["control_after_generate"] = True
+            spec = [[] if input_type == "COMBO" else input_type, options]
+            (optional if node_input.get("shape") == 7 else required)[
+                node_input["name"]
+            ] = spec
+        outputs = template.get("outputs", [])
+        object_info[node_type] = {
+            "input": {"required": required, "optional": optional},
+            "output": [output["type"] for output in outputs],
+            "output_name": [output["name"] for output in outputs],
+            "name": node_type,
+            "display_name": node_type,
+            "category": "simulated",
+            "output_node": node_type in SIM_OUTPUT_EXTENSIONS,
+        }
+    return object_info
+
+
+def create_sim_state(vram_gb, time_scale, output_dir, input_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    os.makedirs(input_dir, exist_ok=True)
+    return {
+        "vram_gb": vram_gb,
+        "time_scale": time_scale,
+        "output_dir": output_dir,
+        "input_dir": input_dir,
+        "lock": threading.Lock(),
+        "jobs": queue.Queue(),
+        "pending": [],
+        "running": None,
+        "history": {},
+        "cache": {},
+        "clients": {},
+        "interrupt": threading.Event(),
+        "number": 0,
+        "vram_in_use_gb": 0.0,
+        "ram_in_use_gb": 0.0,
+    }
+
+
+def unet_gb(unet_name):
+    match = script2workflow.QUANT_PATTERN.search(unet_name)
+    if match:
+        return SIM_UNET_GB_BY_QUANT.get(match.group(1).upper(), SIM_UNET_GB_DEFAULT)
+    return SIM_UNET_GB_DEFAULT
+
+
+def next_output_path(directory, name_pattern, prefix):
+    target_dir = os.path.join(directory, os.path.dirname(prefix))
+    os.makedirs(target_dir, exist_ok=True)
+    base = os.path.basename(prefix)
+    counter = 1 + len(glob.glob(os.path.join(target_dir, f"{glob.escape(base)}_*")))
+    filename = name_pattern.format(prefix=base, counter=counter)
+    return os.path.join(target_dir, filename), os.path.dirname(prefix)
+
+
+def simulate_node(state, class_type, inputs, upstream):
+    # Returns (output values, simulated seconds, peak VRAM in GB, UI output).
+    # Values are small metadata dicts standing in for tensors and models.
+    template = script2workflow.NODE_TEMPLATES[class_type]
+    outputs = [{} for _ in template.get("outputs", [])]
+    seconds = SIM_NODE_SECONDS.get(class_type, 0.1)
+    vram_gb, ui_output = 0.0, None
+
+    if class_type == "UnetLoaderGGUF":
+        outputs[0] = {"gb": unet_gb(inputs["unet_name"]), "speed": 1.0}
+    elif class_type == "UNETLoader":
+        outputs[0] = {"gb": SIM_UNET_GB_DEFAULT, "speed": 1.0}
+    elif class_type in ("ModelSamplingSD3", "Power Lora Loader (rgthree)"):
+        outputs[0] = dict(upstream.get("model", {}))
+        if class_type != "ModelSamplingSD3":
+            outputs[1] = dict(upstream.get("clip", {}))
+    elif class_type in SIM_MODEL_SPEEDUPS:
+        model = dict(upstream.get("model", {}))
+        model["speed"] = model.get("speed", 1.0) * SIM_MODEL_SPEEDUPS[class_type]
+        outputs[0] = model
+    elif class_type == "CLIPTextEncode":
+        vram_gb = SIM_TEXT_ENCODER_GB
+    elif class_type == "EmptyHunyuanLatentVideo":
+        outputs[0] = {
+            "width": inputs["width"],
+            "height": inputs["height"],
+            "length": inputs["length"],
+            "batch": inputs.get("batch_size", 1),
+        }
+    elif class_type in ("WanImageToVideo", "WanFirstLastFrameToVideo"):
+        outputs[2] = {
+            "width": inputs["width"],
+            "height": inputs["height"],
+            "length": inputs["length"],
+            "batch": inputs.get("batch_size", 1),
+        }
+    elif class_type == "KSamplerAdvanced":
+        model, latent = upstream.get("model", {}), dict(
+            upstream.get("latent_image", {})
+        )
+        width, height, length = (
+            latent.get("width", script2workflow.VIDEO_WIDTH),
+            latent.get("height", script2workflow.VIDEO_HEIGHT),
+            latent.get("length", script2workflow.VIDEO_LENGTH),
+        )
+        steps = max(
+            0, min(inputs["end_at_step"], inputs["steps"]) - inputs["start_at_step"]
+        )
+        reference_tokens = script2workflow.estimate_sampling_bytes(*SIM_REFERENCE_SIZE)
+        size_factor = (
+            script2workflow.estimate_sampling_bytes(width, height, length)
+            / reference_tokens
+        )
+        seconds = (
+            steps
+            * SIM_STEP_SECONDS
+            * size_factor
+            * latent.get("batch", 1)
+            * model.get("speed", 1.0)
+        )
+        vram_gb = (
+            model.get("gb", SIM_UNET_GB_DEFAULT)
+            + script2workflow.estimate_sampling_bytes(width, height, length) / 1024**3
+        )
+        latent["steps"] = steps
+        outputs[0] = latent
+    elif class_type in ("VRAMCleanup", "RAMCleanup"):
+        outputs[0] = dict(upstream.get("anything", {}))
+    elif class_type in ("VAEDecode", "VAEDecodeTiled"):
+        latent = upstream.get("samples", {})
+        width, height, length = (
+            latent.get("width", script2workflow.VIDEO_WIDTH),
+            latent.get("height", script2workflow.VIDEO_HEIGHT),
+            latent.get("length", script2workflow.VIDEO_LENGTH),
+        )
+        frames = length * latent.get("batch", 1)
+        if class_type == "VAEDecodeTiled":
+            vram_gb = (
+                script2workflow.estimate_vae_decode_bytes(
+                    min(inputs["tile_size"], width),
+                    min(inputs["tile_size"], height),
+                    min(inputs["temporal_size"], length),
+                )
+                / 1024**3
+            )
+        else:
+            vram_gb = (
+                script2workflow.estimate_vae_decode_bytes(width, height, length)
+                / 1024**3
+            )
+        seconds = frames * SIM_SECONDS_PER_FRAME[class_type]
+        outputs[0] = {"width": width, "height": height, "frames": frames}
+    elif class_type in ("RIFE VFI", "FILM VFI"):
+        image = dict(upstream.get("frames", {}))
+        image["frames"] = (image.get("frames", 1) - 1) * inputs["multiplier"] + 1
+        seconds = image["frames"] * SIM_SECONDS_PER_FRAME[class_type]
+        outputs[0] = image
+    elif class_type == "ImageUpscaleToSize (script2workflow)":
+        image = dict(upstream.get("images", {}))
+        image.update(width=inputs["width"], height=inputs["height"])
+        seconds = image.get("frames", 1) * SIM_SECONDS_PER_FRAME[class_type]
+        vram_gb = SIM_UPSCALE_GB
+        outputs[0] = image
+    elif class_type == "ImageScaleBy":
+        image = dict(upstream.get("image", {}))
+        image["width"] = int(image.get("width", 0) * inputs["scale_by"])
+        image["height"] = int(image.get("height", 0) * inputs["scale_by"])
+        outputs[0] = image
+    elif class_type == "VHS_SelectImages":
+        image = dict(upstream.get("image", {}))
+        image["frames"] = len(str(inputs["indexes"]).split(","))
+        outputs[0] = image
+    elif class_type == "ImageFromBatch":
+        image = dict(upstream.get("image", {}))
+        image["frames"] = max(
+            0, min(inputs["length"], image.get("frames", 0) - inputs["batch_index"])
+        )
+        outputs[0] = image
+    elif class_type == "ImageBatchMulti":
+        images = [
+            value for name, value in upstream.items() if name.startswith("image_")
+        ]
+        outputs[0] = dict(images[0]) if images else {}
+        outputs[0]["frames"] = sum(image.get("frames", 0) for image in images)
+    elif class_type in ("LoadImage", "LoadLatent"):
+        input_name = inputs.get("image") or inputs.get("latent")
+        if not os.path.exists(os.path.join(state["input_dir"], input_name)):
+            raise FileNotFoundError(f"Invalid input file: {input_name}")
+        outputs[0] = (
+            {
+                "width": script2workflow.VIDEO_WIDTH,
+                "height": script2workflow.VIDEO_HEIGHT,
+                "frames": 1,
+            }
+            if class_type == "LoadImage"
+            else {
+                "width": script2workflow.VIDEO_WIDTH,
+                "height": script2workflow.VIDEO_HEIGHT,
+                "length": script2workflow.VIDEO_LENGTH,
+            }
+        )
+    elif class_type == "VHS_LoadVideo":
+        video_path = os.path.join(state["input_dir"], inputs["video"])
+        if not os.path.exists(video_path):
+            raise FileNotFoundError(f"Invalid input file: {inputs['video']}")
+        # Placeholder videos from this simulator carry the frames they hold
+        try:
+            with open(video_path, encoding="utf-8") as f:
+                outputs[0] = dict(json.load(f).get("source", {}))
+        except (ValueError, UnicodeDecodeError):
+            outputs[0] = {
+                "width": script2workflow.VIDEO_WIDTH,
+                "height": script2workflow.VIDEO_HEIGHT,
+                "frames": script2workflow.VIDEO_LENGTH,
+            }
+        outputs[0].pop("files", None)
+        seconds = outputs[0].get("frames", 0) * SIM_SECONDS_PER_FRAME["VHS_LoadVideo"]
+
+    if class_type in SIM_OUTPUT_EXTENSIONS:
+        ui_key, name_pattern = SIM_OUTPUT_EXTENSIONS[class_type]
+        output_path, subfolder = next_output_path(
+            state["output_dir"], name_pattern, inputs["filename_prefix"]
+        )
+        placeholder = {
+            "simulated": True,
+            "class_type": class_type,
+            "source": next(iter(upstream.values()), {}),
+        }
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(placeholder, f)
+        file_entry = {
+            "filename": os.path.basename(output_path),
+            "subfolder": subfolder,
+            "type": "output",
+        }
+        if class_type == "VHS_VideoCombine":
+            file_entry.update(format=inputs["format"], frame_rate=inputs["frame_rate"])
+            outputs[0] = {"files": [output_path]}
+        ui_output = {ui_key: [file_entry]}
+
+    if vram_gb > state["vram_gb"]:
+        raise SimulatedOOM(
+            f"Allocation on device: {class_type} needs {vram_gb:.1f} GB, "
+            f"{state['vram_gb']:.1f} GB available"
+        )
+    return outputs, seconds, vram_gb, ui_output
+
+
+def send_event(state, event_type, data, client_id=None):
+    message = json.dumps({"type": event_type, "data": data}).encode("utf-8")
+    with state["lock"]:
+        clients = [
+            client
+            for sid, client in state["clients"].items()
+            if client_id is None or sid == client_id
+        ]
+    for client in clients:
+        try:
+            send_websocket_frame(client, message)
+        except OSError:
+            pass
+
+
+def queue_status(state):
+    with state["lock"]:
+        remaining = len(state["pending"]) + (1 if state["running"] else 0)
+    return {"status": {"exec_info": {"queue_remaining": remaining}}}
+
+
+def execution_order(prompt):
+    dependencies = {
+        node_id: {
+            value[0]
+            for value in node["inputs"].values()
+            if isinstance(value, list) and len(value) == 2 and value[0] in prompt
+        }
+        for node_id, node in prompt.items()
+    }
+    order, done = [], set()
+    while len(order) < len(prompt):
+        ready = sorted(
+            (
+                node_id
+                for node_id in prompt
+                if node_id not in done and dependencies[node_id] <= done
+            ),
+            key=int,
+        )
+        if not ready:
+            raise ValueError("Prompt graph has a cycle")
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+
+def node_signature(node, signatures, state):
+    parts = [node["class_type"]]
+    for name, value in sorted(node["inputs"].items()):
+        if isinstance(value, list) and len(value) == 2 and value[0] in signatures:
+            parts.append([name, signatures[value[0]], value[1]])
+        else:
+            parts.append([name, value])
+    if node["class_type"] in ("LoadImage", "LoadLatent", "VHS_LoadVideo"):
+        input_name = (
+            node["inputs"].get("image")
+            or node["inputs"].get("latent")
+            or node["inputs"].get("video")
+        )
+        input_path = os.path.join(state["input_dir"], str(input_name))
+        parts.append(
+            os.path.getmtime(input_path) if os.path.exists(input_path) else None
+        )
+    return hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+
+
+def execute_prompt(state, number, prompt_id, prompt, extra_data):
+    client_id = extra_data.get("client_id")
+    messages, node_seconds, outputs_ui = [], {}, {}
+    values, signatures, cached_nodes = {}, {}, []
+    peak_vram_gb, status_str = 0.0, "success"
+
+    def emit(event_type, data):
+        messages.append([event_type, dict(data, timestamp=int(time.time() * 1000))])
+        send_event(state, event_type, data, client_id)
+
+    emit("execution_start", {"prompt_id": prompt_id})
+    for node_id in execution_order(prompt):
+        node = prompt[node_id]
+        signatures[node_id] = node_signature(node, signatures, state)
+        if signatures[node_id] in state["cache"]:
+            values[node_id] = state["cache"][signatures[node_id]]
+            cached_nodes.append(node_id)
+            continue
+        if state["interrupt"].is_set():
+            state["interrupt"].clear()
+            emit("execution_interrupted", {"prompt_id": prompt_id, "node_id": node_id})
+            status_str = "error"
+            break
+
+        send_event(
+            state,
+            "executing",
+            {"node": node_id, "display_node": node_id, "prompt_id": prompt_id},
+            client_id,
+        )
+        inputs, upstream = {}, {}
+        for name, value in node["inputs"].items():
+            if isinstance(value, list) and len(value) == 2 and value[0] in values:
+                origin_values = values[value[0]]
+                upstream[name] = (
+                    origin_values[value[1]] if value[1] < len(origin_values) else {}
+                )
+            else:
+                inputs[name] = value
+        try:
+            node_values, seconds, vram_gb, ui_output = simulate_node(
+                state, node["class_type"], inputs, upstream
+            )
+        except Exception as e:
+            emit(
+                "execution_error",
+                {
+                    "prompt_id": prompt_id,
+                    "node_id": node_id,
+                    "node_type": node["class_type"],
+                    "executed": list(values),
+                    "exception_message": str(e),
+                    "exception_type": (
+                        "torch.OutOfMemoryError"
+                        if isinstance(e, SimulatedOOM)
+                        else type(e).__name__
+                    ),
+                    "traceback": [],
+                    "current_inputs": {},
+                    "current_outputs": {},
+                },
+            )
+            status_str = "error"
+            break
+
+        # What /system_stats reports while the node runs; loaded models stay
+        # in RAM until the prompt ends
+        state["vram_in_use_gb"] = vram_gb
+        if node["class_type"] in ("UnetLoaderGGUF", "UNETLoader"):
+            state["ram_in_use_gb"] += node_values[0]["gb"]
+        steps = node_values[0].get("steps", 0) if node_values else 0
+        for step in range(1, steps + 1):
+            time.sleep(seconds / steps * state["time_scale"])
+            send_event(
+                state,
+                "progress",
+                {"value": step, "max": steps, "prompt_id": prompt_id, "node": node_id},
+                client_id,
+            )
+        if not steps:
+            time.sleep(seconds * state["time_scale"])
+
+        values[node_id] = node_values
+        state["cache"][signatures[node_id]] = node_values
+        node_seconds[node_id] = round(seconds, 3)
+        peak_vram_gb = max(peak_vram_gb, vram_gb)
+        if ui_output:
+            outputs_ui[node_id] = ui_output
+            send_event(
+                state,
+                "executed",
+                {"node": node_id, "output": ui_output, "prompt_id": prompt_id},
+                client_id,
+            )
+
+    # As in ComfyUI, only what this prompt used stays cached, so a prompt on
+    # other models loads them again
+    state["cache"] = {
+        signature: state["cache"][signature]
+        for signature in signatures.values()
+        if signature in state["cache"]
+    }
+    state["vram_in_use_gb"] = state["ram_in_use_gb"] = 0.0
+    if cached_nodes:
+        messages.insert(
+            1, ["execution_cached", {"nodes": cached_nodes, "prompt_id": prompt_id}]
+        )
+    if status_str == "success":
+        emit("execution_success", {"prompt_id": prompt_id})
+    send_event(state, "executing", {"node": None, "prompt_id": prompt_id}, client_id)
+
+    with state["lock"]:
+        state["history"][prompt_id] = {
+            "prompt": [number, prompt_id, prompt, extra_data, []],
+            "outputs": outputs_ui,
+            "status": {
+                "status_str": status_str,
+                "completed": status_str == "success",
+                "messages": messages,
+            },
+            "meta": {},
+            "sim": {
+                "node_seconds": node_seconds,
+                "simulated_seconds": round(sum(node_seconds.values()), 3),
+                "peak_vram_gb": round(peak_vram_gb, 2),
+                "cached_nodes": cached_nodes,
+            },
+        }
+
+
+def worker_loop(state):
+    while True:
+        job = state["jobs"].get()
+        with state["lock"]:
+            if job not in state["pending"]:
+                continue
+            state["pending"].remove(job)
+            state["running"] = job
+        send_event(state, "status", queue_status(state))
+        number, prompt_id, prompt, extra_data = job
+        try:
+            execute_prompt(state, number, prompt_id, prompt, extra_data)
+        finally:
+            with state["lock"]:
+                state["running"] = None
+            send_event(state, "status", queue_status(state))
+
+
+def validate_prompt(prompt):
+    node_errors = {}
+    for node_id, node in prompt.items():
+        errors = []
+        if node.get("class_type") not in script2workflow.NODE_TEMPLATES:
+            errors.append(f"Node type {node.get('class_type')} does not exist")
+        for name, value in node.get("inputs", {}).items():
+            if (
+                isinstance(value, list)
+                and len(value) == 2
+                and str(value[0]) not in prompt
+            ):
+                errors.append(f"Input '{name}' links to missing node {value[0]}")
+        if errors:
+            node_errors[node_id] = {
+                "errors": [{"type": "invalid_prompt", "message": e} for e in errors],
+                "class_type": node.get("class_type"),
+            }
+    return node_errors
+
+
+def accept_websocket(handler):
+    key = handler.headers.get("Sec-WebSocket-Key", "")
+    accept = base64.b64encode(
+        hashlib.sha1((key + WEBSOCKET_GUID).encode("ascii")).digest()
+    ).decode("ascii")
+    handler.send_response(101, "Switching Protocols")
+    handler.send_header("Upgrade", "websocket")
+    handler.send_header("Connection", "Upgrade")
+    handler.send_header("Sec-WebSocket-Accept", accept)
+    handler.end_headers()
+    handler.wfile.flush()
+    return {"socket": handler.connection, "lock": threading.Lock()}
+
+
+def send_websocket_frame(client, payload, opcode=0x1):
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 1 << 16:
+        header += bytes([126]) + struct.pack(">H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack(">Q", len(payload))
+    with client["lock"]:
+        client["socket"].sendall(header + payload)
+
+
+def read_websocket_frame(rfile):
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None, b""
+    opcode, length = header[0] & 0x0F, header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack(">H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack(">Q", rfile.read(8))[0]
+    mask = rfile.read(4) if header[1] & 0x80 else b"\0\0\0\0"
+    payload = bytes(byte ^ mask[idx % 4] for idx, byte in enumerate(rfile.read(length)))
+    return opcode, payload
+
+
+def create_handler(state):
+    class SimHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, payload, status=200):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_json(self):
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def file_dir(self, file_type):
+            return state["input_dir"] if file_type == "input" else state["output_dir"]
+
+        def send_view(self, url, head=False):
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            base_dir = os.path.abspath(self.file_dir(query.get("type", "output")))
+            path = os.path.abspath(
+                os.path.join(
+                    base_dir, query.get("subfolder", ""), query.get("filename", "")
+                )
+            )
+            if not path.startswith(base_dir + os.sep) or not os.path.isfile(path):
+                self.send_json({"error": "File not found"}, 404)
+                return
+            size = os.path.getsize(path)
+            start = 0
+            match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(size - start))
+            self.send_header("Accept-Ranges", "bytes")
+            self.end_headers()
+            if not head:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    self.wfile.write(f.read())
+
+        def receive_upload(self):
+            length = int(self.headers.get("Content-Length", 0))
+            message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                + self.rfile.read(length)
+            )
+            fields = {
+                part.get_param("name", header="content-disposition"): part
+                for part in message.iter_parts()
+            }
+            if "image" not in fields:
+                self.send_json({"error": "No image in upload"}, 400)
+                return
+
+            def field_text(name, default):
+                if name not in fields:
+                    return default
+                return fields[name].get_payload(decode=True).decode("utf-8")
+
+            file_type = field_text("type", "input")
+            subfolder = field_text("subfolder", "")
+            filename = os.path.basename(fields["image"].get_filename())
+            target_dir = os.path.join(self.file_dir(file_type), subfolder)
+            os.makedirs(target_dir, exist_ok=True)
+            if field_text("overwrite", "false").lower() != "true":
+                base, ext = os.path.splitext(filename)
+                counter = 1
+                while os.path.exists(os.path.join(target_dir, filename)):
+                    filename = f"{base} ({counter}){ext}"
+                    counter += 1
+            with open(os.path.join(target_dir, filename), "wb") as f:
+                f.write(fields["image"].get_payload(decode=True))
+            self.send_json(
+                {"name": filename, "subfolder": subfolder, "type": file_type}
+            )
+
+        def do_HEAD(self):
+            url = urlparse(self.path)
+            if url.path == "/view":
+                self.send_view(url, head=True)
+            else:
+                self.send_json({"error": f"Unknown path {url.path}"}, 404)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/ws":
+                client_id = parse_qs(url.query).get("clientId", [uuid.uuid4().hex])[0]
+                client = accept_websocket(self)
+                with state["lock"]:
+                    state["clients"][client_id] = client
+                send_websocket_frame(
+                    client,
+                    json.dumps(
+                        {
+                            "type": "status",
+                            "data": dict(queue_status(state), sid=client_id),
+                        }
+                    ).encode("utf-8"),
+                )
+                try:
+                    while True:
+                        opcode, payload = read_websocket_frame(self.rfile)
+                        if opcode is None or opcode == 0x8:
+                            break
+                        if opcode == 0x9:
+                            send_websocket_frame(client, payload, 0xA)
+                except OSError:
+                    pass
+                with state["lock"]:
+                    state["clients"].pop(client_id, None)
+                self.close_connection = True
+            elif url.path == "/history":
+                with state["lock"]:
+                    self.send_json(dict(state["history"]))
+            elif url.path.startswith("/history/"):
+                prompt_id = url.path[len("/history/") :]
+                with state["lock"]:
+                    entry = state["history"].get(prompt_id)
+                self.send_json({prompt_id: entry} if entry else {})
+            elif url.path == "/queue":
+                with state["lock"]:
+                    running = [list(state["running"])] if state["running"] else []
+                    pending = [list(job) for job in state["pending"]]
+                self.send_json({"queue_running": running, "queue_pending": pending})
+            elif url.path == "/prompt":
+                self.send_json(
+                    {"exec_info": queue_status(state)["status"]["exec_info"]}
+                )
+            elif url.path == "/object_info":
+                self.send_json(create_object_info())
+            elif url.path == "/view":
+                self.send_view(url)
+            elif url.path == "/system_stats":
+                vram_bytes = int(state["vram_gb"] * 1024**3)
+                ram_bytes = int(SIM_RAM_GB * 1024**3)
+                self.send_json(
+                    {
+                        "system": {
+                            "os": "sim",
+                            "comfyui_version": "simulated",
+                            "ram_total": ram_bytes,
+                            "ram_free": max(
+                                0, ram_bytes - int(state["ram_in_use_gb"] * 1024**3)
+                            ),
+                        },
+                        "devices": [
+                            {
+                                "name": "sim:0 Simulated GPU",
+                                "type": "cuda",
+                                "index": 0,
+                                "vram_total": vram_bytes,
+                                "vram_free": max(
+                                    0,
+                                    vram_bytes - int(state["vram_in_use_gb"] * 1024**3),
+                                ),
+                            }
+                        ],
+                    }
+                )
+            else:
+                self.send_json({"error": f"Unknown path {url.path}"}, 404)
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            if url.path == "/upload/image":
+                self.receive_upload()
+                return
+            payload = self.read_json()
+            if url.path == "/prompt":
+                prompt = payload.get("prompt", {})
+                node_errors = validate_prompt(prompt)
+                if node_errors:
+                    self.send_json(
+                        {
+                            "error": {
+                                "type": "prompt_outputs_failed_validation",
+                                "message": "Prompt outputs failed validation",
+                                "details": "",
+                            },
+                            "node_errors": node_errors,
+                        },
+                        400,
+                    )
+                    return
+                prompt_id = payload.get("prompt_id") or str(uuid.uuid4())
+                with state["lock"]:
+                    state["number"] += 1
+                    extra_data = dict(
+                        payload.get("extra_data", {}),
+                        client_id=payload.get("client_id"),
+                    )
+                    job = (state["number"], prompt_id, prompt, extra_data)
+                    state["pending"].append(job)
+                state["jobs"].put(job)
+                send_event(state, "status", queue_status(state))
+                self.send_json(
+                    {"prompt_id": prompt_id, "number": job[0], "node_errors": {}}
+                )
+            elif url.path == "/queue":
+                with state["lock"]:
+                    if payload.get("clear"):
+                        state["pending"].clear()
+                    for prompt_id in payload.get("delete", []):
+                        state["pending"] = [
+                            job for job in state["pending"] if job[1] != prompt_id
+                        ]
+                self.send_json({})
+            elif url.path == "/history":
+                with state["lock"]:
+                    if payload.get("clear"):
+                        state["history"].clear()
+                    for prompt_id in payload.get("delete", []):
+                        state["history"].pop(prompt_id, None)
+                self.send_json({})
+            elif url.path == "/interrupt":
+                with state["lock"]:
+                    if state["running"]:
+                        state["interrupt"].set()
+                self.send_json({})
+            elif url.path == "/free":
+                self.send_json({})
+            else:
+                self.send_json({"error": f"Unknown path {url.path}"}, 404)
+
+    return SimHandler
+
+
+def start_server(
+    host=SIM_HOST,
+    port=SIM_PORT,
+    vram_gb=SIM_VRAM_GB,
+    time_scale=SIM_TIME_SCALE,
+    output_dir=SIM_OUTPUT_DIR,
+    input_dir=SIM_INPUT_DIR,
+):
+    state = create_sim_state(vram_gb, time_scale, output_dir, input_dir)
+    server = ThreadingHTTPServer((host, port), create_handler(state))
+    server.daemon_threads = True
+    server.sim_state = state
+    threading.Thread(target=worker_loop, args=(state,), daemon=True).start()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run a simulated ComfyUI server for offline workflow tests."
+    )
+    parser.add_argument("--host", type=str, default=SIM_HOST, help="Bind address")
+    parser.add_argument("--port", type=int, default=SIM_PORT, help="Port")
+    parser.add_argument(
+        "--vram-gb",
+        type=float,
+        default=SIM_VRAM_GB,
+        help="Simulated GPU memory; nodes that need more fail with an OOM error",
+    )
+    parser.add_argument(
+        "--time-scale",
+        type=float,
+        default=SIM_TIME_SCALE,
+        help="Real seconds slept per simulated second (0 runs instantly)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        default=SIM_OUTPUT_DIR,
+        help="Folder for placeholder output files",
+    )
+    parser.add_argument(
+        "--input-dir",
+        type=str,
+        default=SIM_INPUT_DIR,
+        help="Folder LoadImage/LoadLatent read from",
+    )
+    args = parser.parse_args()
+
+    server = start_server(
+        args.host,
+        args.port,
+        args.vram_gb,
+        args.time_scale,
+        args.output_dir,
+        args.input_dir,
+    )
+    print(
+        f"Simulated ComfyUI on http://{args.host}:{server.server_address[1]} "
+        f"({args.vram_gb} GB VRAM, time scale {args.time_scale})"
+    )
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,146 @@
+"""ComfyUI nodes required by script2workflow workflows.
+
+Copy or symlink this directory into ComfyUI/custom_nodes/.
+"""
+
+CONDITIONING_BATCH_INPUTS = 8
+
+
+class ConditioningBatch:
+    """Stack several single-prompt conditionings into one batch.
+
+    Item i of the output conditions latent i of a batch sampled with the same
+    size. Token sequences of different lengths are zero-padded to the longest.
+    """
+
+    CATEGORY = "conditioning"
+    RETURN_TYPES = ("CONDITIONING",)
+    FUNCTION = "batch"
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {"conditioning_1": ("CONDITIONING",)},
+            "optional": {
+                f"conditioning_{i}": ("CONDITIONING",)
+                for i in range(2, CONDITIONING_BATCH_INPUTS + 1)
+            },
+        }
+
+    def batch(self, **conditionings):
+        import torch
+
+        entries = [
+            conditionings[f"conditioning_{i}"][0]
+            for i in range(1, CONDITIONING_BATCH_INPUTS + 1)
+            if conditionings.get(f"conditioning_{i}") is not None
+        ]
+        max_tokens = max(cond.shape[1] for cond, _ in entries)
+        batched_cond = torch.cat(
+            [
+                torch.nn.functional.pad(cond, (0, 0, 0, max_tokens - cond.shape[1]))
+                for cond, _ in entries
+            ]
+        )
+
+        options = dict(entries[0][1])
+        pooled = [extra.get("pooled_output") for _, extra in entries]
+        if all(pooled_output is not None for pooled_output in pooled):
+            options["pooled_output"] = torch.cat(pooled)
+        else:
+            options.pop("pooled_output", None)
+        masks = [extra.get("attention_mask") for _, extra in entries]
+        if all(mask is not None for mask in masks):
+            options["attention_mask"] = torch.cat(
+                [
+                    torch.nn.functional.pad(mask, (0, max_tokens - mask.shape[-1]))
+                    for mask in masks
+                ]
+            )
+        else:
+            options.pop("attention_mask", None)
+        return ([[batched_cond, options]],)
+
+
+class ImageUpscaleToSize:
+    """Upscale frames with an upscale model and resize them, a batch at a time.
+
+    Each batch of per_batch frames is resized to width x height as soon as the
+    model has upscaled it, so only one batch is ever held at the model's scale.
+    """
+
+    CATEGORY = "image/upscaling"
+    RETURN_TYPES = ("IMAGE",)
+    FUNCTION = "upscale"
+    UPSCALE_METHODS = ["nearest-exact", "bilinear", "area", "bicubic", "lanczos"]
+    CROP_METHODS = ["disabled", "center"]
+    TILE_SIZE = 512
+    TILE_OVERLAP = 32
+
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "upscale_model": ("UPSCALE_MODEL",),
+                "images": ("IMAGE",),
+                "upscale_method": (cls.UPSCALE_METHODS,),
+                "width": ("INT", {"default": 1280, "min": 16, "max": 16384, "step": 8}),
+                "height": ("INT", {"default": 720, "min": 16, "max": 16384, "step": 8}),
+                "crop": (cls.CROP_METHODS,),
+                "per_batch": ("INT", {"default": 8, "min": 1, "max": 4096}),
+            }
+        }
+
+    def upscale(
+        self, upscale_model, images, upscale_method, width, height, crop, per_batch
+    ):
+        import comfy.model_management
+        import comfy.utils
+        import torch
+
+        device = comfy.model_management.get_torch_device()
+        comfy.model_management.free_memory(
+            comfy.model_management.module_size(upscale_model.model)
+            + images[:per_batch].nelement()
+            * images.element_size()
+            * max(upscale_model.scale, 1.0) ** 2,
+            device,
+        )
+        upscale_model.to(device)
+        resized = []
+        try:
+            for start in range(0, images.shape[0], per_batch):
+                batch = images[start : start + per_batch].movedim(-1, -3).to(device)
+                upscaled = comfy.utils.tiled_scale(
+                    batch,
+                    lambda tile: upscale_model(tile),
+                    tile_x=self.TILE_SIZE,
+                    tile_y=self.TILE_SIZE,
+                    overlap=self.TILE_OVERLAP,
+                    upscale_amount=upscale_model.scale,
+                )
+                resized.append(
+                    comfy.utils.common_upscale(
+                        torch.clamp(upscaled, min=0.0, max=1.0),
+                        width,
+                        height,
+                        upscale_method,
+                        crop,
+                    )
+                    .movedim(-3, -1)
+                    .cpu()
+                )
+                del batch, upscaled
+        finally:
+            upscale_model.to("cpu")
+        return (torch.cat(resized),)
+
+
+NODE_CLASS_MAPPINGS = {
+    "ConditioningBatch (script2workflow)": ConditioningBatch,
+    "ImageUpscaleToSize (script2workflow)": ImageUpscaleToSize,
+}
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "ConditioningBatch (script2workflow)": "Conditioning Batch (script2workflow)",
+    "ImageUpscaleToSize (script2workflow)": "Upscale Image To Size (script2workflow)",
+}
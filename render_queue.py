@@ -0,0 +1,659 @@
+import argparse
+import getpass
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+
+import script2workflow
+
+# --- CONSTANTS ---
+RENDER_QUEUE_NAME = "render_queue.sqlite"
+RENDER_QUEUE_DIR = "render_queue"
+QUEUE_POLL_SECONDS = 2.0
+DEFAULT_PRIORITY = 0
+DEFAULT_CHUNK_TURNS = 1
+# Jobs whose models are already loaded may run ahead of the fair order this
+# many times in a row before the next fair pick gets the GPU
+MODEL_RESIDENCY_STREAK = 4
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    script_name TEXT NOT NULL,
+    script_path TEXT,
+    image_path TEXT,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    submission_id INTEGER NOT NULL REFERENCES submissions(id),
+    seq INTEGER NOT NULL,
+    turns TEXT NOT NULL,
+    status TEXT NOT NULL,
+    prompt_id TEXT,
+    run_id INTEGER,
+    handoff TEXT,
+    started_at TEXT,
+    finished_at TEXT,
+    error TEXT,
+    UNIQUE (submission_id, seq)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, submission_id, seq);
+CREATE INDEX IF NOT EXISTS submissions_owner ON submissions (owner, status);
+"""
+
+# Runnable jobs: the next pending chunk of each active submission. Higher
+# priority first; within a priority the owner served longest ago goes first,
+# so owners take turns at every turn boundary.
+RUNNABLE_JOBS_QUERY = """
+SELECT jobs.*, submissions.owner, submissions.priority
+FROM jobs JOIN submissions ON submissions.id = jobs.submission_id
+WHERE jobs.status = 'pending' AND submissions.status = 'active'
+AND NOT EXISTS (
+    SELECT 1 FROM jobs AS previous
+    WHERE previous.submission_id = jobs.submission_id
+    AND previous.seq < jobs.seq AND previous.status != 'done'
+)
+ORDER BY submissions.priority DESC,
+(
+    SELECT MAX(served.started_at) FROM jobs AS served
+    JOIN submissions AS owned ON owned.id = served.submission_id
+    WHERE owned.owner = submissions.owner
+) ASC,
+submissions.created_at, submissions.id, jobs.seq
+"""
+
+
+def open_queue(db_path):
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(QUEUE_SCHEMA)
+    return connection
+
+
+def chunk_turns(selected_turns, turns_per_chunk):
+    return [
+        selected_turns[start : start + turns_per_chunk]
+        for start in range(0, len(selected_turns), turns_per_chunk)
+    ]
+
+
+def add_submission(
+    db_path,
+    script_path,
+    owner,
+    priority=DEFAULT_PRIORITY,
+    turns_range=None,
+    image_path=None,
+    turns_per_chunk=DEFAULT_CHUNK_TURNS,
+    options=None,
+):
+    if turns_per_chunk < 1:
+        raise ValueError(f"Chunk size must be at least 1 turn, got {turns_per_chunk}")
+    if image_path and not os.path.exists(image_path):
+        raise ValueError(f"Image file not found: {image_path}")
+    script_turns, script_name = script2workflow.load_movie_script(script_path)
+    chunks = chunk_turns(
+        script2workflow.select_turns(script_turns, turns_range), turns_per_chunk
+    )
+
+    with closing(open_queue(db_path)) as connection, connection:
+        submission_id = connection.execute(
+            "INSERT INTO submissions (owner, priority, script_name, image_path, "
+            "options, status, created_at) VALUES (?, ?, ?, ?, ?, 'active', ?)",
+            (
+                owner,
+                priority,
+                script_name,
+                os.path.abspath(image_path) if image_path else None,
+                json.dumps(options or {}),
+                datetime.now().isoformat(),
+            ),
+        ).lastrowid
+        # Jobs render from a snapshot, so later edits to the script do not
+        # change a submission that is already queued
+        snapshot_path = os.path.join(
+            RENDER_QUEUE_DIR, str(submission_id), f"{script_name}.json"
+        )
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        shutil.copyfile(script_path, snapshot_path)
+        connection.execute(
+            "UPDATE submissions SET script_path = ? WHERE id = ?",
+            (os.path.abspath(snapshot_path), submission_id),
+        )
+        connection.executemany(
+            "INSERT INTO jobs (submission_id, seq, turns, status) "
+            "VALUES (?, ?, ?, 'pending')",
+            [
+                (submission_id, seq, json.dumps(turns))
+                for seq, turns in enumerate(chunks)
+            ],
+        )
+    print(
+        f"Queued submission {submission_id} for {owner}: {script_name}, "
+        f"{len(chunks)} job(s), priority {priority}"
+    )
+    return submission_id
+
+
+def job_start_image(connection, job, submission, server, comfy_dir):
+    # Returns the start image and, without a shared ComfyUI folder, the input
+    # name it was uploaded under
+    turns = json.loads(job["turns"])
+    script_turns, script_name = script2workflow.load_movie_script(
+        submission["script_path"]
+    )
+    if job["seq"] == 0:
+        image_path = submission["image_path"]
+        if image_path and not comfy_dir:
+            return image_path, script2workflow.upload_asset(server, image_path)
+        return image_path, None
+    if script_turns[str(turns[0])].get("new_scene", False):
+        return None, None
+    previous = connection.execute(
+        "SELECT handoff FROM jobs WHERE submission_id = ? AND seq = ?",
+        (job["submission_id"], job["seq"] - 1),
+    ).fetchone()
+    if not previous or not previous["handoff"]:
+        raise ValueError(f"Turn {turns[0]} has no handoff frame from the previous job")
+    handoff = json.loads(previous["handoff"])
+    if not comfy_dir:
+        return script2workflow.stage_server_output(
+            server,
+            handoff,
+            os.path.join(RENDER_QUEUE_DIR, str(job["submission_id"]), "handoffs"),
+        )
+    input_filename = f"{script_name}_q{job['submission_id']}_turn{turns[0]}.png"
+    script2workflow.stage_comfy_output(
+        comfy_dir,
+        os.path.join(handoff.get("subfolder", ""), handoff["filename"]),
+        input_filename,
+    )
+    return os.path.join(comfy_dir, "input", input_filename), None
+
+
+def job_model_kinds(job, submission):
+    # Whether each turn samples with the T2V or the I2V models, the way
+    # generate_workflow builds them; the first turn's kind goes last so its
+    # models are the ones a warm-up leaves loaded
+    script_turns, _ = script2workflow.load_movie_script(submission["script_path"])
+    kinds = []
+    for turn_idx, turn_num in enumerate(json.loads(job["turns"])):
+        if turn_idx == 0 and job["seq"] == 0:
+            kind = "i2v" if submission["image_path"] else "t2v"
+        elif script_turns[str(turn_num)].get("new_scene", False):
+            kind = "t2v"
+        else:
+            kind = "i2v"
+        if kind not in kinds:
+            kinds.append(kind)
+    return kinds[1:] + kinds[:1]
+
+
+def job_warmup(connection, job, warmups):
+    # The warm-up workflow doubles as the job's model signature; both are
+    # kept per job until it is dispatched
+    if job["id"] not in warmups:
+        submission = connection.execute(
+            "SELECT * FROM submissions WHERE id = ?", (job["submission_id"],)
+        ).fetchone()
+        options = json.loads(submission["options"])
+        try:
+            workflow = script2workflow.quiet_call(
+                script2workflow.generate_warmup_workflow,
+                script2workflow.quiet_call(job_model_kinds, job, submission),
+                options.get("render_profile", "native"),
+                options.get("interpolate", 1),
+                options.get("vram_budget"),
+                options.get("models_dir"),
+            )
+        except (ValueError, KeyError) as e:
+            print(f"Submission {job['submission_id']} has no model signature: {e}")
+            warmups[job["id"]] = (None, None)
+        else:
+            warmups[job["id"]] = (
+                workflow,
+                script2workflow.workflow_model_signature(workflow["nodes"]),
+            )
+    return warmups[job["id"]]
+
+
+def pick_job(connection, jobs, resident, streak, warmups):
+    # Among the jobs of the top priority, one that runs on the models already
+    # loaded goes ahead of the fair order, up to MODEL_RESIDENCY_STREAK times
+    if resident is None or streak >= MODEL_RESIDENCY_STREAK:
+        return jobs[0]
+    for job in jobs:
+        if job["priority"] != jobs[0]["priority"]:
+            break
+        if job_warmup(connection, job, warmups)[1] == resident:
+            return job
+    return jobs[0]
+
+
+def describe_signature(signature):
+    return ", ".join(json.loads(signature)["unets"])
+
+
+def dispatch_job(connection, job, server, comfy_dir, history_db=None, store_args=None):
+    # Returns the model signature of the workflow that was queued
+    submission = connection.execute(
+        "SELECT * FROM submissions WHERE id = ?", (job["submission_id"],)
+    ).fetchone()
+    turns = json.loads(job["turns"])
+    start_image, image_name = job_start_image(
+        connection, job, submission, server, comfy_dir
+    )
+    options = json.loads(submission["options"])
+    workflow = script2workflow.quiet_generate_workflow(
+        submission["script_path"],
+        turns,
+        start_image,
+        save_tail_handoff=True,
+        image_name=image_name,
+        **options,
+        **(store_args or {}),
+    )
+    script2workflow.preflight_workflow(workflow, options.get("models_dir"))
+    run_id = (
+        script2workflow.record_run(
+            history_db, "queue", submission["script_path"], workflow
+        )
+        if history_db
+        else None
+    )
+    # Marked running before it is queued: if the worker dies in between,
+    # poll_job finds the prompt unknown to the server and puts the job back
+    prompt_id = str(uuid.uuid4())
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'running', prompt_id = ?, run_id = ?, "
+            "started_at = ? WHERE id = ?",
+            (prompt_id, run_id, datetime.now().isoformat(), job["id"]),
+        )
+    script2workflow.queue_prompt(server, workflow, prompt_id=prompt_id)
+    print(
+        f"Started submission {job['submission_id']} ({job['owner']}, priority "
+        f"{job['priority']}) turns {turns} as prompt {prompt_id}"
+    )
+    return script2workflow.workflow_model_signature(workflow["nodes"])
+
+
+def finish_job(connection, job, status, handoff=None, error=None):
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, handoff = ?, error = ?, finished_at = ? "
+            "WHERE id = ?",
+            (
+                status,
+                json.dumps(handoff) if handoff else None,
+                error,
+                datetime.now().isoformat(),
+                job["id"],
+            ),
+        )
+        if status == "failed":
+            connection.execute(
+                "UPDATE submissions SET status = 'failed', error = ? WHERE id = ?",
+                (error, job["submission_id"]),
+            )
+            connection.execute(
+                "UPDATE jobs SET status = 'cancelled' "
+                "WHERE submission_id = ? AND status = 'pending'",
+                (job["submission_id"],),
+            )
+        elif not connection.execute(
+            "SELECT 1 FROM jobs WHERE submission_id = ? AND status != 'done'",
+            (job["submission_id"],),
+        ).fetchone():
+            connection.execute(
+                "UPDATE submissions SET status = 'done' WHERE id = ?",
+                (job["submission_id"],),
+            )
+            print(f"Submission {job['submission_id']} done")
+
+
+def poll_job(connection, job, server, comfy_dir, history_db=None, download_dir=None):
+    entry = script2workflow.comfy_request(server, f"/history/{job['prompt_id']}").get(
+        job["prompt_id"]
+    )
+    if not entry or entry.get("status", {}).get("completed") is None:
+        queue = script2workflow.comfy_request(server, "/queue")
+        queued_ids = {
+            queued[1]
+            for queued in queue.get("queue_running", [])
+            + queue.get("queue_pending", [])
+        }
+        if not entry and job["prompt_id"] not in queued_ids:
+            # Never reached the server, or lost in a server restart
+            print(
+                f"Submission {job['submission_id']} prompt {job['prompt_id']} is "
+                "unknown to the server; requeueing its turns"
+            )
+            with connection:
+                connection.execute(
+                    "UPDATE jobs SET status = 'pending', prompt_id = NULL "
+                    "WHERE id = ?",
+                    (job["id"],),
+                )
+        return False
+    node_seconds = script2workflow.prompt_node_seconds(server, job["prompt_id"])
+    if history_db and job["run_id"] is not None:
+        script2workflow.record_submission(
+            history_db,
+            job["run_id"],
+            server,
+            job["prompt_id"],
+            entry,
+            comfy_dir,
+            node_seconds,
+        )
+    script2workflow.store_clip_outputs(entry, comfy_dir)
+    script2workflow.record_prompt_metrics(entry, node_seconds)
+    if download_dir:
+        script2workflow.download_outputs(
+            server, entry, os.path.join(download_dir, str(job["submission_id"]))
+        )
+    error = script2workflow.prompt_error(entry)
+    turns = json.loads(job["turns"])
+    if error is not None:
+        message = script2workflow.describe_prompt_error(job["prompt_id"], error)
+        print(f"Submission {job['submission_id']} turns {turns} failed: {message}")
+        finish_job(connection, job, "failed", error=message)
+        return True
+    save_id = script2workflow.tail_handoff_save_id(max(turns))
+    images = entry.get("outputs", {}).get(str(save_id), {}).get("images", [])
+    print(f"Submission {job['submission_id']} turns {turns} finished")
+    finish_job(connection, job, "done", handoff=images[0] if images else None)
+    return True
+
+
+def run_worker(
+    db_path,
+    server,
+    comfy_dir,
+    history_db=None,
+    clip_store=None,
+    clip_store_quota=script2workflow.CLIP_STORE_QUOTA_GB,
+    download_dir=None,
+    warmup=False,
+    poll_seconds=QUEUE_POLL_SECONDS,
+):
+    # One chunk is in flight at a time, so a new or higher-priority submission
+    # takes over the GPU at the next turn boundary. The worker remembers the
+    # models its last job loaded and prefers jobs that run on them
+    print(f"Render queue worker on {server} (queue: {db_path})")
+    resident, streak, warmups = None, 0, {}
+    store_args = (
+        {
+            "clip_store": clip_store,
+            "clip_store_quota": clip_store_quota,
+            "comfy_dir": comfy_dir,
+        }
+        if clip_store
+        else {}
+    )
+    with closing(open_queue(db_path)) as connection:
+        while True:
+            script2workflow.update_metric(
+                "script2workflow_queue_depth",
+                connection.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+                ).fetchone()[0],
+                "set",
+                queue="render_queue",
+            )
+            running = connection.execute(
+                "SELECT jobs.*, submissions.owner, submissions.priority FROM jobs "
+                "JOIN submissions ON submissions.id = jobs.submission_id "
+                "WHERE jobs.status = 'running' ORDER BY jobs.started_at LIMIT 1"
+            ).fetchone()
+            if running:
+                try:
+                    finished = poll_job(
+                        connection, running, server, comfy_dir, history_db, download_dir
+                    )
+                except OSError as e:
+                    print(f"Server unreachable, retrying: {e}")
+                    finished = False
+                if not finished:
+                    time.sleep(poll_seconds)
+                continue
+            jobs = connection.execute(RUNNABLE_JOBS_QUERY).fetchall()
+            if not jobs:
+                time.sleep(poll_seconds)
+                continue
+            warmups = {
+                job["id"]: warmups[job["id"]] for job in jobs if job["id"] in warmups
+            }
+            job = pick_job(connection, jobs, resident, streak, warmups)
+            streak = streak + 1 if job["id"] != jobs[0]["id"] else 0
+            warmup_workflow, signature = job_warmup(connection, job, warmups)
+            warmups.pop(job["id"])
+            try:
+                if warmup and warmup_workflow and signature != resident:
+                    # The warm-up loads the models while the start frame is
+                    # staged and the job's workflow is built
+                    script2workflow.queue_prompt(server, warmup_workflow)
+                    print(
+                        f"Warming up {describe_signature(signature)} for "
+                        f"submission {job['submission_id']}"
+                    )
+                    resident = signature
+                job_signature = dispatch_job(
+                    connection, job, server, comfy_dir, history_db, store_args
+                )
+                script2workflow.update_metric(
+                    "script2workflow_cache_lookups_total",
+                    cache="resident_models",
+                    result="hit" if job_signature == resident else "miss",
+                )
+                # Turns loaded from the clip store load no models
+                if json.loads(job_signature)["unets"]:
+                    resident = job_signature
+            except OSError as e:
+                # The job stays pending, or running under a prompt the server
+                # never saw, which poll_job puts back
+                print(f"Server unreachable, retrying: {e}")
+                time.sleep(poll_seconds)
+            except (ValueError, RuntimeError) as e:
+                print(f"Submission {job['submission_id']} could not start: {e}")
+                finish_job(connection, job, "failed", error=str(e))
+
+
+def print_status(db_path):
+    with closing(open_queue(db_path)) as connection:
+        submissions = connection.execute(
+            "SELECT submissions.*, "
+            "SUM(jobs.status = 'done') AS done_jobs, COUNT(jobs.id) AS total_jobs, "
+            "MAX(CASE WHEN jobs.status = 'running' THEN jobs.turns END) AS running "
+            "FROM submissions JOIN jobs ON jobs.submission_id = submissions.id "
+            "GROUP BY submissions.id ORDER BY submissions.status = 'active' DESC, "
+            "submissions.priority DESC, submissions.created_at"
+        ).fetchall()
+    if not submissions:
+        print("Render queue is empty.")
+    for submission in submissions:
+        print(
+            f"#{submission['id']} {submission['status']:<9} "
+            f"{submission['owner']:<12} p{submission['priority']:<3} "
+            f"{submission['script_name']} {submission['done_jobs']}/"
+            f"{submission['total_jobs']} jobs"
+            + (
+                f", rendering turns {submission['running']}"
+                if submission["running"]
+                else ""
+            )
+            + (f", error: {submission['error']}" if submission["error"] else "")
+        )
+
+
+def cancel_submission(db_path, submission_id):
+    with closing(open_queue(db_path)) as connection, connection:
+        connection.execute(
+            "UPDATE submissions SET status = 'cancelled' WHERE id = ? "
+            "AND status = 'active'",
+            (submission_id,),
+        )
+        cancelled = connection.execute(
+            "UPDATE jobs SET status = 'cancelled' WHERE submission_id = ? "
+            "AND status = 'pending'",
+            (submission_id,),
+        ).rowcount
+    print(
+        f"Cancelled submission {submission_id} ({cancelled} pending job(s)); "
+        "a chunk already rendering is left to finish"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Share a ComfyUI server between scripts with a local priority queue."
+    )
+    parser.add_argument(
+        "--queue-db",
+        type=str,
+        default=RENDER_QUEUE_NAME,
+        help=f"Queue database (default: {RENDER_QUEUE_NAME})",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add_parser = commands.add_parser("add", help="Queue a script or a range of turns")
+    add_parser.add_argument("script_path", type=str, help="Path to the JSON script")
+    add_parser.add_argument(
+        "--owner", type=str, default=getpass.getuser(), help="Who the render is for"
+    )
+    add_parser.add_argument(
+        "--priority",
+        type=int,
+        default=DEFAULT_PRIORITY,
+        help="Higher runs first; equal priorities share the GPU across owners",
+    )
+    add_parser.add_argument("--turns", type=str, help="Turn or range, e.g. 3 or 1:4")
+    add_parser.add_argument("--image", type=str, help="Start image for the first turn")
+    add_parser.add_argument(
+        "--chunk-turns",
+        type=int,
+        default=DEFAULT_CHUNK_TURNS,
+        help="Turns per job; jobs of other submissions can run between chunks",
+    )
+    add_parser.add_argument(
+        "--accel",
+        type=str,
+        default="none",
+        choices=list(script2workflow.ACCEL_PROFILES),
+        help="Sampling acceleration profile",
+    )
+    add_parser.add_argument(
+        "--render-profile",
+        type=str,
+        default="native",
+        choices=list(script2workflow.RENDER_PROFILES),
+        help="Render resolution profile",
+    )
+    add_parser.add_argument(
+        "--interpolate", type=int, default=1, help="Frame interpolation multiplier"
+    )
+    add_parser.add_argument("--vram-budget", type=float, help="GPU memory in GB")
+    add_parser.add_argument(
+        "--models-dir", type=str, help="ComfyUI models folder for GGUF selection"
+    )
+
+    run_parser = commands.add_parser("run", help="Feed queued jobs to ComfyUI")
+    run_parser.add_argument(
+        "--server", type=str, default="http://127.0.0.1:8188", help="ComfyUI URL"
+    )
+    run_parser.add_argument(
+        "--comfy-dir",
+        type=str,
+        help="ComfyUI root folder, used to pass handoff frames between chunks; "
+        "without it handoffs are downloaded and uploaded over HTTP",
+    )
+    run_parser.add_argument(
+        "--download", type=str, help="Download finished clips into this folder"
+    )
+    run_parser.add_argument(
+        "--history-db",
+        type=str,
+        default=script2workflow.RUN_HISTORY_NAME,
+        help="Run history database",
+    )
+    run_parser.add_argument(
+        "--no-history", action="store_true", help="Do not record runs in the history"
+    )
+    run_parser.add_argument(
+        "--metrics-port", type=int, help="Serve Prometheus metrics on this port"
+    )
+    run_parser.add_argument(
+        "--warmup",
+        action="store_true",
+        help="Before a job that needs other models, queue a small still that "
+        "loads them while the job is being prepared",
+    )
+    run_parser.add_argument(
+        "--clip-store",
+        type=str,
+        help="Shared clip store; turns rendered before load from it instead",
+    )
+    run_parser.add_argument(
+        "--clip-store-quota",
+        type=float,
+        default=script2workflow.CLIP_STORE_QUOTA_GB,
+        help="Clip store size in GB before least recently used clips are evicted",
+    )
+
+    commands.add_parser("status", help="List submissions and their progress")
+    cancel_parser = commands.add_parser("cancel", help="Cancel a submission")
+    cancel_parser.add_argument("submission_id", type=int)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "add":
+            add_submission(
+                args.queue_db,
+                args.script_path,
+                args.owner,
+                args.priority,
+                script2workflow.parse_turns_range(args.turns) if args.turns else None,
+                args.image,
+                args.chunk_turns,
+                {
+                    "accel": args.accel,
+                    "render_profile": args.render_profile,
+                    "interpolate": args.interpolate,
+                    "vram_budget": args.vram_budget,
+                    "models_dir": args.models_dir,
+                },
+            )
+        elif args.command == "run":
+            if args.metrics_port:
+                script2workflow.start_metrics_server(args.metrics_port, [args.server])
+            run_worker(
+                args.queue_db,
+                args.server,
+                args.comfy_dir,
+                None if args.no_history else args.history_db,
+                args.clip_store,
+                args.clip_store_quota,
+                args.download,
+                args.warmup,
+            )
+        elif args.command == "status":
+            print_status(args.queue_db)
+        else:
+            cancel_submission(args.queue_db, args.submission_id)
+    except KeyboardInterrupt:
+        print("\nStopped")
+    except Exception as e:
+        print(f"\nAn error occurred: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -2,15 +2,144 @@ import json
 import os
 import sys
 import argparse
+import base64
 import copy
+import glob
+import hashlib
+import importlib
+import importlib.util
+import io
+import itertools
 import random
+import re
+import shutil
+import socket
+import sqlite3
+import ssl
+import struct
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, redirect_stdout
+from dataclasses import dataclass, field, fields, replace
 from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import MappingProxyType
 
 # --- CONSTANTS ---
 HORIZONTAL_SPACING = 3600
 NODE_ID_BASE_OFFSET = 1000
 
+# Node id layout of a turn, as offsets from the turn's base id (starting at 1)
+FIRST_TURN_I2V_NODE_KEYS = [
+    "vae_loader",
+    "clip_loader",
+    "unet_high",
+    "unet_low",
+    "sampler_high",
+    "sampler_low",
+    "lora_high",
+    "lora_low",
+    "prompt_pos",
+    "prompt_neg",
+    "i2v_latent",
+    "ksampler_high",
+    "ksampler_low",
+    "vram_cleanup_mid",
+    "vae_decode",
+    "vram_cleanup_final",
+    "ram_cleanup_final",
+    "load_image",
+    "ram_cleanup_mid",
+    "turn_video",
+    "image_scale",
+]
+T2V_TURN_NODE_KEYS = [
+    "vae_loader",
+    "clip_loader",
+    "unet_high",
+    "unet_low",
+    "sampler_high",
+    "sampler_low",
+    "lora_high",
+    "lora_low",
+    "prompt_pos",
+    "prompt_neg",
+    "empty_latent",
+    "ksampler_high",
+    "ksampler_low",
+    "vram_cleanup_mid",
+    "vae_decode",
+    "vram_cleanup_final",
+    "ram_cleanup_final",
+    "ram_cleanup_mid",
+    "turn_video",
+]
+I2V_TURN_NODE_KEYS = [
+    "vae_loader",
+    "clip_loader",
+    "unet_high",
+    "unet_low",
+    "sampler_high",
+    "sampler_low",
+    "lora_high",
+    "lora_low",
+    "prompt_pos",
+    "prompt_neg",
+    "i2v_latent",
+    "ksampler_high",
+    "ksampler_low",
+    "vram_cleanup_mid",
+    "vae_decode",
+    "vram_cleanup_final",
+    "ram_cleanup_final",
+    "select_image",
+    "batch_images",
+    "ram_cleanup_mid",
+    "turn_video",
+    "image_scale",
+]
+EXTRA_TURN_NODE_KEYS = [
+    "batch_split",
+    "scene_join",
+    "cond_batch_pos",
+    "cond_batch_neg",
+    "preview_vae_loader",
+    "load_latent",
+    "save_latent",
+    "save_handoff",
+]
+HIGH_NOISE_STAGE_KEYS = [
+    "unet_high",
+    "sampler_high",
+    "lora_high",
+    "ksampler_high",
+    "vram_cleanup_mid",
+    "ram_cleanup_mid",
+]
+LOW_NOISE_STAGE_KEYS = [
+    "unet_low",
+    "sampler_low",
+    "lora_low",
+    "ksampler_low",
+    "vram_cleanup_mid",
+    "ram_cleanup_mid",
+    "vae_decode",
+    "vram_cleanup_final",
+    "ram_cleanup_final",
+    "turn_video",
+]
+EXTRA_TURN_NODE_ID_OFFSET = 23
+LATENT_VIDEO_NODE_TYPES = [
+    "EmptyHunyuanLatentVideo",
+    "WanImageToVideo",
+    "WanFirstLastFrameToVideo",
+]
+
 # Default model and file names
 VAE_NAME = "wan_2.1_vae.safetensors"
 CLIP_GGUF_NAME = "umt5-xxl-encoder-Q5_K_S.gguf"
@@ -22,6 +151,7 @@ T2V_HIGH_NOISE_LORA = {
         "name": "Wan2.2-Lightning_T2V-v1.1-A14B-4steps-lora_HIGH_fp16.safetensors",
         "enabled": True,
         "strength": 1.2,
+        "strength_grid": [1.0, 1.4],
     },
     "2": {
         "name": "Wan2.2 v3 - T2V - Insta Girls - HIGH 14B.safetensors",
@@ -51,6 +181,7 @@ I2V_HIGH_NOISE_LORA = {
         "name": "Wan2.2-Lightning_I2V-A14B-4steps-lora_HIGH_fp16.safetensors",
         "enabled": True,
         "strength": 1.5,
+        "strength_grid": [1.2, 1.8],
     },
     "2": {
         "name": "Wan2.2 v3 - T2V - Insta Girls - HIGH 14B.safetensors",
@@ -64,6 +195,7 @@ I2V_LOW_NOISE_LORA = {
         "name": "Wan2.2-Lightning_I2V-A14B-4steps-lora_LOW_fp16.safetensors",
         "enabled": True,
         "strength": 1.1,
+        "strength_grid": [0.9, 1.3],
     },
     "2": {
         "name": "Wan2.2 v3 - T2V - Insta Girls - LOW - 14B.safetensors",
@@ -117,6 +249,393 @@ VIDEO_TRIM_TO_AUDIO = False
 UPSCALE_METHOD = "lanczos"
 UPSCALE_FACTOR = 2.0
 
+# Variant sweep parameters
+VARIANT_MODES = ["seed", "lora"]
+VARIANT_ID_OFFSET = 100
+VARIANT_ID_STRIDE = 20
+VARIANT_VERTICAL_SPACING = 1600
+
+# T2V batching parameters: prompts are stacked by the ConditioningBatch node
+# in custom_nodes/script2workflow_nodes, which has CONDITIONING_BATCH_INPUTS
+# fixed inputs
+T2V_BATCH_MAX_SIZE = 4
+CONDITIONING_BATCH_INPUTS = 8
+
+# Candidate selection parameters
+PREVIEW_VAE_NAME = "taew2_1.safetensors"
+LATENT_OUTPUT_DIR = "latents"
+
+# Latent checkpoint parameters
+HANDOFF_IMAGE_DIR = "handoff"
+LATENT_MANIFEST_SUFFIX = "_latents.json"
+CACHE_KEY_LENGTH = 16
+
+# Baked model parameters: UNets with their enabled LoRAs merged in, recorded in
+# a registry keyed by base model + LoRA set + strengths along with the base
+# quantization and the weight dtype the baked file is loaded with; each target
+# names the GenerationConfig fields of its UNet and LoRA stack. LoRAs are only
+# merged into unquantized weights, so a base must be one of BAKE_SOURCE_QUANTS
+BAKE_REGISTRY_NAME = "baked_models.json"
+BAKED_MODEL_DIR = "baked"
+BAKED_UNET_WEIGHT_DTYPE = "fp8_e4m3fn"
+BAKE_SOURCE_QUANTS = ["F32", "BF16", "F16"]
+BAKE_TARGETS = {
+    "t2v_high": ("t2v_high_noise_unet", "t2v_high_noise_lora"),
+    "t2v_low": ("t2v_low_noise_unet", "t2v_low_noise_lora"),
+    "i2v_high": ("i2v_high_noise_unet", "i2v_high_noise_lora"),
+    "i2v_low": ("i2v_low_noise_unet", "i2v_low_noise_lora"),
+}
+
+# Model inventory: ComfyUI model folders, the loader widgets that reference
+# them, and the on-disk cache of the scanned models tree
+MODEL_FOLDERS = {
+    "vae": ["vae"],
+    "clip": ["clip", "text_encoders"],
+    "unet": ["unet", "diffusion_models"],
+    "lora": ["loras"],
+    "upscale": ["upscale_models"],
+}
+MODEL_REFERENCES = {
+    "VAELoader": "vae",
+    "CLIPLoaderGGUF": "clip",
+    "UnetLoaderGGUF": "unet",
+    "UNETLoader": "unet",
+    "Power Lora Loader (rgthree)": "lora",
+    "UpscaleModelLoader": "upscale",
+}
+MODEL_INDEX_NAME = "model_index.json"
+
+# Node schema preflight: widget inputs are the primitive-typed inputs of a
+# ComfyUI object_info entry; the nodes below add or drop widgets at runtime, so
+# only their known widgets and links are checked
+OBJECT_INFO_NAME = "object_info.json"
+SCHEMA_WIDGET_TYPES = ["INT", "FLOAT", "STRING", "BOOLEAN", "COMBO"]
+SCHEMA_CONTROL_WIDGET_NAMES = ["seed", "noise_seed"]
+SCHEMA_DYNAMIC_NODES = [
+    "VHS_VideoCombine",
+    "Power Lora Loader (rgthree)",
+    "ImageBatchMulti",
+]
+
+# Server submission and OOM recovery: a turn that runs out of memory is
+# re-emitted, with the rest of the range, from the last saved handoff frame
+# with one more degradation step applied per retry
+SUBMIT_POLL_SECONDS = 2.0
+WATCH_POLL_SECONDS = 0.5
+# ComfyUI's history only has a prompt's start and end times, so per-node
+# durations are timed from the executing events on its /ws socket
+NODE_TIMING_CLIENT_ID = uuid.uuid4().hex
+NODE_TIMING_CONNECT_SECONDS = 10.0
+NODE_TIMING_SETTLE_SECONDS = 2.0
+NODE_TIMING_MAX_PROMPTS = 1000
+OOM_ERROR_MARKERS = ["outofmemoryerror", "out of memory", "allocation on device"]
+OOM_DEGRADATION_STEPS = [
+    "tiled-decode",
+    "lower-quant",
+    "aggressive-cleanup",
+    "shorter-length",
+]
+OOM_DEGRADED_BUDGET_SCALE = 0.5
+OOM_DECODE_TILING = [512, 64, 32, 4]
+CLEANUP_ID_OFFSET = 40
+CLEANUP_ID_LIMIT = VARIANT_ID_OFFSET
+
+# Pipeline mode: each turn is split at ksampler_high; the high-noise half runs
+# on one server and the low-noise half, decode and save on another, so each
+# GPU keeps its UNet loaded while independent segments overlap
+PIPELINE_TRANSFER_DIR = "pipeline_transfers"
+
+# Asset transfer: inputs are uploaded under a content-hash name, so a server
+# that already holds the bytes is not sent them again; outputs download in
+# parallel into .part files that resume with HTTP ranges
+ASSET_NAME_PREFIX = "asset_"
+DOWNLOAD_WORKERS = 4
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+DOWNLOAD_OUTPUT_KINDS = ["gifs"]
+
+# Clip store: finished turns are kept in a shared content-addressed folder,
+# keyed by a hash of everything upstream of the turn's frames; later renders
+# with the same inputs load the clip instead of sampling it again
+CLIP_STORE_QUOTA_GB = 50.0
+CLIP_STORE_ID_OFFSET = 31
+CLIP_FRAME_DIR = "clip_store"
+CLIP_HANDOFF_HASH_ID = "handoff"
+CLIP_META_NAME = "meta.json"
+CLIP_STORE_LOCK_NAME = "evict.lock"
+CLIP_STORE_LOCK_STALE_SECONDS = 600
+
+# Keyframe-first rendering: each turn's first frame is rendered on its own as
+# a single-frame T2V still, then every turn samples between its keyframe and
+# the next turn's, so turns no longer wait on each other
+KEYFRAME_ID_OFFSET = 34
+KEYFRAME_TURN_NODE_KEYS = ["load_end_image", "end_image_scale", "save_still"]
+KEYFRAME_LENGTH = 1
+KEYFRAME_IMAGE_DIR = "keyframes"
+KEYFRAME_MANIFEST_SUFFIX = "_keyframes.json"
+
+# Storyboard: one still per turn with fewer steps, saved as
+# storyboard/<script>/turn<NNN> so the files sort into a contact sheet
+STORYBOARD_STEPS = 6
+STORYBOARD_IMAGE_DIR = "storyboard"
+
+# Warm-up: a two-step still at a small size that loads the UNets, LoRAs and
+# encoders of a T2V or I2V job; ComfyUI keeps the loaded nodes cached for the
+# next prompt, so a job queued behind it finds its models resident
+WARMUP_STEPS = 2
+WARMUP_WIDTH = 256
+WARMUP_HEIGHT = 256
+WARMUP_IMAGE_DIR = "warmup"
+WARMUP_MODEL_KINDS = ["t2v", "i2v"]
+
+# Metrics: counters and gauges served in the Prometheus text format on
+# --metrics-port; node metrics are labelled with the turn and the ids key
+# (role) the turn builders gave the node
+METRICS_HOST = "127.0.0.1"
+METRICS_POLL_SECONDS = 5.0
+METRIC_TYPES = {
+    "script2workflow_server_up": ("gauge", "Whether the last ComfyUI poll succeeded"),
+    "script2workflow_queue_depth": ("gauge", "Prompts or jobs queued or running"),
+    "script2workflow_prompts_total": ("counter", "Finished prompts by status"),
+    "script2workflow_prompt_seconds": ("summary", "Prompt execution time"),
+    "script2workflow_stage_seconds": (
+        "summary",
+        "Node execution time by turn, role and stage (servers reporting per-node times)",
+    ),
+    "script2workflow_model_loads_total": (
+        "counter",
+        "Loader nodes that ran instead of coming from ComfyUI's cache",
+    ),
+    "script2workflow_cache_lookups_total": ("counter", "Cache lookups by result"),
+    "script2workflow_transfer_bytes_total": (
+        "counter",
+        "Bytes uploaded to or downloaded from ComfyUI",
+    ),
+    "script2workflow_oom_retries_total": (
+        "counter",
+        "Out-of-memory retries by the degradation applied",
+    ),
+    "script2workflow_vram_used_bytes": ("gauge", "VRAM in use at the last poll"),
+    "script2workflow_vram_high_water_bytes": ("gauge", "Highest VRAM use seen"),
+    "script2workflow_ram_used_bytes": ("gauge", "RAM in use at the last poll"),
+    "script2workflow_ram_high_water_bytes": ("gauge", "Highest RAM use seen"),
+}
+METRICS = {}
+METRICS_LOCK = threading.Lock()
+
+# Run history: every generated workflow and submission is recorded in a local
+# SQLite database; per-node timings from the server's executing events are
+# summed per stage
+RUN_HISTORY_NAME = "run_history.sqlite"
+HISTORY_STAGES = {
+    "UnetLoaderGGUF": "load",
+    "UNETLoader": "load",
+    "CLIPLoaderGGUF": "load",
+    "VAELoader": "load",
+    "UpscaleModelLoader": "load",
+    "CLIPTextEncode": "text_encode",
+    "KSamplerAdvanced": "sampling",
+    "VAEDecode": "decode",
+    "VAEDecodeTiled": "decode",
+    "RIFE VFI": "interpolation",
+    "FILM VFI": "interpolation",
+    "ImageUpscaleToSize (script2workflow)": "upscale",
+    "VHS_VideoCombine": "encode",
+    "SaveImage": "save",
+    "SaveLatent": "save",
+    "ModelSave": "save",
+}
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    script_name TEXT,
+    script_hash TEXT,
+    workflow_path TEXT,
+    turns TEXT,
+    turn_count INTEGER,
+    width INTEGER,
+    height INTEGER,
+    length INTEGER,
+    config_key TEXT,
+    config TEXT
+);
+CREATE TABLE IF NOT EXISTS turn_inputs (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    turn INTEGER NOT NULL,
+    input_hash TEXT,
+    seeds TEXT,
+    models TEXT,
+    loras TEXT,
+    PRIMARY KEY (run_id, turn)
+);
+CREATE TABLE IF NOT EXISTS node_turns (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    node_id INTEGER NOT NULL,
+    turn INTEGER,
+    node_type TEXT,
+    PRIMARY KEY (run_id, node_id)
+);
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    server TEXT,
+    prompt_id TEXT,
+    status TEXT,
+    error TEXT,
+    completed_at TEXT,
+    total_seconds REAL
+);
+CREATE TABLE IF NOT EXISTS stage_timings (
+    submission_id INTEGER NOT NULL REFERENCES submissions(id),
+    turn INTEGER,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outputs (
+    submission_id INTEGER NOT NULL REFERENCES submissions(id),
+    node_id INTEGER,
+    turn INTEGER,
+    kind TEXT,
+    path TEXT,
+    sha256 TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_script ON runs (script_name, script_hash);
+CREATE INDEX IF NOT EXISTS runs_resolution ON runs (width, height, length);
+CREATE INDEX IF NOT EXISTS turn_inputs_turn ON turn_inputs (turn);
+CREATE INDEX IF NOT EXISTS turn_inputs_hash ON turn_inputs (input_hash);
+CREATE INDEX IF NOT EXISTS submissions_run ON submissions (run_id);
+CREATE INDEX IF NOT EXISTS stage_timings_submission ON stage_timings (submission_id);
+CREATE INDEX IF NOT EXISTS outputs_turn ON outputs (turn, kind);
+CREATE INDEX IF NOT EXISTS outputs_sha256 ON outputs (sha256);
+"""
+
+# GGUF quantization selection: variants of each role's default model found in
+# a models directory are tried from best to worst quality until one fits
+# (the names are GenerationConfig fields)
+QUANT_ROLES = {
+    "high": ("unet", ["t2v_high_noise_unet", "i2v_high_noise_unet"]),
+    "low": ("unet", ["t2v_low_noise_unet", "i2v_low_noise_unet"]),
+    "text_encoder": ("clip", ["clip_gguf_name"]),
+}
+QUANT_PATTERN = re.compile(
+    r"[-_.](F32|BF16|F16|Q\d_K(?:_[SML])?|Q\d_\d)(?=\.gguf$)", re.IGNORECASE
+)
+QUANT_PREFERENCE = [
+    "F32",
+    "BF16",
+    "F16",
+    "Q8_0",
+    "Q6_K",
+    "Q5_K_M",
+    "Q5_K_S",
+    "Q5_1",
+    "Q5_0",
+    "Q4_K_M",
+    "Q4_K_S",
+    "Q4_1",
+    "Q4_0",
+    "Q3_K_L",
+    "Q3_K_M",
+    "Q3_K_S",
+    "Q2_K",
+]
+QUANT_BUDGET_FRACTION = 0.9
+SAMPLING_FIXED_BYTES = 1 * 1024**3
+SAMPLING_BYTES_PER_TOKEN = 40 * 1024
+TEXT_ENCODE_FIXED_BYTES = 1 * 1024**3
+
+# Tiled VAE decode parameters (rough VRAM model of the Wan 2.1 VAE decode)
+VAE_DECODE_BYTES_PER_VOXEL = 200
+VAE_DECODE_FIXED_BYTES = 1.5 * 1024**3
+VAE_DECODE_BUDGET_FRACTION = 0.85
+VAE_DECODE_TILE_SIZES = [1024, 768, 512, 384, 256, 192, 128]
+VAE_DECODE_TEMPORAL_SIZES = [64, 48, 32, 24, 16, 8]
+
+# Sampling acceleration profiles: accelerator nodes inserted, in order, between
+# each KSamplerAdvanced and the model feeding it (a Power Lora Loader, or the
+# UNet loader once baked models replace the LoRAs). A turn may pick its own
+# profile with an "accel" key in the script.
+ACCEL_ID_OFFSET = 800
+ACCEL_ID_STRIDE = 10
+INTERP_ID_OFFSET = 900
+UPSCALE_ID_OFFSET = 940
+SAGE_ATTENTION = ("PathchSageAttentionKJ", ["auto"])
+TORCH_COMPILE = (
+    "TorchCompileModelWanVideoV2",
+    ["inductor", False, "default", False, True, 64],
+)
+ACCEL_PROFILES = {
+    "none": {"high": [], "low": []},
+    "sage": {"high": [SAGE_ATTENTION], "low": [SAGE_ATTENTION]},
+    "sage-compile": {
+        "high": [SAGE_ATTENTION, TORCH_COMPILE],
+        "low": [SAGE_ATTENTION, TORCH_COMPILE],
+    },
+    "teacache": {
+        "high": [
+            SAGE_ATTENTION,
+            ("WanVideoTeaCacheKJ", [0.15, 0.1, 1.0, "offload_device", "14B"]),
+        ],
+        "low": [
+            SAGE_ATTENTION,
+            ("WanVideoTeaCacheKJ", [0.25, 0.0, 1.0, "offload_device", "14B"]),
+        ],
+    },
+    "magcache": {
+        "high": [
+            SAGE_ATTENTION,
+            ("MagCache", ["wan2.1_t2v_14B", 0.12, 0.2, 4, 0, -1]),
+        ],
+        "low": [
+            SAGE_ATTENTION,
+            ("MagCache", ["wan2.1_t2v_14B", 0.24, 0.0, 6, 0, -1]),
+        ],
+    },
+}
+
+# Cache coefficients are fitted per Wan model: the model type widget of each
+# cache node is set from the turn's kind, and I2V turns also pick the 480p or
+# 720p fit by their render resolution
+ACCEL_MODEL_TYPES = {
+    "WanVideoTeaCacheKJ": (
+        4,
+        {"t2v": "14B", "i2v_480": "i2v_480", "i2v_720": "i2v_720"},
+    ),
+    "MagCache": (
+        0,
+        {
+            "t2v": "wan2.1_t2v_14B",
+            "i2v_480": "wan2.1_i2v_480p_14B",
+            "i2v_720": "wan2.1_i2v_720p_14B",
+        },
+    ),
+}
+ACCEL_I2V_NODE_TYPES = ["WanImageToVideo", "WanFirstLastFrameToVideo"]
+ACCEL_I2V_720_MIN_SIDE = 720
+
+# Frame interpolation parameters: node type and widgets (with the multiplier
+# filled in) for each interpolation model
+INTERPOLATION_MODELS = {
+    "rife": ("RIFE VFI", ["rife47.pth", 10, None, True, True, 1.0]),
+    "film": ("FILM VFI", ["film_net_fp32.pt", 10, None]),
+}
+INTERPOLATION_MULTIPLIER_INDEX = 2
+
+# Render profiles: sample at a lower native resolution, then upscale the decoded
+# frames with a model upscaler in bounded frame batches before saving
+RENDER_PROFILES = {
+    "native": None,
+    "480p-to-720p": {"render": (832, 480), "output": (1280, 720)},
+    "480p-to-1080p": {"render": (832, 480), "output": (1920, 1080)},
+}
+POST_UPSCALE_MODEL = "4x-UltraSharp.pth"
+POST_UPSCALE_BATCH_FRAMES = 8
+POST_UPSCALE_METHOD = "lanczos"
+POST_UPSCALE_CROP = "center"
+
 NODE_TEMPLATES = {
     "VAELoader": {
         "type": "VAELoader",
@@ -546,6 +1065,77 @@ NODE_TEMPLATES = {
         },
         "widgets_values": [],
     },
+    "WanFirstLastFrameToVideo": {
+        "type": "WanFirstLastFrameToVideo",
+        "size": [492.73, 250],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "positive", "type": "CONDITIONING", "link": None},
+            {"name": "negative", "type": "CONDITIONING", "link": None},
+            {"name": "vae", "type": "VAE", "link": None},
+            {
+                "name": "clip_vision_start_image",
+                "type": "CLIP_VISION_OUTPUT",
+                "shape": 7,
+                "link": None,
+            },
+            {
+                "name": "clip_vision_end_image",
+                "type": "CLIP_VISION_OUTPUT",
+                "shape": 7,
+                "link": None,
+            },
+            {"name": "start_image", "type": "IMAGE", "shape": 7, "link": None},
+            {"name": "end_image", "type": "IMAGE", "shape": 7, "link": None},
+            {"name": "width", "type": "INT", "widget": {"name": "width"}, "link": None},
+            {
+                "name": "height",
+                "type": "INT",
+                "widget": {"name": "height"},
+                "link": None,
+            },
+            {
+                "name": "length",
+                "type": "INT",
+                "widget": {"name": "length"},
+                "link": None,
+            },
+            {
+                "name": "batch_size",
+                "type": "INT",
+                "widget": {"name": "batch_size"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {
+                "name": "positive",
+                "type": "CONDITIONING",
+                "links": [],
+                "localized_name": "positive",
+            },
+            {
+                "name": "negative",
+                "type": "CONDITIONING",
+                "links": [],
+                "localized_name": "negative",
+            },
+            {
+                "name": "latent",
+                "type": "LATENT",
+                "links": [],
+                "localized_name": "latent",
+            },
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.47",
+            "Node name for S&R": "WanFirstLastFrameToVideo",
+        },
+        "widgets_values": [],
+    },
     "ImageBatchMulti": {
         "type": "ImageBatchMulti",
         "size": [270, 102],
@@ -910,702 +1500,5288 @@ NODE_TEMPLATES = {
         },
         "widgets_values": [],
     },
-}
-
-
-def parse_turns_range(turns_str):
-    if ":" in turns_str:
-        start, end = turns_str.split(":", 1)
-        return list(range(int(start), int(end) + 1))
-    else:
-        return [int(turns_str)]
-
-
-def create_multi_lora_config(lora_dict):
-    widgets_values = [{}, {"type": "PowerLoraLoaderHeaderWidget"}]
-    for lora_config in lora_dict.values():
-        if lora_config.get("enabled", True):
-            widgets_values.append(
-                {
-                    "on": True,
-                    "lora": lora_config["name"],
-                    "strength": lora_config["strength"],
-                    "strengthTwo": None,
-                }
-            )
-    widgets_values.extend([{}, ""])
-    return widgets_values
-
-
-def create_node(node_type, node_id, pos, widgets_override=None, title=None):
-    if node_type not in NODE_TEMPLATES:
-        raise ValueError(f"Node type '{node_type}' not found in templates.")
-
-    node = copy.deepcopy(NODE_TEMPLATES[node_type])
-    node["id"] = node_id
-    node["pos"] = pos
-
-    if widgets_override is not None:
-        node["widgets_values"] = widgets_override
-
-    if "outputs" in node:
-        for output in node["outputs"]:
-            if "links" in output and output["links"] is not None:
-                output["links"] = []
-
-    if title is not None:
-        node["title"] = title
-
-    if node_type == "CLIPTextEncode":
-        if title and "Positive" in title:
-            node["color"] = "#232"
-            node["bgcolor"] = "#353"
-        elif title and "Negative" in title:
-            node["color"] = "#322"
-            node["bgcolor"] = "#533"
-
-    return node
-
-
-def create_first_turn_i2v(
-    turn_idx, positive_prompt, negative_prompt, image_filename, workflow_name
-):
-    nodes = []
-    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
-    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
-
-    if FIRST_SAMPLER_NOISE_SEED == -1:
-        noise_seed_value = random.randint(0, 2**32 - 1)
-    else:
-        noise_seed_value = FIRST_SAMPLER_NOISE_SEED
-
-    ids = {
-        "vae_loader": base_id + 1,
-        "clip_loader": base_id + 2,
-        "unet_high": base_id + 3,
-        "unet_low": base_id + 4,
-        "sampler_high": base_id + 5,
-        "sampler_low": base_id + 6,
-        "lora_high": base_id + 7,
-        "lora_low": base_id + 8,
-        "prompt_pos": base_id + 9,
-        "prompt_neg": base_id + 10,
-        "i2v_latent": base_id + 11,
-        "ksampler_high": base_id + 12,
-        "ksampler_low": base_id + 13,
-        "vram_cleanup_mid": base_id + 14,
-        "vae_decode": base_id + 15,
-        "vram_cleanup_final": base_id + 16,
-        "ram_cleanup_final": base_id + 17,
-        "load_image": base_id + 18,
-        "ram_cleanup_mid": base_id + 19,
-        "turn_video": base_id + 20,
-        "image_scale": base_id + 21,
-    }
-
-    high_lora_config = create_multi_lora_config(I2V_HIGH_NOISE_LORA)
-    low_lora_config = create_multi_lora_config(I2V_LOW_NOISE_LORA)
-
-    nodes.extend(
-        [
-            create_node("VAELoader", ids["vae_loader"], [x_pos, 300], [VAE_NAME]),
-            create_node(
-                "CLIPLoaderGGUF",
-                ids["clip_loader"],
-                [x_pos, 400],
-                [CLIP_GGUF_NAME, "wan"],
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_high"], [x_pos, 100], [I2V_HIGH_NOISE_UNET]
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_low"], [x_pos, 200], [I2V_LOW_NOISE_UNET]
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_high"],
-                [x_pos + 550, 100],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_low"],
-                [x_pos + 550, 200],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_high"],
-                [x_pos, 500],
-                high_lora_config,
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_low"],
-                [x_pos, 650],
-                low_lora_config,
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_pos"],
-                [x_pos, 900],
-                [positive_prompt],
-                "Positive Prompt",
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_neg"],
-                [x_pos, 1050],
-                [negative_prompt],
-                "Negative Prompt",
-            ),
-            create_node(
-                "LoadImage", ids["load_image"], [x_pos - 400, 1200], [image_filename]
-            ),
-            create_node(
-                "ImageScaleBy",
-                ids["image_scale"],
-                [x_pos - 200, 1200],
-                [UPSCALE_METHOD, UPSCALE_FACTOR],
-            ),
-            create_node(
-                "WanImageToVideo",
-                ids["i2v_latent"],
-                [x_pos, 1200],
-                [VIDEO_WIDTH, VIDEO_HEIGHT, VIDEO_LENGTH, VIDEO_BATCH_SIZE],
-            ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_high"],
-                [x_pos + 900, 300],
-                [
-                    "enable",
-                    noise_seed_value,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_HIGH,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    I2V_HIGH_START_STEP,
-                    I2V_HIGH_END_STEP,
-                    "enable",
-                ],
-            ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_low"],
-                [x_pos + 1200, 300],
-                [
-                    "disable",
-                    1,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_LOW,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    I2V_LOW_START_STEP,
-                    I2V_LOW_END_STEP,
-                    "disable",
-                ],
-            ),
-            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
-            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
-            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
+    "ImageFromBatch": {
+        "type": "ImageFromBatch",
+        "size": [270, 82],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "image", "type": "IMAGE", "link": None},
+            {
+                "name": "batch_index",
+                "type": "INT",
+                "widget": {"name": "batch_index"},
+                "link": None,
+            },
+            {
+                "name": "length",
+                "type": "INT",
+                "widget": {"name": "length"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "IMAGE", "type": "IMAGE", "links": [], "localized_name": "IMAGE"}
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "ImageFromBatch",
+        },
+        "widgets_values": [],
+    },
+    "ConditioningBatch (script2workflow)": {
+        "type": "ConditioningBatch (script2workflow)",
+        "size": [270, 102],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {
+                "name": f"conditioning_{i}",
+                "type": "CONDITIONING",
+                **({"shape": 7} if i > 1 else {}),
+                "link": None,
+            }
+            for i in range(1, CONDITIONING_BATCH_INPUTS + 1)
+        ],
+        "outputs": [
+            {
+                "name": "CONDITIONING",
+                "type": "CONDITIONING",
+                "links": [],
+                "localized_name": "CONDITIONING",
+            }
+        ],
+        "properties": {
+            "cnr_id": "script2workflow_nodes",
+            "ver": "1.0.0",
+            "Node name for S&R": "ConditioningBatch (script2workflow)",
+        },
+        "widgets_values": [],
+    },
+    "VAEDecodeTiled": {
+        "type": "VAEDecodeTiled",
+        "size": [270, 150],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "samples", "type": "LATENT", "link": None},
+            {"name": "vae", "type": "VAE", "link": None},
+            {
+                "name": "tile_size",
+                "type": "INT",
+                "widget": {"name": "tile_size"},
+                "link": None,
+            },
+            {
+                "name": "overlap",
+                "type": "INT",
+                "widget": {"name": "overlap"},
+                "link": None,
+            },
+            {
+                "name": "temporal_size",
+                "type": "INT",
+                "widget": {"name": "temporal_size"},
+                "link": None,
+            },
+            {
+                "name": "temporal_overlap",
+                "type": "INT",
+                "widget": {"name": "temporal_overlap"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "IMAGE", "type": "IMAGE", "links": [], "localized_name": "IMAGE"}
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "VAEDecodeTiled",
+        },
+        "color": "#323",
+        "bgcolor": "#535",
+        "widgets_values": [],
+    },
+    "PathchSageAttentionKJ": {
+        "type": "PathchSageAttentionKJ",
+        "size": [315, 58],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "model", "type": "MODEL", "link": None},
+            {
+                "name": "sage_attention",
+                "type": "COMBO",
+                "widget": {"name": "sage_attention"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "MODEL", "type": "MODEL", "links": [], "localized_name": "MODEL"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-kjnodes",
+            "ver": "2f7300dc546ec2d36fa8b0feebe493d41026524c",
+            "Node name for S&R": "PathchSageAttentionKJ",
+        },
+        "widgets_values": [],
+    },
+    "WanVideoTeaCacheKJ": {
+        "type": "WanVideoTeaCacheKJ",
+        "size": [315, 154],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "model", "type": "MODEL", "link": None},
+            {
+                "name": "rel_l1_thresh",
+                "type": "FLOAT",
+                "widget": {"name": "rel_l1_thresh"},
+                "link": None,
+            },
+            {
+                "name": "start_percent",
+                "type": "FLOAT",
+                "widget": {"name": "start_percent"},
+                "link": None,
+            },
+            {
+                "name": "end_percent",
+                "type": "FLOAT",
+                "widget": {"name": "end_percent"},
+                "link": None,
+            },
+            {
+                "name": "cache_device",
+                "type": "COMBO",
+                "widget": {"name": "cache_device"},
+                "link": None,
+            },
+            {
+                "name": "coefficients",
+                "type": "COMBO",
+                "widget": {"name": "coefficients"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "model", "type": "MODEL", "links": [], "localized_name": "model"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-kjnodes",
+            "ver": "2f7300dc546ec2d36fa8b0feebe493d41026524c",
+            "Node name for S&R": "WanVideoTeaCacheKJ",
+        },
+        "widgets_values": [],
+    },
+    "MagCache": {
+        "type": "MagCache",
+        "size": [315, 178],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "model", "type": "MODEL", "link": None},
+            {
+                "name": "model_type",
+                "type": "COMBO",
+                "widget": {"name": "model_type"},
+                "link": None,
+            },
+            {
+                "name": "magcache_thresh",
+                "type": "FLOAT",
+                "widget": {"name": "magcache_thresh"},
+                "link": None,
+            },
+            {
+                "name": "retention_ratio",
+                "type": "FLOAT",
+                "widget": {"name": "retention_ratio"},
+                "link": None,
+            },
+            {
+                "name": "magcache_K",
+                "type": "INT",
+                "widget": {"name": "magcache_K"},
+                "link": None,
+            },
+            {
+                "name": "start_step",
+                "type": "INT",
+                "widget": {"name": "start_step"},
+                "link": None,
+            },
+            {
+                "name": "end_step",
+                "type": "INT",
+                "widget": {"name": "end_step"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "model", "type": "MODEL", "links": [], "localized_name": "model"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-magcache",
+            "Node name for S&R": "MagCache",
+            "aux_id": "Zehong-Ma/ComfyUI-MagCache",
+        },
+        "widgets_values": [],
+    },
+    "TorchCompileModelWanVideoV2": {
+        "type": "TorchCompileModelWanVideoV2",
+        "size": [315, 178],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "model", "type": "MODEL", "link": None},
+            {
+                "name": "backend",
+                "type": "COMBO",
+                "widget": {"name": "backend"},
+                "link": None,
+            },
+            {
+                "name": "fullgraph",
+                "type": "BOOLEAN",
+                "widget": {"name": "fullgraph"},
+                "link": None,
+            },
+            {
+                "name": "mode",
+                "type": "COMBO",
+                "widget": {"name": "mode"},
+                "link": None,
+            },
+            {
+                "name": "dynamic",
+                "type": "BOOLEAN",
+                "widget": {"name": "dynamic"},
+                "link": None,
+            },
+            {
+                "name": "compile_transformer_blocks_only",
+                "type": "BOOLEAN",
+                "widget": {"name": "compile_transformer_blocks_only"},
+                "link": None,
+            },
+            {
+                "name": "dynamo_cache_size_limit",
+                "type": "INT",
+                "widget": {"name": "dynamo_cache_size_limit"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "MODEL", "type": "MODEL", "links": [], "localized_name": "MODEL"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-kjnodes",
+            "ver": "2f7300dc546ec2d36fa8b0feebe493d41026524c",
+            "Node name for S&R": "TorchCompileModelWanVideoV2",
+        },
+        "widgets_values": [],
+    },
+    "RIFE VFI": {
+        "type": "RIFE VFI",
+        "size": [315, 198],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "frames", "type": "IMAGE", "link": None},
+            {
+                "name": "optional_interpolation_states",
+                "type": "INTERPOLATION_STATES",
+                "shape": 7,
+                "link": None,
+            },
+            {
+                "name": "ckpt_name",
+                "type": "COMBO",
+                "widget": {"name": "ckpt_name"},
+                "link": None,
+            },
+            {
+                "name": "clear_cache_after_n_frames",
+                "type": "INT",
+                "widget": {"name": "clear_cache_after_n_frames"},
+                "link": None,
+            },
+            {
+                "name": "multiplier",
+                "type": "INT",
+                "widget": {"name": "multiplier"},
+                "link": None,
+            },
+            {
+                "name": "fast_mode",
+                "type": "BOOLEAN",
+                "widget": {"name": "fast_mode"},
+                "link": None,
+            },
+            {
+                "name": "ensemble",
+                "type": "BOOLEAN",
+                "widget": {"name": "ensemble"},
+                "link": None,
+            },
+            {
+                "name": "scale_factor",
+                "type": "FLOAT",
+                "widget": {"name": "scale_factor"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "IMAGE", "type": "IMAGE", "links": [], "localized_name": "IMAGE"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-frame-interpolation",
+            "ver": "1.0.7",
+            "Node name for S&R": "RIFE VFI",
+            "aux_id": "Fannovel16/ComfyUI-Frame-Interpolation",
+        },
+        "widgets_values": [],
+    },
+    "FILM VFI": {
+        "type": "FILM VFI",
+        "size": [315, 126],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "frames", "type": "IMAGE", "link": None},
+            {
+                "name": "optional_interpolation_states",
+                "type": "INTERPOLATION_STATES",
+                "shape": 7,
+                "link": None,
+            },
+            {
+                "name": "ckpt_name",
+                "type": "COMBO",
+                "widget": {"name": "ckpt_name"},
+                "link": None,
+            },
+            {
+                "name": "clear_cache_after_n_frames",
+                "type": "INT",
+                "widget": {"name": "clear_cache_after_n_frames"},
+                "link": None,
+            },
+            {
+                "name": "multiplier",
+                "type": "INT",
+                "widget": {"name": "multiplier"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "IMAGE", "type": "IMAGE", "links": [], "localized_name": "IMAGE"}
+        ],
+        "properties": {
+            "cnr_id": "comfyui-frame-interpolation",
+            "ver": "1.0.7",
+            "Node name for S&R": "FILM VFI",
+            "aux_id": "Fannovel16/ComfyUI-Frame-Interpolation",
+        },
+        "widgets_values": [],
+    },
+    "UpscaleModelLoader": {
+        "type": "UpscaleModelLoader",
+        "size": [315, 58],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {
+                "name": "model_name",
+                "type": "COMBO",
+                "widget": {"name": "model_name"},
+                "link": None,
+            }
+        ],
+        "outputs": [
+            {
+                "name": "UPSCALE_MODEL",
+                "type": "UPSCALE_MODEL",
+                "links": [],
+                "localized_name": "UPSCALE_MODEL",
+            }
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "UpscaleModelLoader",
+        },
+        "widgets_values": [],
+    },
+    "ImageUpscaleToSize (script2workflow)": {
+        "type": "ImageUpscaleToSize (script2workflow)",
+        "size": [315, 202],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "upscale_model", "type": "UPSCALE_MODEL", "link": None},
+            {"name": "images", "type": "IMAGE", "link": None},
+            {
+                "name": "upscale_method",
+                "type": "COMBO",
+                "widget": {"name": "upscale_method"},
+                "link": None,
+            },
+            {
+                "name": "width",
+                "type": "INT",
+                "widget": {"name": "width"},
+                "link": None,
+            },
+            {
+                "name": "height",
+                "type": "INT",
+                "widget": {"name": "height"},
+                "link": None,
+            },
+            {
+                "name": "crop",
+                "type": "COMBO",
+                "widget": {"name": "crop"},
+                "link": None,
+            },
+            {
+                "name": "per_batch",
+                "type": "INT",
+                "widget": {"name": "per_batch"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "IMAGE", "type": "IMAGE", "links": [], "localized_name": "IMAGE"}
+        ],
+        "properties": {
+            "cnr_id": "script2workflow_nodes",
+            "ver": "1.0.0",
+            "Node name for S&R": "ImageUpscaleToSize (script2workflow)",
+        },
+        "widgets_values": [],
+    },
+    "UNETLoader": {
+        "type": "UNETLoader",
+        "size": [315, 82],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {
+                "name": "unet_name",
+                "type": "COMBO",
+                "widget": {"name": "unet_name"},
+                "link": None,
+            },
+            {
+                "name": "weight_dtype",
+                "type": "COMBO",
+                "widget": {"name": "weight_dtype"},
+                "link": None,
+            },
+        ],
+        "outputs": [
+            {"name": "MODEL", "type": "MODEL", "links": [], "localized_name": "MODEL"}
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "UNETLoader",
+        },
+        "color": "#223",
+        "bgcolor": "#335",
+        "widgets_values": [],
+    },
+    "ModelSave": {
+        "type": "ModelSave",
+        "size": [315, 58],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "model", "type": "MODEL", "link": None},
+            {
+                "name": "filename_prefix",
+                "type": "STRING",
+                "widget": {"name": "filename_prefix"},
+                "link": None,
+            },
+        ],
+        "outputs": [],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "ModelSave",
+        },
+        "widgets_values": [],
+    },
+    "SaveLatent": {
+        "type": "SaveLatent",
+        "size": [315, 58],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {"name": "samples", "type": "LATENT", "link": None},
+            {
+                "name": "filename_prefix",
+                "type": "STRING",
+                "widget": {"name": "filename_prefix"},
+                "link": None,
+            },
+        ],
+        "outputs": [],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "SaveLatent",
+        },
+        "widgets_values": [],
+    },
+    "LoadLatent": {
+        "type": "LoadLatent",
+        "size": [315, 58],
+        "flags": {},
+        "order": 0,
+        "mode": 0,
+        "inputs": [
+            {
+                "name": "latent",
+                "type": "COMBO",
+                "widget": {"name": "latent"},
+                "link": None,
+            }
+        ],
+        "outputs": [
+            {
+                "name": "LATENT",
+                "type": "LATENT",
+                "links": [],
+                "localized_name": "LATENT",
+            }
+        ],
+        "properties": {
+            "cnr_id": "comfy-core",
+            "ver": "0.3.50",
+            "Node name for S&R": "LoadLatent",
+        },
+        "widgets_values": [],
+    },
+}
+
+
+def freeze_lora_stack(lora_dict):
+    return MappingProxyType(
+        {
+            key: MappingProxyType(
+                {
+                    name: tuple(value) if isinstance(value, list) else value
+                    for name, value in lora_config.items()
+                }
+            )
+            for key, lora_config in lora_dict.items()
+        }
+    )
+
+
+# Generation settings: the model names, LoRA stacks and render parameters above
+# as one frozen object that generate_workflow and the turn builders take as
+# config, so workflows with different settings can be built side by side in
+# one process. The module constants are the defaults.
+@dataclass(frozen=True)
+class GenerationConfig:
+    vae_name: str = VAE_NAME
+    clip_gguf_name: str = CLIP_GGUF_NAME
+    t2v_high_noise_unet: str = T2V_HIGH_NOISE_UNET
+    t2v_low_noise_unet: str = T2V_LOW_NOISE_UNET
+    t2v_high_noise_lora: dict = field(default_factory=T2V_HIGH_NOISE_LORA.copy)
+    t2v_low_noise_lora: dict = field(default_factory=T2V_LOW_NOISE_LORA.copy)
+    i2v_high_noise_unet: str = I2V_HIGH_NOISE_UNET
+    i2v_low_noise_unet: str = I2V_LOW_NOISE_UNET
+    i2v_high_noise_lora: dict = field(default_factory=I2V_HIGH_NOISE_LORA.copy)
+    i2v_low_noise_lora: dict = field(default_factory=I2V_LOW_NOISE_LORA.copy)
+    video_width: int = VIDEO_WIDTH
+    video_height: int = VIDEO_HEIGHT
+    video_length: int = VIDEO_LENGTH
+    video_batch_size: int = VIDEO_BATCH_SIZE
+    frame_rate: int = FRAME_RATE
+    model_sampling_shift: float = MODEL_SAMPLING_SHIFT
+    first_sampler_noise_seed: int = FIRST_SAMPLER_NOISE_SEED
+    noise_seed_mode: str = NOISE_SEED_MODE
+    sampler_steps_high: int = SAMPLER_STEPS_HIGH
+    sampler_steps_low: int = SAMPLER_STEPS_LOW
+    sampler_cfg: float = SAMPLER_CFG
+    sampler_name: str = SAMPLER_NAME
+    scheduler_name: str = SCHEDULER_NAME
+    t2v_high_start_step: int = T2V_HIGH_START_STEP
+    t2v_high_end_step: int = T2V_HIGH_END_STEP
+    t2v_low_start_step: int = T2V_LOW_START_STEP
+    t2v_low_end_step: int = T2V_LOW_END_STEP
+    i2v_high_start_step: int = I2V_HIGH_START_STEP
+    i2v_high_end_step: int = I2V_HIGH_END_STEP
+    i2v_low_start_step: int = I2V_LOW_START_STEP
+    i2v_low_end_step: int = I2V_LOW_END_STEP
+    image_select_index: str = IMAGE_SELECT_INDEX
+    image_select_error_flags: tuple = tuple(IMAGE_SELECT_ERROR_FLAGS)
+    batch_input_count: int = BATCH_INPUT_COUNT
+    video_filename_prefix: str = VIDEO_FILENAME_PREFIX
+    video_format: str = VIDEO_FORMAT
+    video_pixel_format: str = VIDEO_PIXEL_FORMAT
+    video_crf: int = VIDEO_CRF
+    video_loop_count: int = VIDEO_LOOP_COUNT
+    video_save_metadata: bool = VIDEO_SAVE_METADATA
+    video_pingpong: bool = VIDEO_PINGPONG
+    video_save_output: bool = VIDEO_SAVE_OUTPUT
+    video_trim_to_audio: bool = VIDEO_TRIM_TO_AUDIO
+
+    def __post_init__(self):
+        # Lists and LoRA stacks become read-only copies, so a config shared
+        # between threads cannot be changed through them either
+        for config_field in fields(self):
+            value = getattr(self, config_field.name)
+            if isinstance(value, list):
+                object.__setattr__(self, config_field.name, tuple(value))
+            elif isinstance(value, (dict, MappingProxyType)):
+                object.__setattr__(self, config_field.name, freeze_lora_stack(value))
+
+
+DEFAULT_CONFIG = GenerationConfig()
+
+
+def load_generation_config(config_path):
+    # A JSON object of GenerationConfig fields; the rest keep their defaults
+    if not os.path.exists(config_path):
+        raise ValueError(f"Generation config not found: {config_path}")
+    with open(config_path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    known_fields = [config_field.name for config_field in fields(GenerationConfig)]
+    unknown = sorted(set(overrides) - set(known_fields))
+    if unknown:
+        raise ValueError(
+            f"Unknown generation config fields {unknown} in {config_path}. "
+            f"Available fields: {known_fields}"
+        )
+    return replace(DEFAULT_CONFIG, **overrides)
+
+
+def copy_lora_stack(lora_dict):
+    return {key: dict(lora_config) for key, lora_config in lora_dict.items()}
+
+
+def parse_turns_range(turns_str):
+    if ":" in turns_str:
+        start, end = turns_str.split(":", 1)
+        return list(range(int(start), int(end) + 1))
+    else:
+        return [int(turns_str)]
+
+
+def create_multi_lora_config(lora_dict):
+    widgets_values = [{}, {"type": "PowerLoraLoaderHeaderWidget"}]
+    for lora_config in lora_dict.values():
+        if lora_config.get("enabled", True):
+            widgets_values.append(
+                {
+                    "on": True,
+                    "lora": lora_config["name"],
+                    "strength": lora_config["strength"],
+                    "strengthTwo": None,
+                }
+            )
+    widgets_values.extend([{}, ""])
+    return widgets_values
+
+
+def create_node(node_type, node_id, pos, widgets_override=None, title=None):
+    if node_type not in NODE_TEMPLATES:
+        raise ValueError(f"Node type '{node_type}' not found in templates.")
+
+    node = copy.deepcopy(NODE_TEMPLATES[node_type])
+    node["id"] = node_id
+    node["pos"] = pos
+
+    if widgets_override is not None:
+        node["widgets_values"] = widgets_override
+
+    if "outputs" in node:
+        for output in node["outputs"]:
+            if "links" in output and output["links"] is not None:
+                output["links"] = []
+
+    if title is not None:
+        node["title"] = title
+
+    if node_type == "CLIPTextEncode":
+        if title and "Positive" in title:
+            node["color"] = "#232"
+            node["bgcolor"] = "#353"
+        elif title and "Negative" in title:
+            node["color"] = "#322"
+            node["bgcolor"] = "#533"
+
+    return node
+
+
+def turn_node_ids(turn_idx, node_keys):
+    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
+    ids = {key: base_id + offset for offset, key in enumerate(node_keys, start=1)}
+    for offset, key in enumerate(EXTRA_TURN_NODE_KEYS, start=EXTRA_TURN_NODE_ID_OFFSET):
+        ids[key] = base_id + offset
+    for offset, key in enumerate(KEYFRAME_TURN_NODE_KEYS, start=KEYFRAME_ID_OFFSET):
+        ids[key] = base_id + offset
+    return ids
+
+
+def generate_noise_seed(offset=0, config=DEFAULT_CONFIG):
+    if config.first_sampler_noise_seed == -1:
+        return random.randint(0, 2**32 - 1)
+    return (config.first_sampler_noise_seed + offset) % 2**32
+
+
+def clone_subgraph(nodes, link_defs, node_ids, id_map, y_offset=0):
+    nodes_by_id = {node["id"]: node for node in nodes}
+    new_nodes = []
+    for node_id in node_ids:
+        node = copy.deepcopy(nodes_by_id[node_id])
+        node["id"] = id_map[node_id]
+        node["pos"] = [node["pos"][0], node["pos"][1] + y_offset]
+        new_nodes.append(node)
+
+    new_link_defs = []
+    for origin_id, origin_slot, target_id, target_slot, link_type in link_defs:
+        if target_id not in id_map:
+            continue
+        new_link_defs.append(
+            (
+                id_map.get(origin_id, origin_id),
+                origin_slot,
+                id_map[target_id],
+                target_slot,
+                link_type,
+            )
+        )
+
+    return new_nodes, new_link_defs
+
+
+def remove_nodes(nodes, link_defs, node_ids):
+    node_ids = set(node_ids)
+    nodes = [node for node in nodes if node["id"] not in node_ids]
+    link_defs = [
+        link_def
+        for link_def in link_defs
+        if link_def[0] not in node_ids and link_def[2] not in node_ids
+    ]
+    return nodes, link_defs
+
+
+def lora_strength_grid(lora_dict):
+    enabled = [
+        (key, lora_config)
+        for key, lora_config in lora_dict.items()
+        if lora_config.get("enabled", True)
+    ]
+    axes = [
+        lora_config.get("strength_grid", [lora_config["strength"]])
+        for _, lora_config in enabled
+    ]
+    grid = []
+    for strengths in itertools.product(*axes):
+        variant_dict = copy_lora_stack(lora_dict)
+        for (key, _), strength in zip(enabled, strengths):
+            variant_dict[key]["strength"] = strength
+        grid.append(variant_dict)
+    return grid
+
+
+def create_turn_variants(
+    turn_idx,
+    ids,
+    nodes,
+    link_defs,
+    variants,
+    variant_mode,
+    high_lora_dict,
+    low_lora_dict,
+    workflow_name,
+    config=DEFAULT_CONFIG,
+):
+    if variant_mode not in VARIANT_MODES:
+        raise ValueError(
+            f"Unknown variant mode '{variant_mode}'. Available modes: {VARIANT_MODES}"
+        )
+    max_variants = (ACCEL_ID_OFFSET - VARIANT_ID_OFFSET) // VARIANT_ID_STRIDE + 1
+    if variants > max_variants:
+        raise ValueError(
+            f"Too many variants requested ({variants}); at most {max_variants} fit in a turn."
+        )
+
+    branch_keys = [
+        "ksampler_high",
+        "vram_cleanup_mid",
+        "ram_cleanup_mid",
+        "ksampler_low",
+        "vae_decode",
+        "turn_video",
+    ]
+    lora_configs = []
+    if variant_mode == "lora":
+        branch_keys = ["lora_high", "lora_low"] + branch_keys
+        base_strengths = (high_lora_dict, low_lora_dict)
+        for high_dict in lora_strength_grid(high_lora_dict):
+            for low_dict in lora_strength_grid(low_lora_dict):
+                if (high_dict, low_dict) != base_strengths:
+                    lora_configs.append((high_dict, low_dict))
+        if len(lora_configs) < variants - 1:
+            print(
+                f"Warning: LoRA strength grid only yields {len(lora_configs)} "
+                f"extra variants for Turn {turn_idx}; requested {variants - 1}"
+            )
+            variants = len(lora_configs) + 1
+
+    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
+    variant_nodes, variant_link_defs = [], []
+
+    for variant_idx in range(2, variants + 1):
+        variant_base_id = (
+            base_id + VARIANT_ID_OFFSET + (variant_idx - 2) * VARIANT_ID_STRIDE
+        )
+        id_map = {
+            ids[key]: variant_base_id + offset
+            for offset, key in enumerate(branch_keys, start=1)
+        }
+        new_nodes, new_link_defs = clone_subgraph(
+            nodes,
+            link_defs,
+            [ids[key] for key in branch_keys],
+            id_map,
+            (variant_idx - 1) * VARIANT_VERTICAL_SPACING,
+        )
+        new_nodes_by_id = {node["id"]: node for node in new_nodes}
+
+        if variant_mode == "seed":
+            ksampler = new_nodes_by_id[id_map[ids["ksampler_high"]]]
+            ksampler["widgets_values"][1] = generate_noise_seed(
+                variant_idx - 1, config=config
+            )
+        else:
+            high_dict, low_dict = lora_configs[variant_idx - 2]
+            new_nodes_by_id[id_map[ids["lora_high"]]]["widgets_values"] = (
+                create_multi_lora_config(high_dict)
+            )
+            new_nodes_by_id[id_map[ids["lora_low"]]]["widgets_values"] = (
+                create_multi_lora_config(low_dict)
+            )
+
+        turn_video = new_nodes_by_id[id_map[ids["turn_video"]]]
+        turn_video["widgets_values"][
+            2
+        ] = f"{workflow_name}_turn{turn_idx}_v{variant_idx}"
+        turn_video["title"] = f"Save Turn {turn_idx} Variant {variant_idx} Video"
+
+        variant_nodes.extend(new_nodes)
+        variant_link_defs.extend(new_link_defs)
+
+    return variant_nodes, variant_link_defs
+
+
+def create_first_turn_i2v(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    image_filename,
+    workflow_name,
+    variants=1,
+    variant_mode="seed",
+    config=DEFAULT_CONFIG,
+):
+    nodes = []
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+
+    noise_seed_value = generate_noise_seed(config=config)
+
+    ids = turn_node_ids(turn_idx, FIRST_TURN_I2V_NODE_KEYS)
+
+    high_lora_config = create_multi_lora_config(config.i2v_high_noise_lora)
+    low_lora_config = create_multi_lora_config(config.i2v_low_noise_lora)
+
+    nodes.extend(
+        [
+            create_node(
+                "VAELoader", ids["vae_loader"], [x_pos, 300], [config.vae_name]
+            ),
+            create_node(
+                "CLIPLoaderGGUF",
+                ids["clip_loader"],
+                [x_pos, 400],
+                [config.clip_gguf_name, "wan"],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_high"],
+                [x_pos, 100],
+                [config.i2v_high_noise_unet],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_low"],
+                [x_pos, 200],
+                [config.i2v_low_noise_unet],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_high"],
+                [x_pos + 550, 100],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_low"],
+                [x_pos + 550, 200],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_high"],
+                [x_pos, 500],
+                high_lora_config,
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_low"],
+                [x_pos, 650],
+                low_lora_config,
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_pos"],
+                [x_pos, 900],
+                [positive_prompt],
+                "Positive Prompt",
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_neg"],
+                [x_pos, 1050],
+                [negative_prompt],
+                "Negative Prompt",
+            ),
+            create_node(
+                "LoadImage", ids["load_image"], [x_pos - 400, 1200], [image_filename]
+            ),
+            create_node(
+                "ImageScaleBy",
+                ids["image_scale"],
+                [x_pos - 200, 1200],
+                [UPSCALE_METHOD, UPSCALE_FACTOR],
+            ),
+            create_node(
+                "WanImageToVideo",
+                ids["i2v_latent"],
+                [x_pos, 1200],
+                [
+                    config.video_width,
+                    config.video_height,
+                    config.video_length,
+                    config.video_batch_size,
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_high"],
+                [x_pos + 900, 300],
+                [
+                    "enable",
+                    noise_seed_value,
+                    config.noise_seed_mode,
+                    config.sampler_steps_high,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.i2v_high_start_step,
+                    config.i2v_high_end_step,
+                    "enable",
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_low"],
+                [x_pos + 1200, 300],
+                [
+                    "disable",
+                    1,
+                    config.noise_seed_mode,
+                    config.sampler_steps_low,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.i2v_low_start_step,
+                    config.i2v_low_end_step,
+                    "disable",
+                ],
+            ),
+            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
+            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
+            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
+            create_node(
+                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
+            ),
+            create_node(
+                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
+            ),
+            create_node(
+                "VHS_VideoCombine",
+                ids["turn_video"],
+                [x_pos + 1800, 600],
+                [
+                    config.frame_rate,
+                    config.video_loop_count,
+                    f"{workflow_name}_turn{turn_idx}",
+                    config.video_format,
+                    config.video_pingpong,
+                    config.video_save_output,
+                    config.video_pixel_format,
+                    config.video_crf,
+                    config.video_save_metadata,
+                    config.video_trim_to_audio,
+                ],
+                f"Save Turn {turn_idx} Video",
+            ),
+        ]
+    )
+
+    link_defs = [
+        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
+        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
+        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
+        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
+        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
+        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
+        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
+        (ids["prompt_pos"], 0, ids["i2v_latent"], 0, "CONDITIONING"),
+        (ids["prompt_neg"], 0, ids["i2v_latent"], 1, "CONDITIONING"),
+        (ids["vae_loader"], 0, ids["i2v_latent"], 2, "VAE"),
+        (ids["load_image"], 0, ids["image_scale"], 0, "IMAGE"),
+        (ids["image_scale"], 0, ids["i2v_latent"], 4, "IMAGE"),
+        (ids["i2v_latent"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
+        (ids["i2v_latent"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
+        (ids["i2v_latent"], 1, ids["ksampler_high"], 2, "CONDITIONING"),
+        (ids["i2v_latent"], 1, ids["ksampler_low"], 2, "CONDITIONING"),
+        (ids["i2v_latent"], 2, ids["ksampler_high"], 3, "LATENT"),
+        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
+        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
+        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
+        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
+        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
+        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
+        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
+        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
+    ]
+
+    if variants > 1:
+        variant_nodes, variant_link_defs = create_turn_variants(
+            turn_idx,
+            ids,
+            nodes,
+            link_defs,
+            variants,
+            variant_mode,
+            config.i2v_high_noise_lora,
+            config.i2v_low_noise_lora,
+            workflow_name,
+            config=config,
+        )
+        nodes.extend(variant_nodes)
+        link_defs.extend(variant_link_defs)
+
+    return nodes, link_defs, ids["ram_cleanup_final"]
+
+
+def create_t2v_turn(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    workflow_name,
+    variants=1,
+    variant_mode="seed",
+    config=DEFAULT_CONFIG,
+):
+    nodes = []
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+
+    noise_seed_value = generate_noise_seed(config=config)
+
+    ids = turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)
+
+    high_lora_config = create_multi_lora_config(config.t2v_high_noise_lora)
+    low_lora_config = create_multi_lora_config(config.t2v_low_noise_lora)
+
+    nodes.extend(
+        [
+            create_node(
+                "VAELoader", ids["vae_loader"], [x_pos, 300], [config.vae_name]
+            ),
+            create_node(
+                "CLIPLoaderGGUF",
+                ids["clip_loader"],
+                [x_pos, 400],
+                [config.clip_gguf_name, "wan"],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_high"],
+                [x_pos, 100],
+                [config.t2v_high_noise_unet],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_low"],
+                [x_pos, 200],
+                [config.t2v_low_noise_unet],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_high"],
+                [x_pos + 550, 100],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_low"],
+                [x_pos + 550, 200],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_high"],
+                [x_pos, 500],
+                high_lora_config,
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_low"],
+                [x_pos, 650],
+                low_lora_config,
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_pos"],
+                [x_pos, 900],
+                [positive_prompt],
+                "Positive Prompt",
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_neg"],
+                [x_pos, 1050],
+                [negative_prompt],
+                "Negative Prompt",
+            ),
+            create_node(
+                "EmptyHunyuanLatentVideo",
+                ids["empty_latent"],
+                [x_pos, 1200],
+                [
+                    config.video_width,
+                    config.video_height,
+                    config.video_length,
+                    config.video_batch_size,
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_high"],
+                [x_pos + 900, 300],
+                [
+                    "enable",
+                    noise_seed_value,
+                    config.noise_seed_mode,
+                    config.sampler_steps_high,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.t2v_high_start_step,
+                    config.t2v_high_end_step,
+                    "enable",
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_low"],
+                [x_pos + 1200, 300],
+                [
+                    "disable",
+                    1,
+                    config.noise_seed_mode,
+                    config.sampler_steps_low,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.t2v_low_start_step,
+                    config.t2v_low_end_step,
+                    "disable",
+                ],
+            ),
+            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
+            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
+            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
+            create_node(
+                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
+            ),
+            create_node(
+                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
+            ),
+            create_node(
+                "VHS_VideoCombine",
+                ids["turn_video"],
+                [x_pos + 1800, 600],
+                [
+                    config.frame_rate,
+                    config.video_loop_count,
+                    f"{workflow_name}_turn{turn_idx}",
+                    config.video_format,
+                    config.video_pingpong,
+                    config.video_save_output,
+                    config.video_pixel_format,
+                    config.video_crf,
+                    config.video_save_metadata,
+                    config.video_trim_to_audio,
+                ],
+                f"Save Turn {turn_idx} Video",
+            ),
+        ]
+    )
+
+    link_defs = [
+        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
+        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
+        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
+        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
+        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
+        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
+        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
+        (ids["prompt_pos"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
+        (ids["prompt_pos"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
+        (ids["prompt_neg"], 0, ids["ksampler_high"], 2, "CONDITIONING"),
+        (ids["prompt_neg"], 0, ids["ksampler_low"], 2, "CONDITIONING"),
+        (ids["empty_latent"], 0, ids["ksampler_high"], 3, "LATENT"),
+        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
+        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
+        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
+        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
+        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
+        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
+        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
+        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
+    ]
+
+    if variants > 1:
+        variant_nodes, variant_link_defs = create_turn_variants(
+            turn_idx,
+            ids,
+            nodes,
+            link_defs,
+            variants,
+            variant_mode,
+            config.t2v_high_noise_lora,
+            config.t2v_low_noise_lora,
+            workflow_name,
+            config=config,
+        )
+        nodes.extend(variant_nodes)
+        link_defs.extend(variant_link_defs)
+
+    return nodes, link_defs, ids["ram_cleanup_final"]
+
+
+def create_i2v_turn(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    prev_turn_output_node_id,
+    workflow_name,
+    variants=1,
+    variant_mode="seed",
+    config=DEFAULT_CONFIG,
+):
+    nodes = []
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+
+    noise_seed_value = generate_noise_seed(config=config)
+
+    ids = turn_node_ids(turn_idx, I2V_TURN_NODE_KEYS)
+
+    high_lora_config = create_multi_lora_config(config.i2v_high_noise_lora)
+    low_lora_config = create_multi_lora_config(config.i2v_low_noise_lora)
+
+    nodes.extend(
+        [
+            create_node(
+                "VAELoader", ids["vae_loader"], [x_pos, 300], [config.vae_name]
+            ),
+            create_node(
+                "CLIPLoaderGGUF",
+                ids["clip_loader"],
+                [x_pos, 400],
+                [config.clip_gguf_name, "wan"],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_high"],
+                [x_pos, 100],
+                [config.i2v_high_noise_unet],
+            ),
+            create_node(
+                "UnetLoaderGGUF",
+                ids["unet_low"],
+                [x_pos, 200],
+                [config.i2v_low_noise_unet],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_high"],
+                [x_pos + 550, 100],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "ModelSamplingSD3",
+                ids["sampler_low"],
+                [x_pos + 550, 200],
+                [config.model_sampling_shift],
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_high"],
+                [x_pos, 500],
+                high_lora_config,
+            ),
+            create_node(
+                "Power Lora Loader (rgthree)",
+                ids["lora_low"],
+                [x_pos, 650],
+                low_lora_config,
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_pos"],
+                [x_pos, 900],
+                [positive_prompt],
+                "Positive Prompt",
+            ),
+            create_node(
+                "CLIPTextEncode",
+                ids["prompt_neg"],
+                [x_pos, 1050],
+                [negative_prompt],
+                "Negative Prompt",
+            ),
+            create_node(
+                "VHS_SelectImages",
+                ids["select_image"],
+                [x_pos - 400, 1200],
+                [config.image_select_index, *config.image_select_error_flags],
+            ),
+            create_node(
+                "ImageScaleBy",
+                ids["image_scale"],
+                [x_pos - 200, 1200],
+                [UPSCALE_METHOD, UPSCALE_FACTOR],
+            ),
+            create_node(
+                "WanImageToVideo",
+                ids["i2v_latent"],
+                [x_pos, 1200],
+                [
+                    config.video_width,
+                    config.video_height,
+                    config.video_length,
+                    config.video_batch_size,
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_high"],
+                [x_pos + 900, 300],
+                [
+                    "enable",
+                    noise_seed_value,
+                    config.noise_seed_mode,
+                    config.sampler_steps_high,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.i2v_high_start_step,
+                    config.i2v_high_end_step,
+                    "enable",
+                ],
+            ),
+            create_node(
+                "KSamplerAdvanced",
+                ids["ksampler_low"],
+                [x_pos + 1200, 300],
+                [
+                    "disable",
+                    1,
+                    config.noise_seed_mode,
+                    config.sampler_steps_low,
+                    config.sampler_cfg,
+                    config.sampler_name,
+                    config.scheduler_name,
+                    config.i2v_low_start_step,
+                    config.i2v_low_end_step,
+                    "disable",
+                ],
+            ),
+            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
+            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
+            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
+            create_node(
+                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
+            ),
+            create_node(
+                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
+            ),
+            create_node(
+                "ImageBatchMulti",
+                ids["batch_images"],
+                [x_pos + 1800, 300],
+                [config.batch_input_count, None],
+            ),
+            create_node(
+                "VHS_VideoCombine",
+                ids["turn_video"],
+                [x_pos + 1500, 700],
+                [
+                    config.frame_rate,
+                    config.video_loop_count,
+                    f"{workflow_name}_turn{turn_idx}",
+                    config.video_format,
+                    config.video_pingpong,
+                    config.video_save_output,
+                    config.video_pixel_format,
+                    config.video_crf,
+                    config.video_save_metadata,
+                    config.video_trim_to_audio,
+                ],
+                f"Save Turn {turn_idx} Video",
+            ),
+        ]
+    )
+
+    link_defs = [
+        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
+        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
+        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
+        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
+        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
+        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
+        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
+        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
+        (ids["prompt_pos"], 0, ids["i2v_latent"], 0, "CONDITIONING"),
+        (ids["prompt_neg"], 0, ids["i2v_latent"], 1, "CONDITIONING"),
+        (ids["vae_loader"], 0, ids["i2v_latent"], 2, "VAE"),
+        (ids["select_image"], 0, ids["image_scale"], 0, "IMAGE"),
+        (ids["image_scale"], 0, ids["i2v_latent"], 4, "IMAGE"),
+        (ids["i2v_latent"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
+        (ids["i2v_latent"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
+        (ids["i2v_latent"], 1, ids["ksampler_high"], 2, "CONDITIONING"),
+        (ids["i2v_latent"], 1, ids["ksampler_low"], 2, "CONDITIONING"),
+        (ids["i2v_latent"], 2, ids["ksampler_high"], 3, "LATENT"),
+        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
+        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
+        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
+        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
+        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
+        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
+        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
+        (prev_turn_output_node_id, 0, ids["select_image"], 0, "IMAGE"),
+        (prev_turn_output_node_id, 0, ids["batch_images"], 0, "IMAGE"),
+        (ids["ram_cleanup_final"], 0, ids["batch_images"], 1, "IMAGE"),
+        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
+    ]
+
+    if variants > 1:
+        variant_nodes, variant_link_defs = create_turn_variants(
+            turn_idx,
+            ids,
+            nodes,
+            link_defs,
+            variants,
+            variant_mode,
+            config.i2v_high_noise_lora,
+            config.i2v_low_noise_lora,
+            workflow_name,
+            config=config,
+        )
+        nodes.extend(variant_nodes)
+        link_defs.extend(variant_link_defs)
+
+    return nodes, link_defs, ids["batch_images"]
+
+
+def create_t2v_batch(batch_turns, workflow_name, config=DEFAULT_CONFIG):
+    first_idx, first_positive, first_negative = batch_turns[0]
+    nodes, link_defs, frames_node_id = create_t2v_turn(
+        first_idx, first_positive, first_negative, workflow_name, config=config
+    )
+    batch_size = len(batch_turns)
+    first_ids = turn_node_ids(first_idx, T2V_TURN_NODE_KEYS)
+    x_pos = (first_idx - 1) * HORIZONTAL_SPACING
+
+    nodes_by_id = {node["id"]: node for node in nodes}
+    nodes_by_id[first_ids["empty_latent"]]["widgets_values"][3] = batch_size
+    prompt_ids = {
+        "Positive Prompt": first_ids["prompt_pos"],
+        "Negative Prompt": first_ids["prompt_neg"],
+    }
+    turn_video_id = first_ids["turn_video"]
+    clip_source = (first_ids["lora_high"], 1)
+
+    nodes = [node for node in nodes if node["id"] != turn_video_id]
+    link_defs = [
+        link_def
+        for link_def in link_defs
+        if link_def[0] != turn_video_id and link_def[2] != turn_video_id
+    ]
+
+    cond_batch_ids = {
+        "Positive Prompt": first_ids["cond_batch_pos"],
+        "Negative Prompt": first_ids["cond_batch_neg"],
+    }
+    for y_offset, (title, cond_batch_id) in enumerate(cond_batch_ids.items()):
+        cond_batch = create_node(
+            "ConditioningBatch (script2workflow)",
+            cond_batch_id,
+            [x_pos + 550, 900 + y_offset * 150],
+            [],
+            f"Batched {title}s",
+        )
+        nodes.append(cond_batch)
+        link_defs = [
+            (
+                (cond_batch_id, 0, target_id, target_slot, link_type)
+                if origin_id == prompt_ids[title]
+                else (origin_id, origin_slot, target_id, target_slot, link_type)
+            )
+            for origin_id, origin_slot, target_id, target_slot, link_type in link_defs
+        ]
+        link_defs.append((prompt_ids[title], 0, cond_batch_id, 0, "CONDITIONING"))
+
+    outputs = {}
+    for batch_idx, (turn_idx, positive_prompt, negative_prompt) in enumerate(
+        batch_turns
+    ):
+        turn_x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+        ids = turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)
+        if batch_idx > 0:
+            nodes.extend(
+                [
+                    create_node(
+                        "CLIPTextEncode",
+                        ids["prompt_pos"],
+                        [turn_x_pos, 900],
+                        [positive_prompt],
+                        "Positive Prompt",
+                    ),
+                    create_node(
+                        "CLIPTextEncode",
+                        ids["prompt_neg"],
+                        [turn_x_pos, 1050],
+                        [negative_prompt],
+                        "Negative Prompt",
+                    ),
+                ]
+            )
+            link_defs.extend(
+                [
+                    (*clip_source, ids["prompt_pos"], 0, "CLIP"),
+                    (*clip_source, ids["prompt_neg"], 0, "CLIP"),
+                    (
+                        ids["prompt_pos"],
+                        0,
+                        cond_batch_ids["Positive Prompt"],
+                        batch_idx,
+                        "CONDITIONING",
+                    ),
+                    (
+                        ids["prompt_neg"],
+                        0,
+                        cond_batch_ids["Negative Prompt"],
+                        batch_idx,
+                        "CONDITIONING",
+                    ),
+                ]
+            )
+
+        nodes.extend(
+            [
+                create_node(
+                    "ImageFromBatch",
+                    ids["batch_split"],
+                    [turn_x_pos + 1800, 300],
+                    [batch_idx * config.video_length, config.video_length],
+                    f"Split Turn {turn_idx} Frames",
+                ),
+                create_node(
+                    "VHS_VideoCombine",
+                    ids["turn_video"],
+                    [turn_x_pos + 1800, 600],
+                    [
+                        config.frame_rate,
+                        config.video_loop_count,
+                        f"{workflow_name}_turn{turn_idx}",
+                        config.video_format,
+                        config.video_pingpong,
+                        config.video_save_output,
+                        config.video_pixel_format,
+                        config.video_crf,
+                        config.video_save_metadata,
+                        config.video_trim_to_audio,
+                    ],
+                    f"Save Turn {turn_idx} Video",
+                ),
+            ]
+        )
+        link_defs.extend(
+            [
+                (frames_node_id, 0, ids["batch_split"], 0, "IMAGE"),
+                (ids["batch_split"], 0, ids["turn_video"], 0, "IMAGE"),
+            ]
+        )
+        outputs[turn_idx] = ids["batch_split"]
+
+    return nodes, link_defs, outputs
+
+
+def create_scene_join(
+    turn_idx, prev_turn_output_node_id, turn_output_node_id, config=DEFAULT_CONFIG
+):
+    scene_join_id = turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)["scene_join"]
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    nodes = [
+        create_node(
+            "ImageBatchMulti",
+            scene_join_id,
+            [x_pos + 1800, 450],
+            [config.batch_input_count, None],
+            f"Join Turn {turn_idx} Scene",
+        )
+    ]
+    link_defs = [
+        (prev_turn_output_node_id, 0, scene_join_id, 0, "IMAGE"),
+        (turn_output_node_id, 0, scene_join_id, 1, "IMAGE"),
+    ]
+    return nodes, link_defs, scene_join_id
+
+
+def create_base_turn(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    workflow_name,
+    image_filename=None,
+    config=DEFAULT_CONFIG,
+):
+    if image_filename:
+        nodes, link_defs, _ = create_first_turn_i2v(
+            turn_idx,
+            positive_prompt,
+            negative_prompt,
+            image_filename,
+            workflow_name,
+            config=config,
+        )
+        return nodes, link_defs, turn_node_ids(turn_idx, FIRST_TURN_I2V_NODE_KEYS)
+    nodes, link_defs, _ = create_t2v_turn(
+        turn_idx, positive_prompt, negative_prompt, workflow_name, config=config
+    )
+    return nodes, link_defs, turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)
+
+
+def candidate_prefix(workflow_name, turn_idx):
+    return f"{workflow_name}_turn{turn_idx}_candidate"
+
+
+def create_candidate_previews(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    workflow_name,
+    candidates,
+    image_filename=None,
+    config=DEFAULT_CONFIG,
+):
+    max_candidates = (ACCEL_ID_OFFSET - VARIANT_ID_OFFSET) // VARIANT_ID_STRIDE
+    if not 1 <= candidates <= max_candidates:
+        raise ValueError(
+            f"Candidate count must be between 1 and {max_candidates}, got {candidates}"
+        )
+
+    nodes, link_defs, ids = create_base_turn(
+        turn_idx,
+        positive_prompt,
+        negative_prompt,
+        workflow_name,
+        image_filename,
+        config=config,
+    )
+    nodes, link_defs = remove_nodes(
+        nodes, link_defs, [ids[key] for key in LOW_NOISE_STAGE_KEYS]
+    )
+    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    prefix = candidate_prefix(workflow_name, turn_idx)
+
+    nodes.append(
+        create_node(
+            "VAELoader",
+            ids["preview_vae_loader"],
+            [x_pos + 550, 400],
+            [PREVIEW_VAE_NAME],
+            "Preview VAE",
+        )
+    )
+
+    for candidate_idx in range(1, candidates + 1):
+        candidate_base_id = (
+            base_id + VARIANT_ID_OFFSET + (candidate_idx - 1) * VARIANT_ID_STRIDE
+        )
+        y_offset = (candidate_idx - 1) * 400
+        candidate_ids = {
+            "ksampler_high": ids["ksampler_high"],
+            "save_latent": candidate_base_id + 2,
+            "preview_decode": candidate_base_id + 3,
+            "preview_video": candidate_base_id + 4,
+        }
+        if candidate_idx > 1:
+            candidate_ids["ksampler_high"] = candidate_base_id + 1
+            new_nodes, new_link_defs = clone_subgraph(
+                nodes,
+                link_defs,
+                [ids["ksampler_high"]],
+                {ids["ksampler_high"]: candidate_ids["ksampler_high"]},
+                y_offset,
+            )
+            new_nodes[0]["widgets_values"][1] = generate_noise_seed(
+                candidate_idx - 1, config=config
+            )
+            nodes.extend(new_nodes)
+            link_defs.extend(new_link_defs)
+
+        nodes.extend(
+            [
+                create_node(
+                    "SaveLatent",
+                    candidate_ids["save_latent"],
+                    [x_pos + 1200, 300 + y_offset],
+                    [f"{LATENT_OUTPUT_DIR}/{prefix}{candidate_idx}"],
+                ),
+                create_node(
+                    "VAEDecode",
+                    candidate_ids["preview_decode"],
+                    [x_pos + 1200, 450 + y_offset],
+                    [],
+                ),
+                create_node(
+                    "VHS_VideoCombine",
+                    candidate_ids["preview_video"],
+                    [x_pos + 1500, 300 + y_offset],
+                    [
+                        config.frame_rate,
+                        config.video_loop_count,
+                        f"{prefix}{candidate_idx}_preview",
+                        config.video_format,
+                        config.video_pingpong,
+                        config.video_save_output,
+                        config.video_pixel_format,
+                        config.video_crf,
+                        config.video_save_metadata,
+                        config.video_trim_to_audio,
+                    ],
+                    f"Preview Turn {turn_idx} Candidate {candidate_idx}",
+                ),
+            ]
+        )
+        link_defs.extend(
+            [
+                (
+                    candidate_ids["ksampler_high"],
+                    0,
+                    candidate_ids["save_latent"],
+                    0,
+                    "LATENT",
+                ),
+                (
+                    candidate_ids["ksampler_high"],
+                    0,
+                    candidate_ids["preview_decode"],
+                    0,
+                    "LATENT",
+                ),
+                (
+                    ids["preview_vae_loader"],
+                    0,
+                    candidate_ids["preview_decode"],
+                    1,
+                    "VAE",
+                ),
+                (
+                    candidate_ids["preview_decode"],
+                    0,
+                    candidate_ids["preview_video"],
+                    0,
+                    "IMAGE",
+                ),
+            ]
+        )
+
+    return nodes, link_defs
+
+
+def create_low_noise_refine(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    workflow_name,
+    latent_filename,
+    image_filename=None,
+    low_lora_dict=None,
+    config=DEFAULT_CONFIG,
+):
+    nodes, link_defs, ids = create_base_turn(
+        turn_idx,
+        positive_prompt,
+        negative_prompt,
+        workflow_name,
+        image_filename,
+        config=config,
+    )
+    if low_lora_dict is not None:
+        for node in nodes:
+            if node["id"] == ids["lora_low"]:
+                node["widgets_values"] = create_multi_lora_config(low_lora_dict)
+    removed_keys = HIGH_NOISE_STAGE_KEYS + (
+        ["empty_latent"] if "empty_latent" in ids else []
+    )
+    nodes, link_defs = remove_nodes(
+        nodes, link_defs, [ids[key] for key in removed_keys]
+    )
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+
+    nodes.append(
+        create_node(
+            "LoadLatent",
+            ids["load_latent"],
+            [x_pos + 900, 300],
+            [latent_filename],
+            "Load High-Noise Latent",
+        )
+    )
+    link_defs.extend(
+        [
+            (ids["clip_loader"], 0, ids["prompt_pos"], 0, "CLIP"),
+            (ids["clip_loader"], 0, ids["prompt_neg"], 0, "CLIP"),
+            (ids["load_latent"], 0, ids["ksampler_low"], 3, "LATENT"),
+        ]
+    )
+
+    return nodes, link_defs
+
+
+def keyframe_prefix(workflow_name, turn_idx):
+    return f"{KEYFRAME_IMAGE_DIR}/{workflow_name}_turn{turn_idx}_keyframe"
+
+
+def create_turn_still(
+    turn_idx,
+    positive_prompt,
+    negative_prompt,
+    workflow_name,
+    filename_prefix,
+    title,
+    config=DEFAULT_CONFIG,
+):
+    nodes, link_defs, output_node_id = create_t2v_turn(
+        turn_idx, positive_prompt, negative_prompt, workflow_name, config=config
+    )
+    ids = turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)
+    nodes, link_defs = remove_nodes(nodes, link_defs, [ids["turn_video"]])
+    nodes = set_sampled_video_length(nodes, KEYFRAME_LENGTH)
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+
+    nodes.append(
+        create_node(
+            "SaveImage",
+            ids["save_still"],
+            [x_pos + 2700, 300],
+            [filename_prefix],
+            title,
+        )
+    )
+    link_defs.append((output_node_id, 0, ids["save_still"], 0, "IMAGE"))
+    return nodes, link_defs
+
+
+def apply_end_keyframe(turn_idx, nodes, link_defs, end_image_filename):
+    # WanFirstLastFrameToVideo takes WanImageToVideo's inputs with a second
+    # clip vision slot, so start_image moves from slot 4 to 5; end_image is 6
+    ids = turn_node_ids(turn_idx, FIRST_TURN_I2V_NODE_KEYS)
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    nodes = [
+        (
             create_node(
-                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
+                "WanFirstLastFrameToVideo",
+                node["id"],
+                node["pos"],
+                node["widgets_values"],
+                "First/Last Frame to Video",
+            )
+            if node["id"] == ids["i2v_latent"]
+            else node
+        )
+        for node in nodes
+    ]
+    link_defs = [
+        (
+            origin_id,
+            origin_slot,
+            target_id,
+            5 if target_id == ids["i2v_latent"] and target_slot == 4 else target_slot,
+            link_type,
+        )
+        for origin_id, origin_slot, target_id, target_slot, link_type in link_defs
+    ]
+
+    nodes.extend(
+        [
+            create_node(
+                "LoadImage",
+                ids["load_end_image"],
+                [x_pos - 400, 1550],
+                [end_image_filename],
+                "Load End Keyframe",
             ),
             create_node(
-                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
+                "ImageScaleBy",
+                ids["end_image_scale"],
+                [x_pos - 200, 1550],
+                [UPSCALE_METHOD, UPSCALE_FACTOR],
             ),
+        ]
+    )
+    link_defs.extend(
+        [
+            (ids["load_end_image"], 0, ids["end_image_scale"], 0, "IMAGE"),
+            (ids["end_image_scale"], 0, ids["i2v_latent"], 6, "IMAGE"),
+        ]
+    )
+    return nodes, link_defs
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def index_inbound_links(link_defs):
+    inbound_links = {}
+    for origin_id, origin_slot, target_id, target_slot, _ in link_defs:
+        inbound_links.setdefault(target_id, []).append(
+            (target_slot, origin_id, origin_slot)
+        )
+    return inbound_links
+
+
+def node_input_hash(node_id, nodes_by_id, inbound_links, memo, salts=None):
+    if node_id in memo:
+        return memo[node_id]
+
+    node = nodes_by_id.get(node_id)
+    parts = [
+        node["type"] if node else node_id,
+        node.get("widgets_values", []) if node else None,
+        (salts or {}).get(node_id),
+    ]
+    for target_slot, origin_id, origin_slot in sorted(inbound_links.get(node_id, [])):
+        origin_hash = node_input_hash(
+            origin_id, nodes_by_id, inbound_links, memo, salts
+        )
+        parts.append([target_slot, origin_hash, origin_slot])
+
+    memo[node_id] = hashlib.sha256(
+        json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    return memo[node_id]
+
+
+def prompt_hash(positive_prompt, negative_prompt):
+    return hashlib.sha256(
+        json.dumps([positive_prompt, negative_prompt]).encode("utf-8")
+    ).hexdigest()[:CACHE_KEY_LENGTH]
+
+
+def estimate_vae_decode_bytes(width, height, length):
+    return width * height * length * VAE_DECODE_BYTES_PER_VOXEL + VAE_DECODE_FIXED_BYTES
+
+
+def choose_vae_decode_tiling(width, height, length, vram_budget_gb):
+    if vram_budget_gb is None:
+        return None
+    budget_bytes = vram_budget_gb * 1024**3 * VAE_DECODE_BUDGET_FRACTION
+    if estimate_vae_decode_bytes(width, height, length) <= budget_bytes:
+        return None
+
+    best = None
+    for tile_size in VAE_DECODE_TILE_SIZES:
+        overlap = max(32, tile_size // 8 // 32 * 32)
+        tile_width = min(width, tile_size + 2 * overlap)
+        tile_height = min(height, tile_size + 2 * overlap)
+        for temporal_size in VAE_DECODE_TEMPORAL_SIZES:
+            temporal_overlap = max(4, temporal_size // 8 // 4 * 4)
+            tile_length = min(length, temporal_size + temporal_overlap)
+            if (
+                estimate_vae_decode_bytes(tile_width, tile_height, tile_length)
+                > budget_bytes
+            ):
+                continue
+            tile_count = (
+                -(-width // tile_size)
+                * -(-height // tile_size)
+                * -(-length // temporal_size)
+            )
+            candidate = (tile_count, -tile_size, tile_size, overlap, temporal_size)
+            if best is None or candidate < best[0]:
+                best = (
+                    candidate,
+                    [tile_size, overlap, temporal_size, temporal_overlap],
+                )
+
+    if best is None:
+        print(
+            f"Warning: {vram_budget_gb} GB is below the smallest tiled decode estimate; "
+            "using the smallest tiles"
+        )
+        return [VAE_DECODE_TILE_SIZES[-1], 32, VAE_DECODE_TEMPORAL_SIZES[-1], 4]
+    return best[1]
+
+
+def apply_vae_decode_tiling(nodes, tiling):
+    if tiling is None:
+        return nodes
+    return [
+        (
+            create_node(
+                "VAEDecodeTiled",
+                node["id"],
+                node["pos"],
+                list(tiling),
+                node.get("title"),
+            )
+            if node["type"] == "VAEDecode"
+            else node
+        )
+        for node in nodes
+    ]
+
+
+def estimate_sampling_bytes(width, height, length):
+    tokens = (width // 16) * (height // 16) * ((length - 1) // 4 + 1)
+    return SAMPLING_FIXED_BYTES + tokens * SAMPLING_BYTES_PER_TOKEN
+
+
+def load_model_index(models_dir, cache_path=MODEL_INDEX_NAME):
+    models_dir = os.path.abspath(models_dir)
+    if not os.path.isdir(models_dir):
+        raise ValueError(f"Models folder not found: {models_dir}")
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    cached_dirs = cache.get(models_dir, {})
+
+    model_index, changed = {}, 0
+    folders = sorted({folder for kind in MODEL_FOLDERS.values() for folder in kind})
+    for folder in folders:
+        for dir_path, _, filenames in os.walk(
+            os.path.join(models_dir, folder), followlinks=True
+        ):
+            rel_dir = os.path.relpath(dir_path, models_dir).replace(os.sep, "/")
+            cached_files = cached_dirs.get(rel_dir, {}).get("files", {})
+            files = {}
+            # Files overwritten in place keep their folder's mtime, so each
+            # file is checked by its own mtime and size
+            for filename in filenames:
+                stat = os.stat(os.path.join(dir_path, filename))
+                cached = cached_files.get(filename)
+                if (
+                    cached
+                    and cached.get("mtime") == stat.st_mtime
+                    and cached["size"] == stat.st_size
+                ):
+                    files[filename] = cached
+                    continue
+                changed += 1
+                quant_match = QUANT_PATTERN.search(filename)
+                files[filename] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "quant": quant_match.group(1).upper() if quant_match else None,
+                }
+            model_index[rel_dir] = {"files": files}
+
+    if changed or model_index != cached_dirs:
+        cache[models_dir] = model_index
+        # Renamed into place, so workflows built concurrently never read a
+        # half-written index
+        partial_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(partial_path, cache_path)
+    file_count = sum(len(entry["files"]) for entry in model_index.values())
+    print(
+        f"Model index: {file_count} files in {models_dir} "
+        f"({changed} new or changed)"
+    )
+    return model_index
+
+
+def model_index_folder(model_index, folder):
+    entries = {}
+    for rel_dir, dir_entry in model_index.items():
+        if rel_dir == folder:
+            name_prefix = ""
+        elif rel_dir.startswith(f"{folder}/"):
+            name_prefix = f"{rel_dir[len(folder) + 1:]}/"
+        else:
+            continue
+        for filename, file_entry in dir_entry["files"].items():
+            entries[f"{name_prefix}{filename}"] = file_entry
+    return entries
+
+
+def find_quant_variants(model_index, folder_kind, model_name):
+    match = QUANT_PATTERN.search(model_name)
+    if not match:
+        return {}
+    model_stem = model_name[: match.start()].lower()
+    variants = {}
+    for folder in MODEL_FOLDERS[folder_kind]:
+        for name, entry in sorted(model_index_folder(model_index, folder).items()):
+            file_match = QUANT_PATTERN.search(name)
+            if (
+                entry["quant"]
+                and file_match
+                and os.path.basename(name[: file_match.start()]).lower() == model_stem
+            ):
+                variants.setdefault(entry["quant"], (name, entry["size"]))
+    return variants
+
+
+def check_model_references(nodes, model_index):
+    folder_names = {
+        kind: {
+            name
+            for folder in folders
+            for name in model_index_folder(model_index, folder)
+        }
+        for kind, folders in MODEL_FOLDERS.items()
+    }
+    missing = []
+    for node in nodes:
+        kind = MODEL_REFERENCES.get(node["type"])
+        if not kind:
+            continue
+        if kind == "lora":
+            names = [
+                lora_name for lora_name, _ in enabled_loras(node["widgets_values"])
+            ]
+        else:
+            names = [node["widgets_values"][0]]
+        for name in names:
+            if name not in folder_names[kind]:
+                missing.append(
+                    f"Node {node['id']} ({node['type']}): '{name}' not found in "
+                    f"{' or '.join(MODEL_FOLDERS[kind])}"
+                )
+    return missing
+
+
+def preflight_model_inventory(workflow, models_dir):
+    missing = check_model_references(workflow["nodes"], load_model_index(models_dir))
+    if missing:
+        raise ValueError(
+            f"{len(missing)} model reference(s) missing from {models_dir}:\n"
+            + "\n".join(missing)
+        )
+    print("Preflight: all model and LoRA references found")
+
+
+def object_info_cache_path(server):
+    server_key = hashlib.sha256(server.rstrip("/").encode("utf-8")).hexdigest()
+    stem, ext = os.path.splitext(OBJECT_INFO_NAME)
+    return f"{stem}_{server_key[:CACHE_KEY_LENGTH]}{ext}"
+
+
+def load_object_info(source, cache_path=None):
+    if not source.startswith(("http://", "https://")):
+        if not os.path.exists(source):
+            raise ValueError(f"object_info snapshot not found: {source}")
+        with open(source, "r", encoding="utf-8") as f:
+            return json.load(f)
+    # Servers can run different node packs, so each gets its own snapshot
+    cache_path = cache_path or object_info_cache_path(source)
+    if os.path.exists(cache_path):
+        print(
+            f"Using cached object_info snapshot {cache_path} for {source} "
+            "(delete it to refetch)"
+        )
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    print(f"Fetching object_info from {source}...")
+    with urllib.request.urlopen(f"{source.rstrip('/')}/object_info", timeout=60) as r:
+        object_info = json.load(r)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump(object_info, f)
+    return object_info
+
+
+def schema_inputs(node_schema):
+    inputs = {}
+    for section in ("required", "optional"):
+        for name, spec in node_schema.get("input", {}).get(section, {}).items():
+            input_type = spec[0] if isinstance(spec, (list, tuple)) else spec
+            options = (
+                spec[1] if isinstance(spec, (list, tuple)) and len(spec) > 1 else {}
+            )
+            if isinstance(input_type, list):
+                options = dict(options or {}, options=input_type)
+                input_type = "COMBO"
+            is_widget = input_type in SCHEMA_WIDGET_TYPES and not (options or {}).get(
+                "forceInput"
+            )
+            inputs[name] = {
+                "type": input_type,
+                "options": options or {},
+                "widget": is_widget,
+                "required": section == "required",
+            }
+    return inputs
+
+
+def widget_value_error(value, input_spec):
+    input_type = input_spec["type"]
+    if input_type == "INT" and (isinstance(value, bool) or not isinstance(value, int)):
+        return "expected INT"
+    if input_type == "FLOAT" and (
+        isinstance(value, bool) or not isinstance(value, (int, float))
+    ):
+        return "expected FLOAT"
+    if input_type == "BOOLEAN" and not isinstance(value, bool):
+        return "expected BOOLEAN"
+    if input_type == "STRING" and not isinstance(value, str):
+        return "expected STRING"
+    if input_type == "COMBO":
+        choices = input_spec["options"].get("options")
+        if choices and value not in choices:
+            return f"not one of {len(choices)} server choices"
+    return None
+
+
+def slot_types_match(origin_type, target_type):
+    origin_types = set(str(origin_type).split(","))
+    target_types = set(str(target_type).split(","))
+    return "*" in origin_types | target_types or bool(origin_types & target_types)
+
+
+def validate_node_schemas(workflow, object_info):
+    errors = []
+    nodes_by_id = {node["id"]: node for node in workflow["nodes"]}
+    for node in workflow["nodes"]:
+        label = f"Node {node['id']} ({node['type']})"
+        if node["type"] not in object_info:
+            errors.append(f"{label}: node type not available on the server")
+            continue
+        inputs = schema_inputs(object_info[node["type"]])
+        dynamic = node["type"] in SCHEMA_DYNAMIC_NODES
+
+        widget_inputs = [
+            node_input
+            for node_input in node.get("inputs", [])
+            if "widget" in node_input
+        ]
+        widget_names = {node_input["name"] for node_input in widget_inputs}
+        for name, input_spec in inputs.items():
+            if (
+                input_spec["widget"]
+                and input_spec["required"]
+                and name not in widget_names
+            ):
+                errors.append(f"{label}: missing widget '{name}'")
+
+        value_idx, expected_count = 0, 0
+        values = node.get("widgets_values", [])
+        for node_input in widget_inputs:
+            name = node_input["name"]
+            input_spec = inputs.get(name)
+            if input_spec is None:
+                if not dynamic:
+                    errors.append(f"{label}: widget '{name}' is not a server input")
+                value_idx += 1
+                expected_count += 1
+                continue
+            if not input_spec["widget"]:
+                errors.append(f"{label}: '{name}' is a {input_spec['type']} socket")
+            elif isinstance(values, list) and value_idx < len(values):
+                error = widget_value_error(values[value_idx], input_spec)
+                if error:
+                    errors.append(
+                        f"{label}: widget '{name}' = {values[value_idx]!r}, {error}"
+                    )
+            extra = int(
+                input_spec["type"] == "INT"
+                and (
+                    input_spec["options"].get("control_after_generate")
+                    or name in SCHEMA_CONTROL_WIDGET_NAMES
+                )
+            )
+            value_idx += 1 + extra
+            expected_count += 1 + extra
+        if not dynamic and isinstance(values, list) and len(values) != expected_count:
+            errors.append(
+                f"{label}: {len(values)} widget values, server expects {expected_count}"
+            )
+
+    for link_id, origin_id, origin_slot, target_id, target_slot, _ in workflow["links"]:
+        origin_node, target_node = nodes_by_id.get(origin_id), nodes_by_id.get(
+            target_id
+        )
+        if origin_node is None or target_node is None:
+            missing_id = origin_id if origin_node is None else target_id
+            errors.append(f"Link {link_id}: node {missing_id} does not exist")
+            continue
+        if target_slot >= len(target_node.get("inputs", [])):
+            errors.append(
+                f"Link {link_id}: {target_node['type']} has no input slot {target_slot}"
+            )
+            continue
+        if (
+            origin_node["type"] not in object_info
+            or target_node["type"] not in object_info
+        ):
+            continue
+        outputs = object_info[origin_node["type"]].get("output", [])
+        if origin_slot >= len(outputs):
+            errors.append(
+                f"Link {link_id}: {origin_node['type']} has no output slot {origin_slot}"
+            )
+            continue
+        target_input = target_node["inputs"][target_slot]
+        input_spec = schema_inputs(object_info[target_node["type"]]).get(
+            target_input["name"]
+        )
+        if input_spec is None:
+            if target_node["type"] not in SCHEMA_DYNAMIC_NODES:
+                errors.append(
+                    f"Link {link_id}: {target_node['type']} has no input "
+                    f"'{target_input['name']}'"
+                )
+            continue
+        if not slot_types_match(outputs[origin_slot], input_spec["type"]):
+            errors.append(
+                f"Link {link_id}: {origin_node['type']} output {origin_slot} "
+                f"({outputs[origin_slot]}) does not fit {target_node['type']}."
+                f"{target_input['name']} ({input_spec['type']})"
+            )
+    return errors
+
+
+def preflight_node_schemas(workflow, object_info_source):
+    errors = validate_node_schemas(workflow, load_object_info(object_info_source))
+    if errors:
+        raise ValueError(
+            f"{len(errors)} node schema error(s) against {object_info_source}:\n"
+            + "\n".join(errors)
+        )
+    print("Preflight: all nodes match the server's object_info")
+
+
+def preflight_workflow(workflow, models_dir=None, object_info_source=None):
+    if models_dir:
+        preflight_model_inventory(workflow, models_dir)
+    if object_info_source:
+        preflight_node_schemas(workflow, object_info_source)
+
+
+def resolve_model_quantization(
+    model_index, vram_budget_gb, width, height, length, config=DEFAULT_CONFIG
+):
+    budget_bytes = (
+        vram_budget_gb * 1024**3 * QUANT_BUDGET_FRACTION
+        if vram_budget_gb is not None
+        else None
+    )
+    overheads = {
+        "unet": estimate_sampling_bytes(width, height, length),
+        "clip": TEXT_ENCODE_FIXED_BYTES,
+    }
+    resolved = {}
+    for role, (folder_kind, model_fields) in QUANT_ROLES.items():
+        for model_name in [
+            getattr(config, model_field) for model_field in model_fields
+        ]:
+            variants = find_quant_variants(model_index, folder_kind, model_name)
+            ranked = [
+                (quant, *variants[quant])
+                for quant in QUANT_PREFERENCE
+                if quant in variants
+            ]
+            if not ranked:
+                print(f"Warning: no GGUF variants of {model_name} in the models index")
+                continue
+            fitting = [
+                variant
+                for variant in ranked
+                if budget_bytes is None
+                or variant[2] + overheads[folder_kind] <= budget_bytes
+            ]
+            if fitting:
+                quant, resolved_name, _ = fitting[0]
+            else:
+                quant, resolved_name, _ = min(ranked, key=lambda variant: variant[2])
+                print(
+                    f"Warning: no {role} quantization fits in {vram_budget_gb} GB; "
+                    f"using the smallest ({quant})"
+                )
+            print(f"{role}: {resolved_name} ({quant})")
+            resolved[model_name] = resolved_name
+    return resolved
+
+
+def apply_model_quantization(nodes, resolved):
+    if not resolved:
+        return nodes
+    for node in nodes:
+        if (
+            node["type"] in ("UnetLoaderGGUF", "CLIPLoaderGGUF")
+            and node["widgets_values"][0] in resolved
+        ):
+            node["widgets_values"][0] = resolved[node["widgets_values"][0]]
+    return nodes
+
+
+def accel_model_kind(nodes, render_width, render_height):
+    if not any(node["type"] in ACCEL_I2V_NODE_TYPES for node in nodes):
+        return "t2v"
+    if min(render_width, render_height) >= ACCEL_I2V_720_MIN_SIDE:
+        return "i2v_720"
+    return "i2v_480"
+
+
+def apply_accel_profile(
+    turn_idx, nodes, link_defs, profile_name, render_width, render_height
+):
+    if profile_name not in ACCEL_PROFILES:
+        raise ValueError(
+            f"Unknown acceleration profile '{profile_name}'. "
+            f"Available profiles: {list(ACCEL_PROFILES)}"
+        )
+    profile = ACCEL_PROFILES[profile_name]
+    if not profile["high"] and not profile["low"]:
+        return nodes, link_defs
+    model_kind = accel_model_kind(nodes, render_width, render_height)
+
+    nodes_by_id = {node["id"]: node for node in nodes}
+    model_links = {}
+    for link_def in link_defs:
+        target_node = nodes_by_id.get(link_def[2])
+        if (
+            link_def[0] in nodes_by_id
+            and target_node
+            and target_node["type"] == "KSamplerAdvanced"
+            and link_def[4] == "MODEL"
+        ):
+            model_links.setdefault(link_def[:2], []).append(link_def)
+
+    accel_base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + ACCEL_ID_OFFSET
+    max_chains = (INTERP_ID_OFFSET - ACCEL_ID_OFFSET) // ACCEL_ID_STRIDE
+    if len(model_links) > max_chains:
+        raise ValueError(
+            f"Turn {turn_idx} has {len(model_links)} sampler model sources; "
+            f"acceleration supports at most {max_chains}"
+        )
+
+    nodes, link_defs = list(nodes), list(link_defs)
+    for chain_idx, (model_origin, sampler_links) in enumerate(
+        sorted(model_links.items())
+    ):
+        adds_noise = any(
+            nodes_by_id[link_def[2]]["widgets_values"][0] == "enable"
+            for link_def in sampler_links
+        )
+        accel_nodes = profile["high" if adds_noise else "low"]
+        if not accel_nodes:
+            continue
+
+        origin_pos = nodes_by_id[model_origin[0]]["pos"]
+        model_source, model_slot = model_origin
+        for node_idx, (node_type, widgets_values) in enumerate(accel_nodes):
+            accel_id = accel_base_id + chain_idx * ACCEL_ID_STRIDE + node_idx + 1
+            widgets_values = list(widgets_values)
+            if node_type in ACCEL_MODEL_TYPES:
+                model_type_index, model_types = ACCEL_MODEL_TYPES[node_type]
+                widgets_values[model_type_index] = model_types[model_kind]
+            nodes.append(
+                create_node(
+                    node_type,
+                    accel_id,
+                    [origin_pos[0] + 550 + node_idx * 350, origin_pos[1] + 800],
+                    widgets_values,
+                )
+            )
+            link_defs.append((model_source, model_slot, accel_id, 0, "MODEL"))
+            model_source, model_slot = accel_id, 0
+
+        link_defs = [
+            (
+                (model_source, 0, link_def[2], link_def[3], link_def[4])
+                if link_def in sampler_links
+                else link_def
+            )
+            for link_def in link_defs
+        ]
+
+    return nodes, link_defs
+
+
+def redirect_output_links(
+    link_defs, origin_id, new_origin_id, origin_slot=0, new_origin_slot=0
+):
+    return [
+        (
+            (new_origin_id, new_origin_slot, link_def[2], link_def[3], link_def[4])
+            if link_def[0] == origin_id and link_def[1] == origin_slot
+            else link_def
+        )
+        for link_def in link_defs
+    ]
+
+
+def interpolation_multipliers(config=DEFAULT_CONFIG):
+    # Interpolating n frames by m gives (n - 1) * m + 1, and n is 4k + 1
+    return [
+        multiplier
+        for multiplier in range(1, config.video_length)
+        if (config.video_length - 1) % (4 * multiplier) == 0
+    ]
+
+
+def sampled_video_length(multiplier=1, config=DEFAULT_CONFIG):
+    if multiplier <= 1:
+        return config.video_length
+    if multiplier not in interpolation_multipliers(config=config):
+        raise ValueError(
+            f"Interpolating by {multiplier} cannot restore {config.video_length} "
+            f"frames; use one of {interpolation_multipliers(config=config)}"
+        )
+    return (config.video_length - 1) // multiplier + 1
+
+
+def shorter_video_length(length):
+    return max(5, (length - 1) // 2 // 4 * 4 + 1)
+
+
+def set_sampled_video_length(nodes, length):
+    for node in nodes:
+        if node["type"] in LATENT_VIDEO_NODE_TYPES:
+            node["widgets_values"][2] = length
+    return nodes
+
+
+def set_sampler_steps(nodes, steps):
+    # Scale each sampler's step window with its step count, so the
+    # high-noise/low-noise split stays at the same point of the schedule
+    for node in nodes:
+        if node["type"] != "KSamplerAdvanced":
+            continue
+        values = node["widgets_values"]
+        scale = steps / values[3]
+        values[3] = steps
+        values[7] = round(values[7] * scale)
+        if values[8] < 10000:
+            values[8] = round(values[8] * scale)
+    return nodes
+
+
+def apply_frame_interpolation(
+    turn_idx,
+    nodes,
+    link_defs,
+    multiplier=1,
+    interpolation_model="rife",
+    config=DEFAULT_CONFIG,
+):
+    if multiplier <= 1:
+        return nodes, link_defs
+    if interpolation_model not in INTERPOLATION_MODELS:
+        raise ValueError(
+            f"Unknown interpolation model '{interpolation_model}'. "
+            f"Available models: {list(INTERPOLATION_MODELS)}"
+        )
+    node_type, widgets_values = INTERPOLATION_MODELS[interpolation_model]
+    widgets_values = list(widgets_values)
+    widgets_values[INTERPOLATION_MULTIPLIER_INDEX] = multiplier
+
+    nodes = set_sampled_video_length(
+        list(nodes), sampled_video_length(multiplier, config=config)
+    )
+    decode_nodes = [
+        node for node in nodes if node["type"] in ("VAEDecode", "VAEDecodeTiled")
+    ]
+    interp_base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + INTERP_ID_OFFSET
+    if len(decode_nodes) >= UPSCALE_ID_OFFSET - INTERP_ID_OFFSET:
+        raise ValueError(
+            f"Turn {turn_idx} has too many decodes ({len(decode_nodes)}) to interpolate"
+        )
+
+    for decode_idx, decode_node in enumerate(decode_nodes, start=1):
+        interp_id = interp_base_id + decode_idx
+        nodes.append(
+            create_node(
+                node_type,
+                interp_id,
+                [decode_node["pos"][0], decode_node["pos"][1] - 250],
+                list(widgets_values),
+                f"Interpolate Turn {turn_idx} x{multiplier}",
+            )
+        )
+        link_defs = redirect_output_links(link_defs, decode_node["id"], interp_id)
+        link_defs.append((decode_node["id"], 0, interp_id, 0, "IMAGE"))
+
+    return nodes, link_defs
+
+
+def apply_aggressive_cleanup(turn_idx, nodes, link_defs):
+    nodes_by_id = {node["id"]: node for node in nodes}
+    cleanup_inputs = [
+        link_def
+        for link_def in link_defs
+        if link_def[2] in nodes_by_id
+        and (
+            (
+                nodes_by_id[link_def[2]]["type"] == "KSamplerAdvanced"
+                and link_def[3] == 3
+            )
+            or (
+                nodes_by_id[link_def[2]]["type"] in ("VAEDecode", "VAEDecodeTiled")
+                and link_def[3] == 0
+            )
+        )
+        and nodes_by_id.get(link_def[0], {}).get("type") != "RAMCleanup"
+    ]
+    cleanup_base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + CLEANUP_ID_OFFSET
+    if 2 * len(cleanup_inputs) > CLEANUP_ID_LIMIT - CLEANUP_ID_OFFSET:
+        raise ValueError(
+            f"Turn {turn_idx} has too many samplers and decodes "
+            f"({len(cleanup_inputs)}) for extra cleanups"
+        )
+
+    for cleanup_idx, link_def in enumerate(cleanup_inputs):
+        origin_id, origin_slot, target_id, target_slot, link_type = link_def
+        vram_id = cleanup_base_id + 2 * cleanup_idx
+        ram_id = vram_id + 1
+        x_pos, y_pos = nodes_by_id[target_id]["pos"]
+        nodes.extend(
+            [
+                create_node("VRAMCleanup", vram_id, [x_pos - 300, y_pos + 250], []),
+                create_node("RAMCleanup", ram_id, [x_pos - 150, y_pos + 250], []),
+            ]
+        )
+        link_defs = [other for other in link_defs if other != link_def]
+        link_defs.extend(
+            [
+                (origin_id, origin_slot, vram_id, 0, "*"),
+                (vram_id, 0, ram_id, 0, "*"),
+                (ram_id, 0, target_id, target_slot, link_type),
+            ]
+        )
+
+    return nodes, link_defs
+
+
+def render_resolution(profile_name="native", config=DEFAULT_CONFIG):
+    if profile_name not in RENDER_PROFILES:
+        raise ValueError(
+            f"Unknown render profile '{profile_name}'. "
+            f"Available profiles: {list(RENDER_PROFILES)}"
+        )
+    profile = RENDER_PROFILES[profile_name]
+    return profile["render"] if profile else (config.video_width, config.video_height)
+
+
+def output_resolution(profile_name="native", config=DEFAULT_CONFIG):
+    render_resolution(profile_name, config=config)
+    profile = RENDER_PROFILES[profile_name]
+    return profile["output"] if profile else (config.video_width, config.video_height)
+
+
+def set_render_resolution(nodes, width, height):
+    for node in nodes:
+        if node["type"] in LATENT_VIDEO_NODE_TYPES:
+            node["widgets_values"][0] = width
+            node["widgets_values"][1] = height
+    return nodes
+
+
+def apply_render_profile(
+    turn_idx, nodes, link_defs, profile_name="native", config=DEFAULT_CONFIG
+):
+    render_width, render_height = render_resolution(profile_name, config=config)
+    if RENDER_PROFILES[profile_name] is None:
+        return nodes, link_defs
+    output_width, output_height = output_resolution(profile_name, config=config)
+
+    nodes = set_render_resolution(list(nodes), render_width, render_height)
+    decode_nodes = [
+        node for node in nodes if node["type"] in ("VAEDecode", "VAEDecodeTiled")
+    ]
+    if not decode_nodes:
+        return nodes, link_defs
+    loader_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + UPSCALE_ID_OFFSET
+    if loader_id + len(decode_nodes) >= turn_idx * NODE_ID_BASE_OFFSET:
+        raise ValueError(
+            f"Turn {turn_idx} has too many decodes ({len(decode_nodes)}) to upscale"
+        )
+
+    nodes.append(
+        create_node(
+            "UpscaleModelLoader",
+            loader_id,
+            [decode_nodes[0]["pos"][0], decode_nodes[0]["pos"][1] - 650],
+            [POST_UPSCALE_MODEL],
+        )
+    )
+    for decode_idx, decode_node in enumerate(decode_nodes):
+        # Each batch is resized as soon as it is upscaled, so only one batch
+        # of frames is ever held at the model's 4x size
+        upscale_id = loader_id + decode_idx + 1
+        nodes.append(
             create_node(
-                "VHS_VideoCombine",
-                ids["turn_video"],
-                [x_pos + 1800, 600],
+                "ImageUpscaleToSize (script2workflow)",
+                upscale_id,
+                [decode_node["pos"][0], decode_node["pos"][1] - 450],
                 [
-                    FRAME_RATE,
-                    VIDEO_LOOP_COUNT,
-                    f"{workflow_name}_turn{turn_idx}",
-                    VIDEO_FORMAT,
-                    VIDEO_PINGPONG,
-                    VIDEO_SAVE_OUTPUT,
-                    VIDEO_PIXEL_FORMAT,
-                    VIDEO_CRF,
-                    VIDEO_SAVE_METADATA,
-                    VIDEO_TRIM_TO_AUDIO,
+                    POST_UPSCALE_METHOD,
+                    output_width,
+                    output_height,
+                    POST_UPSCALE_CROP,
+                    POST_UPSCALE_BATCH_FRAMES,
                 ],
-                f"Save Turn {turn_idx} Video",
-            ),
+                f"Upscale Turn {turn_idx} to {output_width}x{output_height}",
+            )
+        )
+        link_defs = redirect_output_links(link_defs, decode_node["id"], upscale_id)
+        link_defs.extend(
+            [
+                (loader_id, 0, upscale_id, 0, "UPSCALE_MODEL"),
+                (decode_node["id"], 0, upscale_id, 1, "IMAGE"),
+            ]
+        )
+
+    return nodes, link_defs
+
+
+def enabled_loras(lora_widgets):
+    return sorted(
+        (widget["lora"], widget["strength"])
+        for widget in lora_widgets
+        if isinstance(widget, dict) and widget.get("on") and widget.get("lora")
+    )
+
+
+def bake_key(unet_name, loras):
+    key_data = json.dumps({"base": unet_name, "loras": loras}, sort_keys=True)
+    return hashlib.sha256(key_data.encode("utf-8")).hexdigest()[:CACHE_KEY_LENGTH]
+
+
+def load_bake_registry(registry_path):
+    if not registry_path or not os.path.exists(registry_path):
+        return {}
+    with open(registry_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_bake_registry(registry_path, registry):
+    with open(registry_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f, indent=2)
+
+
+def install_baked_models(registry, comfy_dir):
+    for entry in registry.values():
+        if entry["installed"]:
+            continue
+        try:
+            stage_comfy_output(
+                comfy_dir,
+                f"{entry['output']}_*.safetensors",
+                entry["model"],
+                os.path.join("models", "diffusion_models"),
+            )
+        except ValueError:
+            print(f"Not baked yet: {entry['model']}")
+            continue
+        entry["installed"] = True
+    return registry
+
+
+def baked_precision(entry):
+    # Entries recorded before the precision was tracked fall back to the
+    # defaults they were baked with
+    quant_match = QUANT_PATTERN.search(entry["base"])
+    return (
+        entry.get("base_quant")
+        or (quant_match.group(1).upper() if quant_match else None),
+        entry.get("weight_dtype", BAKED_UNET_WEIGHT_DTYPE),
+    )
+
+
+def apply_baked_models(nodes, link_defs, registry):
+    installed = {key: entry for key, entry in registry.items() if entry["installed"]}
+    if not installed:
+        return nodes, link_defs
+
+    baked_keys = set()
+    nodes_by_id = {node["id"]: node for node in nodes}
+    inbound_origins = {
+        (target_id, target_slot): (origin_id, origin_slot)
+        for origin_id, origin_slot, target_id, target_slot, _ in link_defs
+    }
+    loras_by_unet = {}
+    for node in nodes:
+        if node["type"] != "Power Lora Loader (rgthree)":
+            continue
+        origin_id = inbound_origins.get((node["id"], 0), (None,))[0]
+        while (
+            origin_id in nodes_by_id
+            and nodes_by_id[origin_id]["type"] == "ModelSamplingSD3"
+        ):
+            origin_id = inbound_origins.get((origin_id, 0), (None,))[0]
+        if (
+            origin_id in nodes_by_id
+            and nodes_by_id[origin_id]["type"] == "UnetLoaderGGUF"
+        ):
+            loras_by_unet.setdefault(origin_id, []).append(node)
+
+    for unet_id, lora_nodes in sorted(loras_by_unet.items()):
+        lora_sets = {
+            json.dumps(enabled_loras(lora_node["widgets_values"]))
+            for lora_node in lora_nodes
+        }
+        if len(lora_sets) != 1:
+            continue
+        unet_node = nodes_by_id[unet_id]
+        key = bake_key(unet_node["widgets_values"][0], json.loads(lora_sets.pop()))
+        if key not in installed:
+            continue
+
+        baked_node = create_node(
+            "UNETLoader",
+            unet_id,
+            unet_node["pos"],
+            [installed[key]["model"], baked_precision(installed[key])[1]],
+            "Baked UNet + LoRAs",
+        )
+        nodes = [baked_node if node["id"] == unet_id else node for node in nodes]
+        for lora_node in lora_nodes:
+            for slot in (0, 1):
+                origin = inbound_origins.get((lora_node["id"], slot))
+                if origin:
+                    link_defs = redirect_output_links(
+                        link_defs, lora_node["id"], origin[0], slot, origin[1]
+                    )
+            nodes, link_defs = remove_nodes(nodes, link_defs, [lora_node["id"]])
+        baked_keys.add(key)
+
+    if baked_keys:
+        print(f"Using baked models for {len(baked_keys)} UNet(s); LoRA loaders skipped")
+    for key in sorted(baked_keys):
+        base_quant, weight_dtype = baked_precision(installed[key])
+        if base_quant != weight_dtype:
+            print(
+                f"Warning: {installed[key]['base']} ({base_quant}) is replaced by "
+                f"{installed[key]['model']} loaded as {weight_dtype}; remove its "
+                f"registry entry to sample with {base_quant} again"
+            )
+    return nodes, link_defs
+
+
+def generate_bake_workflow(registry_path, config=DEFAULT_CONFIG):
+    registry = load_bake_registry(registry_path)
+
+    nodes, link_defs = [], []
+    for target_idx, (target, model_fields) in enumerate(BAKE_TARGETS.items()):
+        unet_name, lora_dict = [
+            getattr(config, model_field) for model_field in model_fields
         ]
+        loras = enabled_loras(create_multi_lora_config(lora_dict))
+        if not loras:
+            print(f"{target}: no enabled LoRAs, nothing to bake")
+            continue
+        quant_match = QUANT_PATTERN.search(unet_name)
+        if quant_match and quant_match.group(1).upper() not in BAKE_SOURCE_QUANTS:
+            raise ValueError(
+                f"{target}: {unet_name} is quantized ({quant_match.group(1).upper()}); "
+                f"bake from a {'/'.join(BAKE_SOURCE_QUANTS)} GGUF by setting "
+                f"{model_fields[0]} in --config"
+            )
+        key = bake_key(unet_name, loras)
+        if key in registry:
+            state = "installed" if registry[key]["installed"] else "pending"
+            print(f"{target}: already baked ({state}) as {registry[key]['model']}")
+            continue
+
+        model_stem = f"{os.path.splitext(unet_name)[0]}_{key}"
+        registry[key] = {
+            "base": unet_name,
+            "loras": loras,
+            "output": f"diffusion_models/{BAKED_MODEL_DIR}/{model_stem}",
+            "model": f"{BAKED_MODEL_DIR}/{model_stem}.safetensors",
+            "base_quant": quant_match.group(1).upper() if quant_match else None,
+            "weight_dtype": BAKED_UNET_WEIGHT_DTYPE,
+            "installed": False,
+        }
+        print(
+            f"{target}: baking {len(loras)} LoRA(s) into {registry[key]['model']} "
+            f"(loaded as {BAKED_UNET_WEIGHT_DTYPE} instead of "
+            f"{registry[key]['base_quant']})"
+        )
+
+        node_base_id = target_idx * 10
+        y_pos = target_idx * 300
+        nodes.extend(
+            [
+                create_node(
+                    "UnetLoaderGGUF", node_base_id + 1, [0, y_pos], [unet_name]
+                ),
+                create_node(
+                    "Power Lora Loader (rgthree)",
+                    node_base_id + 2,
+                    [550, y_pos],
+                    create_multi_lora_config(lora_dict),
+                ),
+                create_node(
+                    "ModelSave",
+                    node_base_id + 3,
+                    [1100, y_pos],
+                    [registry[key]["output"]],
+                    f"Save Baked {target}",
+                ),
+            ]
+        )
+        link_defs.extend(
+            [
+                (node_base_id + 1, 0, node_base_id + 2, 0, "MODEL"),
+                (node_base_id + 2, 0, node_base_id + 3, 0, "MODEL"),
+            ]
+        )
+
+    save_bake_registry(registry_path, registry)
+    if not nodes:
+        return None
+    return assemble_workflow(nodes, link_defs)
+
+
+def create_latent_checkpoint(turn_idx, ids, cache_key, workflow_name, chained):
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    prefix = f"{workflow_name}_turn{turn_idx}_{cache_key}"
+    nodes = [
+        create_node(
+            "SaveLatent",
+            ids["save_latent"],
+            [x_pos + 900, 850],
+            [f"{LATENT_OUTPUT_DIR}/{prefix}"],
+            f"Save Turn {turn_idx} High-Noise Latent",
+        )
+    ]
+    link_defs = [(ids["ksampler_high"], 0, ids["save_latent"], 0, "LATENT")]
+    if chained:
+        handoff_nodes, handoff_link_defs = create_handoff_save(turn_idx, ids, prefix)
+        nodes.extend(handoff_nodes)
+        link_defs.extend(handoff_link_defs)
+    return nodes, link_defs
+
+
+def create_handoff_save(turn_idx, ids, prefix):
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    nodes = [
+        create_node(
+            "SaveImage",
+            ids["save_handoff"],
+            [x_pos - 400, 1550],
+            [f"{HANDOFF_IMAGE_DIR}/{prefix}"],
+            f"Save Turn {turn_idx} Handoff Frame",
+        )
+    ]
+    link_defs = [(ids["select_image"], 0, ids["save_handoff"], 0, "IMAGE")]
+    return nodes, link_defs
+
+
+def tail_handoff_save_id(last_turn_idx):
+    return last_turn_idx * NODE_ID_BASE_OFFSET + 3
+
+
+def create_tail_handoff_save(
+    last_turn_idx, output_node_id, workflow_name, config=DEFAULT_CONFIG
+):
+    # The frame that would feed the turn after the range, saved under the next
+    # turn's handoff name so a later chunk can resume from it
+    save_id = tail_handoff_save_id(last_turn_idx)
+    select_id = save_id - 1
+    x_pos = last_turn_idx * HORIZONTAL_SPACING
+    nodes = [
+        create_node(
+            "VHS_SelectImages",
+            select_id,
+            [x_pos, 600],
+            [config.image_select_index, *config.image_select_error_flags],
+            "Select Last Frame",
+        ),
+        create_node(
+            "SaveImage",
+            save_id,
+            [x_pos, 800],
+            [f"{HANDOFF_IMAGE_DIR}/{workflow_name}_turn{last_turn_idx + 1}_resume"],
+            f"Save Turn {last_turn_idx + 1} Handoff Frame",
+        ),
+    ]
+    link_defs = [
+        (output_node_id, 0, select_id, 0, "IMAGE"),
+        (select_id, 0, save_id, 0, "IMAGE"),
+    ]
+    return nodes, link_defs
+
+
+def create_clip_save(turn_idx, clip_node_id, clip_key, config=DEFAULT_CONFIG):
+    select_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + CLIP_STORE_ID_OFFSET
+    save_id = select_id + 1
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    nodes = [
+        create_node(
+            "VHS_SelectImages",
+            select_id,
+            [x_pos + 1800, 900],
+            [config.image_select_index, *config.image_select_error_flags],
+            f"Select Turn {turn_idx} Last Frame",
+        ),
+        create_node(
+            "SaveImage",
+            save_id,
+            [x_pos + 1800, 1100],
+            [f"{CLIP_FRAME_DIR}/{clip_key[:CACHE_KEY_LENGTH]}"],
+            f"Save Turn {turn_idx} Last Frame",
+        ),
+    ]
+    link_defs = [
+        (clip_node_id, 0, select_id, 0, "IMAGE"),
+        (select_id, 0, save_id, 0, "IMAGE"),
+    ]
+    return nodes, link_defs, save_id
+
+
+def create_stored_clip_turn(
+    turn_idx,
+    video_filename,
+    frame_filename,
+    turn_video_node,
+    prev_turn_output_node_id,
+    config=DEFAULT_CONFIG,
+):
+    load_video_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET + CLIP_STORE_ID_OFFSET
+    load_frame_id = load_video_id + 1
+    join_id = load_video_id + 2
+    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    nodes = [
+        create_node(
+            "VHS_LoadVideo",
+            load_video_id,
+            [x_pos + 1200, 300],
+            [video_filename, 0, 0, 0, 0, 0, 1, "AnimateDiff"],
+            f"Load Stored Turn {turn_idx} Clip",
+        ),
+        create_node(
+            "LoadImage",
+            load_frame_id,
+            [x_pos + 1200, 750],
+            [frame_filename],
+            f"Load Stored Turn {turn_idx} Last Frame",
+        ),
+        turn_video_node,
+    ]
+    link_defs = [(load_video_id, 0, turn_video_node["id"], 0, "IMAGE")]
+    output_node_id = load_video_id
+    if prev_turn_output_node_id is not None:
+        nodes.append(
+            create_node(
+                "ImageBatchMulti",
+                join_id,
+                [x_pos + 1800, 450],
+                [config.batch_input_count, None],
+                f"Join Stored Turn {turn_idx}",
+            )
+        )
+        link_defs.extend(
+            [
+                (prev_turn_output_node_id, 0, join_id, 0, "IMAGE"),
+                (load_video_id, 0, join_id, 1, "IMAGE"),
+            ]
+        )
+        output_node_id = join_id
+    return nodes, link_defs, output_node_id, load_frame_id
+
+
+def stage_comfy_output(comfy_dir, output_pattern, input_filename, target_dir="input"):
+    matches = sorted(glob.glob(os.path.join(comfy_dir, "output", output_pattern)))
+    if not matches:
+        raise ValueError(f"No ComfyUI output matches {output_pattern}")
+    target_path = os.path.join(comfy_dir, target_dir, input_filename)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    shutil.copyfile(matches[-1], target_path)
+    print(f"Copied {matches[-1]} to ComfyUI {target_dir} as {input_filename}")
+
+
+def chained_clip_key(clip_key, frame_hash):
+    return hashlib.sha256(f"{clip_key}:{frame_hash}".encode("utf-8")).hexdigest()
+
+
+def clip_store_entry(store_dir, clip_key):
+    return os.path.join(store_dir, "objects", clip_key[:2], clip_key)
+
+
+def lookup_stored_clip(store_dir, clip_key):
+    entry_dir = clip_store_entry(store_dir, clip_key)
+    try:
+        with open(os.path.join(entry_dir, CLIP_META_NAME), encoding="utf-8") as f:
+            meta = json.load(f)
+        # The entry folder's mtime is its last use, which eviction goes by
+        os.utime(entry_dir)
+    except (OSError, ValueError):
+        return None
+    return entry_dir, meta
+
+
+def stage_stored_clip(entry_dir, meta, clip_key, comfy_dir):
+    input_name = f"clip_{clip_key[:CACHE_KEY_LENGTH]}"
+    staged = []
+    for stored_name in (meta["video"], meta["frame"]):
+        input_filename = input_name + os.path.splitext(stored_name)[1]
+        try:
+            shutil.copyfile(
+                os.path.join(entry_dir, stored_name),
+                os.path.join(comfy_dir, "input", input_filename),
+            )
+        except OSError:
+            # Evicted by another host between the lookup and the copy
+            return None
+        staged.append(input_filename)
+    return staged
+
+
+def add_stored_clip(store_dir, clip_key, video_path, frame_path, meta):
+    entry_dir = clip_store_entry(store_dir, clip_key)
+    if os.path.isdir(entry_dir):
+        return False
+    # Entries are assembled under tmp/ and renamed into place in one step, so
+    # other hosts see either a complete clip or none
+    tmp_dir = os.path.join(store_dir, "tmp", uuid.uuid4().hex)
+    os.makedirs(tmp_dir)
+    try:
+        video_name = "clip" + os.path.splitext(video_path)[1]
+        shutil.copyfile(video_path, os.path.join(tmp_dir, video_name))
+        shutil.copyfile(frame_path, os.path.join(tmp_dir, "last_frame.png"))
+        with open(os.path.join(tmp_dir, CLIP_META_NAME), "w", encoding="utf-8") as f:
+            json.dump(
+                dict(
+                    meta,
+                    key=clip_key,
+                    video=video_name,
+                    frame="last_frame.png",
+                    stored_at=datetime.now().isoformat(timespec="seconds"),
+                ),
+                f,
+                indent=2,
+            )
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if os.path.isdir(entry_dir):
+            return False
+        raise
+    return True
+
+
+def evict_stored_clips(store_dir, quota_gb):
+    # A store whose first prompt failed has no folder yet
+    os.makedirs(store_dir, exist_ok=True)
+    lock_path = os.path.join(store_dir, CLIP_STORE_LOCK_NAME)
+    try:
+        lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Another host is evicting, unless its lock is stale from a crash
+        try:
+            if (
+                time.time() - os.path.getmtime(lock_path)
+                < CLIP_STORE_LOCK_STALE_SECONDS
+            ):
+                return []
+            os.remove(lock_path)
+        except OSError:
+            return []
+        return evict_stored_clips(store_dir, quota_gb)
+
+    try:
+        entries = []
+        for entry_dir in glob.glob(os.path.join(store_dir, "objects", "*", "*")):
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry_dir, name))
+                    for name in os.listdir(entry_dir)
+                )
+                entries.append((os.path.getmtime(entry_dir), size, entry_dir))
+            except OSError:
+                continue
+        total_bytes = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, entry_dir in sorted(entries):
+            if total_bytes <= quota_gb * 1024**3:
+                break
+            trash_dir = os.path.join(store_dir, "trash", uuid.uuid4().hex)
+            os.makedirs(os.path.dirname(trash_dir), exist_ok=True)
+            try:
+                os.rename(entry_dir, trash_dir)
+            except OSError:
+                continue
+            shutil.rmtree(trash_dir, ignore_errors=True)
+            total_bytes -= size
+            evicted.append(os.path.basename(entry_dir))
+        return evicted
+    finally:
+        os.close(lock_fd)
+        os.remove(lock_path)
+
+
+def prompt_workflow(entry):
+    # The UI workflow travels with the prompt in extra_data, as queue_prompt sends it
+    prompt = entry.get("prompt") or []
+    extra_data = prompt[3] if len(prompt) > 3 else {}
+    return extra_data.get("extra_pnginfo", {}).get("workflow", {})
+
+
+def store_clip_outputs(entry, comfy_dir):
+    clip_store = prompt_workflow(entry).get("extra", {}).get("clip_store")
+    if not clip_store or not comfy_dir:
+        return []
+
+    # Failed prompts still store the turns that finished before the error
+    outputs, stored_turns = entry.get("outputs", {}), []
+
+    def output_path(node_id, output_kind):
+        file_entries = outputs.get(str(node_id), {}).get(output_kind, [])
+        if not file_entries:
+            return None
+        path = os.path.join(
+            comfy_dir,
+            file_entries[0].get("type", "output"),
+            file_entries[0].get("subfolder", ""),
+            file_entries[0]["filename"],
+        )
+        return path if os.path.exists(path) else None
+
+    for clip_key, clip in clip_store["clips"].items():
+        video_path = output_path(clip["video_node"], "gifs")
+        frame_path = output_path(clip["frame_node"], "images")
+        if not (video_path and frame_path):
+            continue
+        if "after_frame_node" in clip:
+            # Chained after a turn rendered in the same prompt: the key takes
+            # in the frame that turn handed off
+            handoff_path = output_path(clip["after_frame_node"], "images")
+            if not handoff_path:
+                continue
+            clip_key = chained_clip_key(clip_key, file_sha256(handoff_path))
+        meta = {key: clip[key] for key in ("script", "turn", "seed")}
+        if add_stored_clip(clip_store["dir"], clip_key, video_path, frame_path, meta):
+            stored_turns.append(clip["turn"])
+    if stored_turns:
+        print(f"Stored turns {stored_turns} in the clip store {clip_store['dir']}")
+
+    evicted = evict_stored_clips(clip_store["dir"], clip_store["quota_gb"])
+    if evicted:
+        print(
+            f"Evicted {len(evicted)} least recently used clip(s) to stay under "
+            f"{clip_store['quota_gb']} GB"
+        )
+    return stored_turns
+
+
+def load_score_hook(hook_spec):
+    module_name, _, function_name = hook_spec.rpartition(":")
+    if not module_name or not function_name:
+        raise ValueError(
+            f"Score hook must look like 'module:function', got '{hook_spec}'"
+        )
+    if module_name.endswith(".py"):
+        spec = importlib.util.spec_from_file_location(
+            os.path.splitext(os.path.basename(module_name))[0], module_name
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    else:
+        module = importlib.import_module(module_name)
+    return getattr(module, function_name)
+
+
+def pick_candidate(
+    workflow_name,
+    turn_idx,
+    choice,
+    comfy_dir=None,
+    score_hook=None,
+    config=DEFAULT_CONFIG,
+):
+    prefix = candidate_prefix(workflow_name, turn_idx)
+
+    if choice == "auto":
+        if not comfy_dir or not score_hook:
+            raise ValueError(
+                "Automatic candidate selection needs both a ComfyUI folder and a score hook"
+            )
+        video_ext = "." + config.video_format.split("-")[-1]
+        previews = {}
+        for path in sorted(glob.glob(os.path.join(comfy_dir, "output", f"{prefix}*"))):
+            match = re.match(
+                rf"{re.escape(prefix)}(\d+)_preview_", os.path.basename(path)
+            )
+            if match and path.endswith(video_ext):
+                previews[int(match.group(1))] = path
+        if not previews:
+            raise ValueError(f"No candidate previews found for Turn {turn_idx}")
+
+        candidate_ids = sorted(previews)
+        scores = list(load_score_hook(score_hook)([previews[c] for c in candidate_ids]))
+        if len(scores) != len(candidate_ids):
+            raise ValueError(
+                f"Score hook returned {len(scores)} scores for {len(candidate_ids)} candidates"
+            )
+        for candidate_id, score in zip(candidate_ids, scores):
+            print(f"Candidate {candidate_id}: score {score}")
+        choice = candidate_ids[max(range(len(scores)), key=scores.__getitem__)]
+    else:
+        choice = int(choice)
+
+    latent_filename = f"{prefix}{choice}.latent"
+    latent_pattern = f"{LATENT_OUTPUT_DIR}/{prefix}{choice}_*.latent"
+    if comfy_dir:
+        stage_comfy_output(comfy_dir, latent_pattern, latent_filename)
+    else:
+        print(
+            f"Copy the latest output/{latent_pattern} into ComfyUI's input folder "
+            f"as {latent_filename}"
+        )
+
+    print(f"Selected candidate {choice} for Turn {turn_idx}")
+    return choice, latent_filename
+
+
+def load_movie_script(script_path):
+    print(f"Loading movie script: {script_path}")
+
+    try:
+        with open(script_path, "r", encoding="utf-8") as f:
+            movie_script = json.load(f)
+    except Exception as e:
+        print(f"Error loading script file: {e}")
+        raise
+
+    workflow_name = os.path.splitext(os.path.basename(script_path))[0]
+    return movie_script.get("turns", {}), workflow_name
+
+
+def select_turns(script_turns, turns_range=None):
+    available_turns = [int(k) for k in script_turns.keys() if k.isdigit()]
+
+    if not available_turns:
+        raise ValueError("Movie script contains no valid turns.")
+
+    if turns_range is None:
+        return sorted(available_turns)
+
+    selected_turns = []
+    for turn_num in turns_range:
+        if turn_num not in available_turns:
+            raise ValueError(
+                f"Turn {turn_num} not found in script. Available turns: {available_turns}"
+            )
+        selected_turns.append(turn_num)
+    return sorted(selected_turns)
+
+
+def assemble_workflow(nodes, link_defs):
+    print("Applying all connections...")
+    final_links = []
+    nodes_by_id = {node["id"]: node for node in nodes}
+    link_id_counter = 1
+
+    for link_def in link_defs:
+        if len(link_def) != 5:
+            print(f"Warning: Invalid link definition: {link_def}")
+            continue
+
+        origin_id, origin_slot, target_id, target_slot, link_type = link_def
+
+        final_links.append(
+            [link_id_counter, origin_id, origin_slot, target_id, target_slot, link_type]
+        )
+
+        origin_node = nodes_by_id.get(origin_id)
+        target_node = nodes_by_id.get(target_id)
+
+        if not origin_node:
+            print(f"Warning: Origin node {origin_id} not found for link")
+            continue
+
+        if not target_node:
+            print(f"Warning: Target node {target_id} not found for link")
+            continue
+
+        if "outputs" not in origin_node or origin_slot >= len(origin_node["outputs"]):
+            print(f"Warning: Invalid origin slot {origin_slot} for node {origin_id}")
+            continue
+
+        if origin_node["outputs"][origin_slot].get("links") is None:
+            origin_node["outputs"][origin_slot]["links"] = []
+        origin_node["outputs"][origin_slot]["links"].append(link_id_counter)
+
+        if "inputs" not in target_node or target_slot >= len(target_node["inputs"]):
+            print(f"Warning: Invalid target slot {target_slot} for node {target_id}")
+            continue
+
+        target_node["inputs"][target_slot]["link"] = link_id_counter
+
+        link_id_counter += 1
+
+    print(f"Generated {len(nodes)} nodes and {len(final_links)} links")
+
+    final_workflow = {
+        "id": str(uuid.uuid4()),
+        "revision": 0,
+        "last_node_id": max(n["id"] for n in nodes) if nodes else 0,
+        "last_link_id": max(link[0] for link in final_links) if final_links else 0,
+        "nodes": nodes,
+        "links": final_links,
+        "groups": [],
+        "config": {},
+        "extra": {"ds": {"scale": 0.7, "offset": [0, 0]}, "frontendVersion": "1.24.4"},
+        "version": 0.4,
+    }
+
+    return final_workflow
+
+
+def workflow_to_api_prompt(workflow):
+    links_by_id = {link[0]: link for link in workflow["links"]}
+    prompt = {}
+    for node in workflow["nodes"]:
+        inputs = {}
+        values = node.get("widgets_values", [])
+        if isinstance(values, dict):
+            inputs.update(
+                {key: value for key, value in values.items() if key != "videopreview"}
+            )
+            values = []
+        value_idx = 0
+        for node_input in node.get("inputs", []):
+            if node_input.get("link") is not None:
+                link = links_by_id[node_input["link"]]
+                inputs[node_input["name"]] = [str(link[1]), link[2]]
+            if "widget" in node_input:
+                if node_input.get("link") is None and value_idx < len(values):
+                    inputs[node_input["name"]] = values[value_idx]
+                value_idx += 1
+                if node_input["name"] in SCHEMA_CONTROL_WIDGET_NAMES:
+                    value_idx += 1
+        if node["type"] == "Power Lora Loader (rgthree)":
+            lora_widgets = [
+                value for value in values if isinstance(value, dict) and "lora" in value
+            ]
+            for lora_idx, lora_widget in enumerate(lora_widgets, start=1):
+                inputs[f"lora_{lora_idx}"] = lora_widget
+        prompt[str(node["id"])] = {
+            "class_type": node["type"],
+            "inputs": inputs,
+            "_meta": {"title": node.get("title", node["type"])},
+        }
+    return prompt
+
+
+def comfy_request(server, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(
+        f"{server.rstrip('/')}{path}",
+        data=data,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(
+            f"ComfyUI rejected {path}: {e.read().decode('utf-8', 'replace')}"
+        ) from e
+
+
+def queue_prompt(server, workflow, client_id=None, prompt_id=None):
+    # A prompt_id chosen by the caller can be recorded before the request is
+    # sent, so a crash in between cannot lose track of a queued prompt
+    if client_id is None:
+        listen_node_timings(server)
+        client_id = NODE_TIMING_CLIENT_ID
+    payload = {
+        "prompt": workflow_to_api_prompt(workflow),
+        "client_id": client_id,
+        "extra_data": {"extra_pnginfo": {"workflow": workflow}},
+    }
+    if prompt_id:
+        payload["prompt_id"] = prompt_id
+    response = comfy_request(server, "/prompt", payload)
+    return response["prompt_id"]
+
+
+def wait_for_prompt(server, prompt_id, poll_seconds=SUBMIT_POLL_SECONDS):
+    while True:
+        history = comfy_request(server, f"/history/{prompt_id}")
+        entry = history.get(prompt_id)
+        if entry and entry.get("status", {}).get("completed") is not None:
+            return entry
+        time.sleep(poll_seconds)
+
+
+def open_websocket(server, path):
+    url = urllib.parse.urlsplit(server)
+    secure = url.scheme == "https"
+    sock = socket.create_connection(
+        (url.hostname, url.port or (443 if secure else 80)),
+        timeout=NODE_TIMING_CONNECT_SECONDS,
     )
+    if secure:
+        sock = ssl.create_default_context().wrap_socket(
+            sock, server_hostname=url.hostname
+        )
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    sock.sendall(
+        (
+            f"GET {url.path.rstrip('/')}{path} HTTP/1.1\r\nHost: {url.netloc}\r\n"
+            "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii")
+    )
+    reader = sock.makefile("rb")
+    status_line = reader.readline()
+    while reader.readline() not in (b"\r\n", b""):
+        pass
+    if b" 101 " not in status_line:
+        sock.close()
+        raise OSError(
+            f"{server} refused the websocket: "
+            f"{status_line.decode('latin-1').strip()}"
+        )
+    sock.settimeout(None)
+    return sock, reader
 
-    link_defs = [
-        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
-        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
-        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
-        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
-        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
-        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
-        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
-        (ids["prompt_pos"], 0, ids["i2v_latent"], 0, "CONDITIONING"),
-        (ids["prompt_neg"], 0, ids["i2v_latent"], 1, "CONDITIONING"),
-        (ids["vae_loader"], 0, ids["i2v_latent"], 2, "VAE"),
-        (ids["load_image"], 0, ids["image_scale"], 0, "IMAGE"),
-        (ids["image_scale"], 0, ids["i2v_latent"], 4, "IMAGE"),
-        (ids["i2v_latent"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
-        (ids["i2v_latent"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
-        (ids["i2v_latent"], 1, ids["ksampler_high"], 2, "CONDITIONING"),
-        (ids["i2v_latent"], 1, ids["ksampler_low"], 2, "CONDITIONING"),
-        (ids["i2v_latent"], 2, ids["ksampler_high"], 3, "LATENT"),
-        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
-        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
-        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
-        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
-        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
-        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
-        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
-        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
+
+def send_websocket_frame(sock, payload, opcode):
+    # Frames from a client are always masked
+    mask = os.urandom(4)
+    if len(payload) < 126:
+        length = bytes([0x80 | len(payload)])
+    elif len(payload) < 2**16:
+        length = bytes([0x80 | 126]) + struct.pack(">H", len(payload))
+    else:
+        length = bytes([0x80 | 127]) + struct.pack(">Q", len(payload))
+    sock.sendall(
+        bytes([0x80 | opcode])
+        + length
+        + mask
+        + bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    )
+
+
+def read_websocket_message(sock, reader):
+    # The next text message; binary previews are skipped, None once closed
+    message_opcode, fragments = None, []
+    while True:
+        header = reader.read(2)
+        if len(header) < 2:
+            return None
+        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack(">H", reader.read(2))[0]
+        elif length == 127:
+            length = struct.unpack(">Q", reader.read(8))[0]
+        mask = reader.read(4) if header[1] & 0x80 else None
+        payload = reader.read(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        if opcode == 0x8:
+            return None
+        if opcode == 0x9:
+            send_websocket_frame(sock, payload, 0xA)
+            continue
+        if opcode in (0x1, 0x2):
+            message_opcode, fragments = opcode, [payload]
+        elif opcode == 0x0:
+            fragments.append(payload)
+        else:
+            continue
+        if header[0] & 0x80:
+            if message_opcode == 0x1:
+                return b"".join(fragments).decode("utf-8")
+            message_opcode, fragments = None, []
+
+
+node_timing_listeners = {}
+node_timing_lock = threading.Lock()
+
+
+def record_node_timing(listener, message, now=None):
+    if message.get("type") != "executing":
+        return
+    data = message.get("data") or {}
+    prompt_id = data.get("prompt_id")
+    now = time.monotonic() if now is None else now
+    with node_timing_lock:
+        # A node runs until the next executing event of its prompt; node None
+        # ends the prompt
+        running = listener["running"].pop(prompt_id, None)
+        if running:
+            node_id, started = running
+            prompt_seconds = listener["seconds"].setdefault(prompt_id, {})
+            prompt_seconds[node_id] = prompt_seconds.get(node_id, 0) + now - started
+            while len(listener["seconds"]) > NODE_TIMING_MAX_PROMPTS:
+                listener["seconds"].pop(next(iter(listener["seconds"])))
+        if data.get("node") is not None:
+            listener["running"][prompt_id] = (str(data["node"]), now)
+
+
+def connect_node_timings(server):
+    try:
+        return open_websocket(server, f"/ws?clientId={NODE_TIMING_CLIENT_ID}")
+    except OSError:
+        return None
+
+
+def follow_node_timings(server, listener, connection):
+    while True:
+        if connection is None:
+            time.sleep(SUBMIT_POLL_SECONDS)
+            connection = connect_node_timings(server)
+            continue
+        sock, reader = connection
+        try:
+            while True:
+                message = read_websocket_message(sock, reader)
+                if message is None:
+                    break
+                record_node_timing(listener, json.loads(message))
+        except (OSError, ValueError, struct.error):
+            pass
+        finally:
+            sock.close()
+        # Nodes running across a reconnect cannot be timed
+        with node_timing_lock:
+            listener["running"].clear()
+        connection = None
+
+
+def listen_node_timings(server):
+    with node_timing_lock:
+        if server in node_timing_listeners:
+            return node_timing_listeners[server]
+        listener = {"running": {}, "seconds": {}}
+        node_timing_listeners[server] = listener
+    # Connected before the first prompt is queued, so its first node is timed
+    threading.Thread(
+        target=follow_node_timings,
+        args=(server, listener, connect_node_timings(server)),
+        daemon=True,
+    ).start()
+    return listener
+
+
+def prompt_node_seconds(server, prompt_id):
+    listener = node_timing_listeners.get(server)
+    if listener is None:
+        return {}
+    # ComfyUI writes the history before it sends the prompt's last event
+    deadline = time.monotonic() + NODE_TIMING_SETTLE_SECONDS
+    while prompt_id in listener["running"] and time.monotonic() < deadline:
+        time.sleep(0.05)
+    with node_timing_lock:
+        listener["running"].pop(prompt_id, None)
+        return {
+            node_id: round(seconds, 3)
+            for node_id, seconds in listener["seconds"].pop(prompt_id, {}).items()
+        }
+
+
+def prompt_error(entry):
+    status = entry.get("status", {})
+    if status.get("status_str") != "error" and status.get("completed"):
+        return None
+    errors = [
+        data
+        for event, data in status.get("messages", [])
+        if event in ("execution_error", "execution_interrupted")
     ]
+    return errors[-1] if errors else {}
 
-    return nodes, link_defs, ids["ram_cleanup_final"]
 
+def describe_prompt_error(prompt_id, error):
+    return (
+        f"Prompt {prompt_id} failed in node {error.get('node_id')} "
+        f"({error.get('node_type')}): {error.get('exception_type')}: "
+        f"{error.get('exception_message', '').strip()}"
+    )
 
-def create_t2v_turn(turn_idx, positive_prompt, negative_prompt, workflow_name):
-    nodes = []
-    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
-    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
 
-    if FIRST_SAMPLER_NOISE_SEED == -1:
-        noise_seed_value = random.randint(0, 2**32 - 1)
-    else:
-        noise_seed_value = FIRST_SAMPLER_NOISE_SEED
-
-    ids = {
-        "vae_loader": base_id + 1,
-        "clip_loader": base_id + 2,
-        "unet_high": base_id + 3,
-        "unet_low": base_id + 4,
-        "sampler_high": base_id + 5,
-        "sampler_low": base_id + 6,
-        "lora_high": base_id + 7,
-        "lora_low": base_id + 8,
-        "prompt_pos": base_id + 9,
-        "prompt_neg": base_id + 10,
-        "empty_latent": base_id + 11,
-        "ksampler_high": base_id + 12,
-        "ksampler_low": base_id + 13,
-        "vram_cleanup_mid": base_id + 14,
-        "vae_decode": base_id + 15,
-        "vram_cleanup_final": base_id + 16,
-        "ram_cleanup_final": base_id + 17,
-        "ram_cleanup_mid": base_id + 18,
-        "turn_video": base_id + 19,
-    }
+def is_oom_error(error):
+    error_text = (
+        f"{error.get('exception_type', '')} {error.get('exception_message', '')}"
+    ).lower()
+    return any(marker in error_text for marker in OOM_ERROR_MARKERS)
 
-    high_lora_config = create_multi_lora_config(T2V_HIGH_NOISE_LORA)
-    low_lora_config = create_multi_lora_config(T2V_LOW_NOISE_LORA)
 
-    nodes.extend(
+def server_view_url(server, file_entry):
+    query = urllib.parse.urlencode(
+        {
+            "filename": file_entry["filename"],
+            "subfolder": file_entry.get("subfolder", ""),
+            "type": file_entry.get("type", "output"),
+        }
+    )
+    return f"{server.rstrip('/')}/view?{query}"
+
+
+def server_file_exists(server, file_entry):
+    request = urllib.request.Request(server_view_url(server, file_entry), method="HEAD")
+    try:
+        with urllib.request.urlopen(request, timeout=60):
+            return True
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return False
+        raise RuntimeError(f"ComfyUI rejected /view: HTTP {e.code}") from e
+
+
+def upload_asset(server, path):
+    digest = file_sha256(path)
+    asset_name = (
+        f"{ASSET_NAME_PREFIX}{digest[:CACHE_KEY_LENGTH]}"
+        f"{os.path.splitext(path)[1].lower()}"
+    )
+    if server_file_exists(server, {"filename": asset_name, "type": "input"}):
+        update_metric(
+            "script2workflow_cache_lookups_total", cache="uploads", result="hit"
+        )
+        print(f"{os.path.basename(path)} is already on {server} as {asset_name}")
+        return asset_name
+    update_metric("script2workflow_cache_lookups_total", cache="uploads", result="miss")
+
+    with open(path, "rb") as f:
+        data = f.read()
+    boundary = uuid.uuid4().hex
+    body = b"".join(
         [
-            create_node("VAELoader", ids["vae_loader"], [x_pos, 300], [VAE_NAME]),
-            create_node(
-                "CLIPLoaderGGUF",
-                ids["clip_loader"],
-                [x_pos, 400],
-                [CLIP_GGUF_NAME, "wan"],
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_high"], [x_pos, 100], [T2V_HIGH_NOISE_UNET]
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_low"], [x_pos, 200], [T2V_LOW_NOISE_UNET]
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_high"],
-                [x_pos + 550, 100],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_low"],
-                [x_pos + 550, 200],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_high"],
-                [x_pos, 500],
-                high_lora_config,
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_low"],
-                [x_pos, 650],
-                low_lora_config,
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_pos"],
-                [x_pos, 900],
-                [positive_prompt],
-                "Positive Prompt",
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_neg"],
-                [x_pos, 1050],
-                [negative_prompt],
-                "Negative Prompt",
-            ),
-            create_node(
-                "EmptyHunyuanLatentVideo",
-                ids["empty_latent"],
-                [x_pos, 1200],
-                [VIDEO_WIDTH, VIDEO_HEIGHT, VIDEO_LENGTH, VIDEO_BATCH_SIZE],
-            ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_high"],
-                [x_pos + 900, 300],
-                [
-                    "enable",
-                    noise_seed_value,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_HIGH,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    T2V_HIGH_START_STEP,
-                    T2V_HIGH_END_STEP,
-                    "enable",
-                ],
-            ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_low"],
-                [x_pos + 1200, 300],
-                [
-                    "disable",
-                    1,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_LOW,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    T2V_LOW_START_STEP,
-                    T2V_LOW_END_STEP,
-                    "disable",
-                ],
-            ),
-            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
-            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
-            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
-            create_node(
-                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
-            ),
-            create_node(
-                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
-            ),
-            create_node(
-                "VHS_VideoCombine",
-                ids["turn_video"],
-                [x_pos + 1800, 600],
-                [
-                    FRAME_RATE,
-                    VIDEO_LOOP_COUNT,
-                    f"{workflow_name}_turn{turn_idx}",
-                    VIDEO_FORMAT,
-                    VIDEO_PINGPONG,
-                    VIDEO_SAVE_OUTPUT,
-                    VIDEO_PIXEL_FORMAT,
-                    VIDEO_CRF,
-                    VIDEO_SAVE_METADATA,
-                    VIDEO_TRIM_TO_AUDIO,
-                ],
-                f"Save Turn {turn_idx} Video",
-            ),
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode("utf-8")
+            for name, value in (("type", "input"), ("overwrite", "true"))
+        ]
+        + [
+            f'--{boundary}\r\nContent-Disposition: form-data; name="image"; '
+            f'filename="{asset_name}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".encode("utf-8"),
+            data,
+            f"\r\n--{boundary}--\r\n".encode("utf-8"),
         ]
     )
+    request = urllib.request.Request(
+        f"{server.rstrip('/')}/upload/image",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=300) as response:
+            uploaded = json.load(response)
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(
+            f"ComfyUI rejected /upload/image: {e.read().decode('utf-8', 'replace')}"
+        ) from e
+    update_metric("script2workflow_transfer_bytes_total", len(data), direction="upload")
+    print(f"Uploaded {os.path.basename(path)} to {server} as {uploaded['name']}")
+    return uploaded["name"]
 
-    link_defs = [
-        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
-        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
-        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
-        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
-        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
-        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
-        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
-        (ids["prompt_pos"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
-        (ids["prompt_pos"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
-        (ids["prompt_neg"], 0, ids["ksampler_high"], 2, "CONDITIONING"),
-        (ids["prompt_neg"], 0, ids["ksampler_low"], 2, "CONDITIONING"),
-        (ids["empty_latent"], 0, ids["ksampler_high"], 3, "LATENT"),
-        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
-        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
-        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
-        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
-        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
-        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
-        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
-        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
+
+def download_output(server, file_entry, target_dir, retries=DOWNLOAD_RETRIES):
+    target_path = os.path.join(
+        target_dir, file_entry.get("subfolder", ""), file_entry["filename"]
+    )
+    checksum_path = f"{target_path}.sha256"
+    if os.path.exists(target_path) and os.path.exists(checksum_path):
+        with open(checksum_path, encoding="utf-8") as f:
+            digest = f.read().split()[0]
+        if file_sha256(target_path) == digest:
+            return target_path, digest
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    part_path = f"{target_path}.part"
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        request = urllib.request.Request(
+            server_view_url(server, file_entry),
+            headers={"Range": f"bytes={offset}-"} if offset else {},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                if response.status != 206:
+                    offset = 0
+                content_range = response.headers.get("Content-Range", "")
+                expected_size = (
+                    int(content_range.rpartition("/")[2])
+                    if content_range
+                    else offset + int(response.headers.get("Content-Length", -1))
+                )
+                with open(part_path, "ab" if offset else "wb") as f:
+                    for chunk in iter(lambda: response.read(DOWNLOAD_CHUNK_BYTES), b""):
+                        f.write(chunk)
+                        update_metric(
+                            "script2workflow_transfer_bytes_total",
+                            len(chunk),
+                            direction="download",
+                        )
+        except urllib.error.HTTPError as e:
+            # 416: the .part file already holds every byte
+            if e.code == 416 and e.headers.get("Content-Range") == f"bytes */{offset}":
+                break
+            raise RuntimeError(
+                f"ComfyUI rejected /view for {file_entry['filename']}: HTTP {e.code}"
+            ) from e
+        except OSError as e:
+            if attempt == retries:
+                raise RuntimeError(
+                    f"Download of {file_entry['filename']} failed after "
+                    f"{retries} attempts: {e}"
+                ) from e
+            print(f"Download of {file_entry['filename']} interrupted ({e}); resuming")
+            continue
+        if expected_size < 0 or os.path.getsize(part_path) == expected_size:
+            break
+        if attempt == retries:
+            raise RuntimeError(
+                f"Download of {file_entry['filename']} stopped at "
+                f"{os.path.getsize(part_path)} of {expected_size} bytes"
+            )
+
+    digest = file_sha256(part_path)
+    os.replace(part_path, target_path)
+    with open(checksum_path, "w", encoding="utf-8") as f:
+        f.write(f"{digest}  {file_entry['filename']}\n")
+    return target_path, digest
+
+
+def download_outputs(
+    server, entry, target_dir, kinds=DOWNLOAD_OUTPUT_KINDS, workers=DOWNLOAD_WORKERS
+):
+    file_entries = [
+        file_entry
+        for node_output in entry.get("outputs", {}).values()
+        for kind in kinds
+        for file_entry in node_output.get(kind, [])
+        if isinstance(file_entry, dict) and "filename" in file_entry
+    ]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        downloads = list(
+            executor.map(
+                lambda file_entry: download_output(server, file_entry, target_dir),
+                file_entries,
+            )
+        )
+    for local_path, digest in downloads:
+        print(f"Downloaded {local_path} (sha256 {digest[:CACHE_KEY_LENGTH]})")
+    return downloads
+
+
+def stage_server_output(server, file_entry, local_dir):
+    # Remote counterpart of stage_comfy_output: fetch the output, then make it
+    # an input, uploading only if the server does not hold those bytes yet
+    local_path, _ = download_output(server, file_entry, local_dir)
+    return local_path, upload_asset(server, local_path)
+
+
+def submit_workflow(server, workflow, history_db=None, run_id=None, comfy_dir=None):
+    prompt_id = queue_prompt(server, workflow)
+    print(f"Queued prompt {prompt_id} on {server}")
+    entry = wait_for_prompt(server, prompt_id)
+    node_seconds = prompt_node_seconds(server, prompt_id)
+    if history_db and run_id is not None:
+        record_submission(
+            history_db, run_id, server, prompt_id, entry, comfy_dir, node_seconds
+        )
+    store_clip_outputs(entry, comfy_dir)
+    record_prompt_metrics(entry, node_seconds)
+    error = prompt_error(entry)
+    if error is not None:
+        raise RuntimeError(describe_prompt_error(prompt_id, error))
+    output_count = sum(
+        len(files)
+        for node_output in entry.get("outputs", {}).values()
+        for files in node_output.values()
+        if isinstance(files, list)
+    )
+    print(f"Prompt {prompt_id} finished with {output_count} output file(s)")
+    return prompt_id, entry
+
+
+def find_resume_point(
+    entry, script_turns, segment_turns, segment_image, failed_turn, comfy_dir
+):
+    outputs = entry.get("outputs", {})
+    for turn_num in reversed(segment_turns[: segment_turns.index(failed_turn) + 1]):
+        if turn_num == segment_turns[0]:
+            return turn_num, segment_image
+        if script_turns[str(turn_num)].get("new_scene", False):
+            return turn_num, None
+        save_id = turn_node_ids(turn_num, I2V_TURN_NODE_KEYS)["save_handoff"]
+        images = outputs.get(str(save_id), {}).get("images", [])
+        if images:
+            image = images[0]
+            image_path = os.path.join(comfy_dir, "input", image["filename"])
+            stage_comfy_output(
+                comfy_dir,
+                os.path.join(image.get("subfolder", ""), image["filename"]),
+                image["filename"],
+            )
+            return turn_num, image_path
+
+
+def submit_with_oom_recovery(
+    server,
+    workflow,
+    script_path,
+    turns_range,
+    image_path,
+    comfy_dir,
+    retry_budget,
+    generate_args,
+    object_info_source=None,
+    history_db=None,
+    run_id=None,
+):
+    script_turns, _ = load_movie_script(script_path)
+    segment_turns = select_turns(script_turns, turns_range)
+    segment_image = image_path
+    generate_args = dict(generate_args)
+    degradations, retries, degradation_log = [], {}, []
+
+    while True:
+        if workflow is None:
+            workflow = generate_workflow(
+                script_path,
+                segment_turns,
+                segment_image,
+                save_handoffs=True,
+                degradations=tuple(degradations),
+                **generate_args,
+            )
+            preflight_workflow(
+                workflow, generate_args.get("models_dir"), object_info_source
+            )
+            if history_db:
+                run_id = record_run(history_db, "oom-retry", script_path, workflow)
+        prompt_id = queue_prompt(server, workflow)
+        print(f"Queued prompt {prompt_id} on {server} (turns {segment_turns})")
+        entry = wait_for_prompt(server, prompt_id)
+        node_seconds = prompt_node_seconds(server, prompt_id)
+        if history_db and run_id is not None:
+            record_submission(
+                history_db, run_id, server, prompt_id, entry, comfy_dir, node_seconds
+            )
+        store_clip_outputs(entry, comfy_dir)
+        record_prompt_metrics(entry, node_seconds)
+        error = prompt_error(entry)
+        if error is None:
+            print(f"Prompt {prompt_id} finished")
+            break
+        if not is_oom_error(error):
+            raise RuntimeError(describe_prompt_error(prompt_id, error))
+
+        failed_turn = int(error.get("node_id") or 0) // NODE_ID_BASE_OFFSET + 1
+        failed_turn = min(max(failed_turn, segment_turns[0]), segment_turns[-1])
+        failed_turn = max(turn for turn in segment_turns if turn <= failed_turn)
+        retries[failed_turn] = retries.get(failed_turn, 0) + 1
+        print(
+            f"Turn {failed_turn} ran out of memory: {describe_prompt_error(prompt_id, error)}"
+        )
+        if retries[failed_turn] > retry_budget:
+            raise RuntimeError(
+                f"Turn {failed_turn} ran out of memory {retries[failed_turn]} times; "
+                f"retry budget of {retry_budget} exhausted"
+            )
+        remaining_steps = [
+            step
+            for step in OOM_DEGRADATION_STEPS
+            if step not in degradations
+            and (step != "lower-quant" or generate_args.get("models_dir"))
+        ]
+        if error.get("node_type") not in ("VAEDecode", "VAEDecodeTiled"):
+            remaining_steps.sort(key=lambda step: step == "tiled-decode")
+        if not remaining_steps:
+            raise RuntimeError(
+                f"Turn {failed_turn} ran out of memory with every degradation applied: "
+                f"{degradations}"
+            )
+        if generate_args.get("vram_budget") is None:
+            stats = comfy_request(server, "/system_stats")
+            generate_args["vram_budget"] = round(
+                stats["devices"][0]["vram_total"] / 1024**3, 1
+            )
+            print(
+                f"Using the server's {generate_args['vram_budget']} GB as the VRAM budget"
+            )
+        degradations.append(remaining_steps[0])
+        update_metric(
+            "script2workflow_oom_retries_total", degradation=remaining_steps[0]
+        )
+
+        resume_turn, segment_image = find_resume_point(
+            entry, script_turns, segment_turns, segment_image, failed_turn, comfy_dir
+        )
+        segment_turns = segment_turns[segment_turns.index(resume_turn) :]
+        degradation_log.append(
+            {
+                "turn": failed_turn,
+                "retry": retries[failed_turn],
+                "degradation": remaining_steps[0],
+                "resume_turn": resume_turn,
+                "resume_image": (
+                    os.path.basename(segment_image) if segment_image else None
+                ),
+                "prompt_id": prompt_id,
+            }
+        )
+        print(
+            f"Retry {retries[failed_turn]}/{retry_budget} for turn {failed_turn}: "
+            f"applying {remaining_steps[0]} (now {degradations}), "
+            f"resuming at turn {resume_turn}"
+            + (f" from {os.path.basename(segment_image)}" if segment_image else "")
+        )
+        workflow = None
+
+    if degradation_log:
+        print("OOM recovery applied:")
+        for record in degradation_log:
+            print(
+                f"- turn {record['turn']} retry {record['retry']}: "
+                f"{record['degradation']} (resumed at turn {record['resume_turn']})"
+            )
+    return degradation_log
+
+
+def split_pipeline_stages(workflow, turn_idx, node_keys, workflow_name):
+    # Cut a single-turn workflow at ksampler_high: the high stage keeps its
+    # inputs and saves the latent, the low stage loads it in its place
+    ids = turn_node_ids(turn_idx, node_keys)
+    split_id = ids["ksampler_high"]
+    link_defs = [tuple(link[1:]) for link in workflow["links"]]
+    nodes_by_id = {node["id"]: node for node in workflow["nodes"]}
+    inbound_links = index_inbound_links(link_defs)
+    cache_key = node_input_hash(split_id, nodes_by_id, inbound_links, {})
+    latent_prefix = (
+        f"{LATENT_OUTPUT_DIR}/{workflow_name}_turn{turn_idx}_pipeline_"
+        f"{cache_key[:CACHE_KEY_LENGTH]}"
+    )
+
+    def upstream(node_ids, inbound_links, stop_id=None):
+        found, stack = set(), list(node_ids)
+        while stack:
+            node_id = stack.pop()
+            if node_id in found:
+                continue
+            found.add(node_id)
+            if node_id != stop_id:
+                stack.extend(origin for _, origin, _ in inbound_links.get(node_id, []))
+        return found
+
+    # The prompts read CLIP through the high-noise LoRA loader, which would
+    # pull its UNet into the low stage; there they encode with the CLIP loader
+    lora_clip_origins = {
+        target_id: (origin_id, origin_slot)
+        for origin_id, origin_slot, target_id, _, link_type in link_defs
+        if link_type == "CLIP"
+        and nodes_by_id[target_id]["type"] == "Power Lora Loader (rgthree)"
+    }
+
+    def clip_source(origin_id, origin_slot):
+        while origin_id in lora_clip_origins:
+            origin_id, origin_slot = lora_clip_origins[origin_id]
+        return origin_id, origin_slot
+
+    low_stage_link_defs = [
+        (
+            (*clip_source(origin_id, origin_slot), target_id, target_slot, link_type)
+            if link_type == "CLIP" and target_id not in lora_clip_origins
+            else (origin_id, origin_slot, target_id, target_slot, link_type)
+        )
+        for origin_id, origin_slot, target_id, target_slot, link_type in link_defs
+    ]
+
+    high_ids = upstream([split_id], inbound_links)
+    origin_ids = {link_def[0] for link_def in link_defs}
+    low_ids = upstream(
+        [node_id for node_id in nodes_by_id if node_id not in origin_ids],
+        index_inbound_links(low_stage_link_defs),
+        split_id,
+    )
+    low_ids.discard(split_id)
+
+    def stage_nodes(node_ids):
+        nodes = []
+        for node in workflow["nodes"]:
+            if node["id"] not in node_ids:
+                continue
+            node = copy.deepcopy(node)
+            for node_input in node.get("inputs", []):
+                node_input["link"] = None
+            for output in node.get("outputs", []):
+                if output.get("links") is not None:
+                    output["links"] = []
+            nodes.append(node)
+        return nodes
+
+    split_pos = nodes_by_id[split_id]["pos"]
+    high_nodes = stage_nodes(high_ids) + [
+        create_node(
+            "SaveLatent",
+            ids["save_latent"],
+            [split_pos[0] + 300, split_pos[1]],
+            [latent_prefix],
+            f"Save Turn {turn_idx} High-Noise Latent",
+        )
+    ]
+    high_link_defs = [
+        link_def
+        for link_def in link_defs
+        if link_def[0] in high_ids and link_def[2] in high_ids
+    ] + [(split_id, 0, ids["save_latent"], 0, "LATENT")]
+    low_nodes = stage_nodes(low_ids) + [
+        create_node(
+            "LoadLatent",
+            ids["load_latent"],
+            split_pos,
+            [f"{os.path.basename(latent_prefix)}.latent"],
+            f"Load Turn {turn_idx} High-Noise Latent",
+        )
+    ]
+    low_link_defs = [
+        (
+            ids["load_latent"] if origin_id == split_id else origin_id,
+            origin_slot,
+            target_id,
+            target_slot,
+            link_type,
+        )
+        for origin_id, origin_slot, target_id, target_slot, link_type in (
+            low_stage_link_defs
+        )
+        if target_id in low_ids and (origin_id in low_ids or origin_id == split_id)
     ]
 
-    return nodes, link_defs, ids["ram_cleanup_final"]
+    stages = []
+    for stage, nodes, stage_link_defs in (
+        ("high", high_nodes, high_link_defs),
+        ("low", low_nodes, low_link_defs),
+    ):
+        stage_workflow = assemble_workflow(nodes, stage_link_defs)
+        stage_workflow["extra"] = {
+            **copy.deepcopy(workflow["extra"]),
+            "pipeline_stage": stage,
+        }
+        stages.append(stage_workflow)
+    return stages
 
 
-def create_i2v_turn(
-    turn_idx, positive_prompt, negative_prompt, prev_turn_output_node_id, workflow_name
+def submit_pipeline(
+    high_server,
+    low_server,
+    script_path,
+    turns_range,
+    image_path,
+    comfy_dir,
+    generate_args,
+    object_info_source=None,
+    history_db=None,
+    poll_seconds=SUBMIT_POLL_SECONDS,
 ):
-    nodes = []
-    base_id = (turn_idx - 1) * NODE_ID_BASE_OFFSET
-    x_pos = (turn_idx - 1) * HORIZONTAL_SPACING
+    unsupported = [
+        flag
+        for flag, value in (
+            ("--variants", generate_args.get("variants", 1) > 1),
+            ("--batch-t2v", generate_args.get("batch_t2v")),
+            ("--save-latents", generate_args.get("save_latents")),
+            ("--clip-store", generate_args.get("clip_store")),
+        )
+        if value
+    ]
+    if unsupported:
+        raise ValueError(
+            f"--low-noise-server cannot be combined with {', '.join(unsupported)}"
+        )
+    script_turns, workflow_name = load_movie_script(script_path)
+    transfer_dir = os.path.join(PIPELINE_TRANSFER_DIR, workflow_name)
 
-    if FIRST_SAMPLER_NOISE_SEED == -1:
-        noise_seed_value = random.randint(0, 2**32 - 1)
-    else:
-        noise_seed_value = FIRST_SAMPLER_NOISE_SEED
-
-    ids = {
-        "vae_loader": base_id + 1,
-        "clip_loader": base_id + 2,
-        "unet_high": base_id + 3,
-        "unet_low": base_id + 4,
-        "sampler_high": base_id + 5,
-        "sampler_low": base_id + 6,
-        "lora_high": base_id + 7,
-        "lora_low": base_id + 8,
-        "prompt_pos": base_id + 9,
-        "prompt_neg": base_id + 10,
-        "i2v_latent": base_id + 11,
-        "ksampler_high": base_id + 12,
-        "ksampler_low": base_id + 13,
-        "vram_cleanup_mid": base_id + 14,
-        "vae_decode": base_id + 15,
-        "vram_cleanup_final": base_id + 16,
-        "ram_cleanup_final": base_id + 17,
-        "select_image": base_id + 18,
-        "batch_images": base_id + 19,
-        "ram_cleanup_mid": base_id + 20,
-        "turn_video": base_id + 21,
-        "image_scale": base_id + 22,
+    def stage_input(local_path):
+        # Without a shared ComfyUI folder both servers need their own copy
+        upload_asset(low_server, local_path)
+        return upload_asset(high_server, local_path)
+
+    # Chained turns wait on the previous turn's low stage for their start
+    # frame; only segments split at new_scene turns overlap, or every turn
+    # when each starts from its own keyframe
+    segments = []
+    for turn_num in select_turns(script_turns, turns_range):
+        if (
+            not segments
+            or generate_args.get("keyframes")
+            or script_turns[str(turn_num)].get("new_scene", False)
+        ):
+            segments.append({"turns": [], "image": None, "image_name": None})
+        segments[-1]["turns"].append(turn_num)
+    if image_path:
+        segments[0]["image"] = image_path
+        if not comfy_dir:
+            segments[0]["image_name"] = stage_input(image_path)
+
+    def queue_stage(server, segment, stage):
+        turn_num = segment["turns"][0]
+        workflow = segment[stage]
+        run_id = (
+            record_run(history_db, f"pipeline-{stage}", script_path, workflow)
+            if history_db
+            else None
+        )
+        prompt_id = queue_prompt(server, workflow)
+        print(
+            f"Queued turn {turn_num} {stage}-noise stage on {server} "
+            f"as prompt {prompt_id}"
+        )
+        return prompt_id, (segment, run_id)
+
+    def queue_high(segment):
+        turn_num = segment["turns"][0]
+        workflow = quiet_generate_workflow(
+            script_path,
+            [turn_num],
+            segment["image"],
+            **{
+                **generate_args,
+                "save_tail_handoff": True,
+                "image_name": segment["image_name"],
+            },
+        )
+        preflight_workflow(
+            workflow, generate_args.get("models_dir"), object_info_source
+        )
+        node_keys = (
+            FIRST_TURN_I2V_NODE_KEYS
+            if segment["image"] or generate_args.get("keyframes")
+            else T2V_TURN_NODE_KEYS
+        )
+        segment["high"], segment["low"] = quiet_call(
+            split_pipeline_stages, workflow, turn_num, node_keys, workflow_name
+        )
+        segment["ids"] = turn_node_ids(turn_num, node_keys)
+        return queue_stage(high_server, segment, "high")
+
+    def finished_entry(server, prompt_id, run_id):
+        entry = comfy_request(server, f"/history/{prompt_id}").get(prompt_id)
+        if not entry or entry.get("status", {}).get("completed") is None:
+            return None
+        node_seconds = prompt_node_seconds(server, prompt_id)
+        if history_db and run_id is not None:
+            record_submission(
+                history_db, run_id, server, prompt_id, entry, comfy_dir, node_seconds
+            )
+        record_prompt_metrics(entry, node_seconds)
+        error = prompt_error(entry)
+        if error is not None:
+            raise RuntimeError(describe_prompt_error(prompt_id, error))
+        return entry
+
+    def stage_output(server, file_entry, input_filename, target_servers):
+        if comfy_dir:
+            stage_comfy_output(
+                comfy_dir,
+                os.path.join(file_entry.get("subfolder", ""), file_entry["filename"]),
+                input_filename,
+            )
+            return os.path.join(comfy_dir, "input", input_filename), None
+        local_path, _ = download_output(server, file_entry, transfer_dir)
+        names = [upload_asset(target, local_path) for target in target_servers]
+        return local_path, names[-1]
+
+    pending_high = dict(queue_high(segment) for segment in segments)
+    pending_low, low_entries = {}, []
+    while pending_high or pending_low:
+        for prompt_id, (segment, run_id) in list(pending_high.items()):
+            entry = finished_entry(high_server, prompt_id, run_id)
+            if entry is None:
+                continue
+            del pending_high[prompt_id]
+            load_latent = next(
+                node
+                for node in segment["low"]["nodes"]
+                if node["id"] == segment["ids"]["load_latent"]
+            )
+            latent = entry["outputs"][str(segment["ids"]["save_latent"])]["latents"][0]
+            _, latent_name = stage_output(
+                high_server, latent, load_latent["widgets_values"][0], [low_server]
+            )
+            if latent_name:
+                load_latent["widgets_values"] = [latent_name]
+            prompt_id, pending = queue_stage(low_server, segment, "low")
+            pending_low[prompt_id] = pending
+
+        for prompt_id, (segment, run_id) in list(pending_low.items()):
+            entry = finished_entry(low_server, prompt_id, run_id)
+            if entry is None:
+                continue
+            del pending_low[prompt_id]
+            low_entries.append(entry)
+            turn_num = segment["turns"].pop(0)
+            print(f"Turn {turn_num} finished")
+            if not segment["turns"]:
+                continue
+            handoff_id = tail_handoff_save_id(turn_num)
+            handoff = entry["outputs"][str(handoff_id)]["images"][0]
+            segment["image"], segment["image_name"] = stage_output(
+                low_server,
+                handoff,
+                f"{workflow_name}_turn{segment['turns'][0]}_pipeline.png",
+                [low_server, high_server],
+            )
+            prompt_id, pending = queue_high(segment)
+            pending_high[prompt_id] = pending
+
+        if pending_high or pending_low:
+            time.sleep(poll_seconds)
+    return low_entries
+
+
+def open_run_history(db_path):
+    connection = sqlite3.connect(db_path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(HISTORY_SCHEMA)
+    return connection
+
+
+def node_turn(node_id, workflow_turns):
+    turn_num = node_id // NODE_ID_BASE_OFFSET + 1
+    return turn_num if turn_num in workflow_turns else None
+
+
+def workflow_turns(workflow):
+    turn_node_types = {}
+    for node in workflow["nodes"]:
+        turn_node_types.setdefault(node["id"] // NODE_ID_BASE_OFFSET + 1, set()).add(
+            node["type"]
+        )
+    return sorted(
+        turn_num
+        for turn_num, node_types in turn_node_types.items()
+        if node_types - {"VHS_VideoCombine", "VHS_SelectImages", "SaveImage"}
+    )
+
+
+def workflow_run_config(workflow):
+    node_types = {node["type"] for node in workflow["nodes"]}
+    accel_types = {
+        accel_node[0]
+        for profile in ACCEL_PROFILES.values()
+        for stage_nodes in profile.values()
+        for accel_node in stage_nodes
+    }
+    return {
+        "models": sorted(
+            {
+                node["widgets_values"][0]
+                for node in workflow["nodes"]
+                if HISTORY_STAGES.get(node["type"]) == "load"
+            }
+        ),
+        "accel": sorted(node_types & accel_types),
+        "decode": sorted(node_types & {"VAEDecode", "VAEDecodeTiled"}),
+        "interpolation": sorted(node_types & {"RIFE VFI", "FILM VFI"}),
+        "degradations": workflow.get("extra", {}).get("oom_degradations", []),
     }
 
-    high_lora_config = create_multi_lora_config(I2V_HIGH_NOISE_LORA)
-    low_lora_config = create_multi_lora_config(I2V_LOW_NOISE_LORA)
 
-    nodes.extend(
-        [
-            create_node("VAELoader", ids["vae_loader"], [x_pos, 300], [VAE_NAME]),
-            create_node(
-                "CLIPLoaderGGUF",
-                ids["clip_loader"],
-                [x_pos, 400],
-                [CLIP_GGUF_NAME, "wan"],
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_high"], [x_pos, 100], [I2V_HIGH_NOISE_UNET]
-            ),
-            create_node(
-                "UnetLoaderGGUF", ids["unet_low"], [x_pos, 200], [I2V_LOW_NOISE_UNET]
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_high"],
-                [x_pos + 550, 100],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "ModelSamplingSD3",
-                ids["sampler_low"],
-                [x_pos + 550, 200],
-                [MODEL_SAMPLING_SHIFT],
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_high"],
-                [x_pos, 500],
-                high_lora_config,
-            ),
-            create_node(
-                "Power Lora Loader (rgthree)",
-                ids["lora_low"],
-                [x_pos, 650],
-                low_lora_config,
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_pos"],
-                [x_pos, 900],
-                [positive_prompt],
-                "Positive Prompt",
-            ),
-            create_node(
-                "CLIPTextEncode",
-                ids["prompt_neg"],
-                [x_pos, 1050],
-                [negative_prompt],
-                "Negative Prompt",
-            ),
-            create_node(
-                "VHS_SelectImages",
-                ids["select_image"],
-                [x_pos - 400, 1200],
-                [IMAGE_SELECT_INDEX] + IMAGE_SELECT_ERROR_FLAGS,
-            ),
-            create_node(
-                "ImageScaleBy",
-                ids["image_scale"],
-                [x_pos - 200, 1200],
-                [UPSCALE_METHOD, UPSCALE_FACTOR],
-            ),
-            create_node(
-                "WanImageToVideo",
-                ids["i2v_latent"],
-                [x_pos, 1200],
-                [VIDEO_WIDTH, VIDEO_HEIGHT, VIDEO_LENGTH, VIDEO_BATCH_SIZE],
-            ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_high"],
-                [x_pos + 900, 300],
-                [
-                    "enable",
-                    noise_seed_value,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_HIGH,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    I2V_HIGH_START_STEP,
-                    I2V_HIGH_END_STEP,
-                    "enable",
-                ],
+def workflow_video_size(workflow):
+    for node in workflow["nodes"]:
+        if node["type"] in LATENT_VIDEO_NODE_TYPES:
+            width, height, length = node["widgets_values"][:3]
+            return width, height, length
+    return None, None, None
+
+
+def record_run(db_path, kind, script_path, workflow, workflow_path=None):
+    turns = workflow_turns(workflow)
+    nodes_by_id = {node["id"]: node for node in workflow["nodes"]}
+    link_defs = [tuple(link[1:]) for link in workflow["links"]]
+    inbound_links, memo = index_inbound_links(link_defs), {}
+    config = workflow_run_config(workflow)
+    width, height, length = workflow_video_size(workflow)
+
+    turn_rows = []
+    for turn_num in turns:
+        turn_nodes = [
+            node
+            for node in workflow["nodes"]
+            if node_turn(node["id"], turns) == turn_num
+        ]
+        decode_hashes = sorted(
+            node_input_hash(node["id"], nodes_by_id, inbound_links, memo)
+            for node in turn_nodes
+            if node["type"] in ("VAEDecode", "VAEDecodeTiled")
+        )
+        turn_rows.append(
+            (
+                turn_num,
+                (
+                    hashlib.sha256(
+                        json.dumps(decode_hashes).encode("utf-8")
+                    ).hexdigest()[:CACHE_KEY_LENGTH]
+                    if decode_hashes
+                    else None
+                ),
+                json.dumps(
+                    [
+                        node["widgets_values"][1]
+                        for node in turn_nodes
+                        if node["type"] == "KSamplerAdvanced"
+                        and node["widgets_values"][0] == "enable"
+                    ]
+                ),
+                json.dumps(
+                    sorted(
+                        {
+                            node["widgets_values"][0]
+                            for node in turn_nodes
+                            if HISTORY_STAGES.get(node["type"]) == "load"
+                        }
+                    )
+                ),
+                json.dumps(
+                    [
+                        enabled_loras(node["widgets_values"])
+                        for node in turn_nodes
+                        if node["type"] == "Power Lora Loader (rgthree)"
+                    ]
+                ),
+            )
+        )
+
+    with closing(open_run_history(db_path)) as connection, connection:
+        run_id = connection.execute(
+            "INSERT INTO runs (created_at, kind, script_name, script_hash, "
+            "workflow_path, turns, turn_count, width, height, length, config_key, "
+            "config) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                datetime.now().isoformat(timespec="seconds"),
+                kind,
+                os.path.splitext(os.path.basename(script_path))[0],
+                file_sha256(script_path),
+                workflow_path,
+                json.dumps(turns),
+                len(turns),
+                width,
+                height,
+                length,
+                hashlib.sha256(
+                    json.dumps(config, sort_keys=True).encode("utf-8")
+                ).hexdigest()[:CACHE_KEY_LENGTH],
+                json.dumps(config, sort_keys=True),
             ),
-            create_node(
-                "KSamplerAdvanced",
-                ids["ksampler_low"],
-                [x_pos + 1200, 300],
-                [
-                    "disable",
-                    1,
-                    NOISE_SEED_MODE,
-                    SAMPLER_STEPS_LOW,
-                    SAMPLER_CFG,
-                    SAMPLER_NAME,
-                    SCHEDULER_NAME,
-                    I2V_LOW_START_STEP,
-                    I2V_LOW_END_STEP,
-                    "disable",
-                ],
+        ).lastrowid
+        connection.executemany(
+            "INSERT INTO turn_inputs (run_id, turn, input_hash, seeds, models, loras) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(run_id, *row) for row in turn_rows],
+        )
+        connection.executemany(
+            "INSERT INTO node_turns (run_id, node_id, turn, node_type) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (run_id, node["id"], node_turn(node["id"], turns), node["type"])
+                for node in workflow["nodes"]
+            ],
+        )
+    print(f"Recorded run {run_id} in {db_path}")
+    return run_id
+
+
+def history_total_seconds(entry):
+    timestamps = {
+        event: data["timestamp"]
+        for event, data in entry.get("status", {}).get("messages", [])
+        if isinstance(data, dict) and "timestamp" in data
+    }
+    finished = [
+        timestamps[event]
+        for event in ("execution_success", "execution_error", "execution_interrupted")
+        if event in timestamps
+    ]
+    if "execution_start" not in timestamps or not finished:
+        return None
+    return (finished[0] - timestamps["execution_start"]) / 1000
+
+
+def record_submission(
+    db_path, run_id, server, prompt_id, entry, comfy_dir=None, node_seconds=None
+):
+    error = prompt_error(entry)
+    with closing(open_run_history(db_path)) as connection, connection:
+        turns = json.loads(
+            connection.execute(
+                "SELECT turns FROM runs WHERE id = ?", (run_id,)
+            ).fetchone()["turns"]
+        )
+        node_types = {
+            row["node_id"]: row["node_type"]
+            for row in connection.execute(
+                "SELECT node_id, node_type FROM node_turns WHERE run_id = ?", (run_id,)
+            )
+        }
+        submission_id = connection.execute(
+            "INSERT INTO submissions (run_id, server, prompt_id, status, error, "
+            "completed_at, total_seconds) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                server,
+                prompt_id,
+                "success" if error is None else "error",
+                describe_prompt_error(prompt_id, error) if error is not None else None,
+                datetime.now().isoformat(timespec="seconds"),
+                history_total_seconds(entry),
             ),
-            create_node("VRAMCleanup", ids["vram_cleanup_mid"], [x_pos + 900, 700], []),
-            create_node("RAMCleanup", ids["ram_cleanup_mid"], [x_pos + 1050, 700], []),
-            create_node("VAEDecode", ids["vae_decode"], [x_pos + 1500, 300], []),
-            create_node(
-                "VRAMCleanup", ids["vram_cleanup_final"], [x_pos + 1500, 400], []
+        ).lastrowid
+
+        # Per-node durations come from the server's executing events; prompts
+        # whose events were missed only get the total
+        stage_seconds = {}
+        for node_id, seconds in (node_seconds or {}).items():
+            stage_key = (
+                node_turn(int(node_id), turns),
+                HISTORY_STAGES.get(node_types.get(int(node_id)), "other"),
+            )
+            stage_seconds[stage_key] = stage_seconds.get(stage_key, 0) + seconds
+        connection.executemany(
+            "INSERT INTO stage_timings (submission_id, turn, stage, seconds) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (submission_id, turn_num, stage, round(seconds, 3))
+                for (turn_num, stage), seconds in sorted(
+                    stage_seconds.items(), key=lambda item: str(item[0])
+                )
+            ],
+        )
+
+        output_rows = []
+        for node_id, node_output in entry.get("outputs", {}).items():
+            for kind, files in node_output.items():
+                if not isinstance(files, list):
+                    continue
+                for file_entry in files:
+                    if not isinstance(file_entry, dict) or "filename" not in file_entry:
+                        continue
+                    path = os.path.join(
+                        file_entry.get("subfolder", ""), file_entry["filename"]
+                    )
+                    local_path = (
+                        os.path.join(comfy_dir, file_entry.get("type", "output"), path)
+                        if comfy_dir
+                        else None
+                    )
+                    exists = local_path is not None and os.path.exists(local_path)
+                    output_rows.append(
+                        (
+                            submission_id,
+                            int(node_id),
+                            node_turn(int(node_id), turns),
+                            kind,
+                            local_path if exists else path,
+                            file_sha256(local_path) if exists else None,
+                            os.path.getsize(local_path) if exists else None,
+                        )
+                    )
+        connection.executemany(
+            "INSERT INTO outputs (submission_id, node_id, turn, kind, path, sha256, "
+            "size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            output_rows,
+        )
+    return submission_id
+
+
+def fastest_configs(db_path, width, height, length, limit=5):
+    with closing(open_run_history(db_path)) as connection:
+        return connection.execute(
+            "SELECT runs.config_key, runs.config, COUNT(*) AS runs, "
+            "AVG(submissions.total_seconds / runs.turn_count) AS seconds_per_turn "
+            "FROM runs JOIN submissions ON submissions.run_id = runs.id "
+            "WHERE runs.width = ? AND runs.height = ? AND runs.length = ? "
+            "AND submissions.status = 'success' AND runs.turn_count > 0 "
+            "AND submissions.total_seconds IS NOT NULL "
+            "GROUP BY runs.config_key ORDER BY seconds_per_turn LIMIT ?",
+            (width, height, length, limit),
+        ).fetchall()
+
+
+def clips_for_turn(db_path, script_name, turn_num):
+    with closing(open_run_history(db_path)) as connection:
+        return connection.execute(
+            "SELECT outputs.path, outputs.sha256, outputs.size, turn_inputs.input_hash, "
+            "turn_inputs.seeds, submissions.prompt_id, runs.created_at "
+            "FROM outputs "
+            "JOIN submissions ON submissions.id = outputs.submission_id "
+            "JOIN runs ON runs.id = submissions.run_id "
+            "LEFT JOIN turn_inputs ON turn_inputs.run_id = runs.id "
+            "AND turn_inputs.turn = outputs.turn "
+            "WHERE outputs.turn = ? AND outputs.kind = 'gifs' AND runs.script_name = ? "
+            "ORDER BY runs.created_at DESC",
+            (turn_num, script_name),
+        ).fetchall()
+
+
+def print_history_query(
+    db_path,
+    query,
+    script_path,
+    turns_range,
+    render_profile,
+    interpolate,
+    config=DEFAULT_CONFIG,
+):
+    if query == "fastest":
+        width, height = render_resolution(render_profile, config=config)
+        length = sampled_video_length(interpolate, config=config)
+        rows = fastest_configs(db_path, width, height, length)
+        print(f"Fastest recorded configs for {width}x{height}x{length}:")
+        for row in rows:
+            print(
+                f"- {row['seconds_per_turn']:.1f}s/turn over {row['runs']} run(s): "
+                f"{row['config']}"
+            )
+        if not rows:
+            print("- no successful runs recorded")
+    else:
+        if not turns_range:
+            raise ValueError("--history-query clips needs --turns")
+        script_name = os.path.splitext(os.path.basename(script_path))[0]
+        for turn_num in turns_range:
+            rows = clips_for_turn(db_path, script_name, turn_num)
+            print(f"Clips for {script_name} turn {turn_num}:")
+            for row in rows:
+                print(
+                    f"- {row['created_at']} {row['path']} "
+                    f"(input {row['input_hash']}, seeds {row['seeds']}, "
+                    f"sha256 {(row['sha256'] or 'unknown')[:CACHE_KEY_LENGTH]})"
+                )
+            if not rows:
+                print("- no clips recorded")
+
+
+def update_metric(name, value=1, mode="add", **labels):
+    key = (name, tuple(sorted((label, str(v)) for label, v in labels.items())))
+    with METRICS_LOCK:
+        current = METRICS.get(key)
+        if mode == "add":
+            METRICS[key] = (current or 0) + value
+        elif mode == "max" and current is not None:
+            METRICS[key] = max(current, value)
+        else:
+            METRICS[key] = value
+
+
+def observe_metric(name, value, **labels):
+    update_metric(f"{name}_sum", value, **labels)
+    update_metric(f"{name}_count", 1, **labels)
+
+
+def metric_label_value(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    with METRICS_LOCK:
+        samples = sorted(METRICS.items())
+    lines = []
+    for name, (metric_type, help_text) in METRIC_TYPES.items():
+        metric_samples = [
+            (sample_name, labels, value)
+            for (sample_name, labels), value in samples
+            if sample_name in (name, f"{name}_sum", f"{name}_count")
+        ]
+        if not metric_samples:
+            continue
+        lines.extend([f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"])
+        for sample_name, labels, value in metric_samples:
+            label_text = ",".join(
+                f'{label}="{metric_label_value(v)}"' for label, v in labels
+            )
+            lines.append(
+                f"{sample_name}{{{label_text}}} {float(value)!r}"
+                if labels
+                else f"{sample_name} {float(value)!r}"
+            )
+    return "\n".join(lines) + "\n"
+
+
+def node_roles(workflow):
+    # Turn kinds lay out their ids differently; the node behind each kind's
+    # distinguishing key, or behind turn_video once a stored clip replaced
+    # the turn, tells which layout a turn uses
+    nodes_by_id = {node["id"]: node for node in workflow.get("nodes", [])}
+    turn_kinds = [
+        (FIRST_TURN_I2V_NODE_KEYS, "load_image", "LoadImage"),
+        (I2V_TURN_NODE_KEYS, "select_image", "VHS_SelectImages"),
+        (T2V_TURN_NODE_KEYS, "empty_latent", "EmptyHunyuanLatentVideo"),
+    ]
+    id_roles = [
+        (CLIP_STORE_ID_OFFSET, CLIP_STORE_ID_OFFSET + 3, "clip_store"),
+        (CLEANUP_ID_OFFSET, CLEANUP_ID_LIMIT, "cleanup"),
+        (VARIANT_ID_OFFSET, ACCEL_ID_OFFSET, "variant"),
+        (ACCEL_ID_OFFSET, INTERP_ID_OFFSET, "accel"),
+        (INTERP_ID_OFFSET, UPSCALE_ID_OFFSET, "interpolation"),
+        (UPSCALE_ID_OFFSET, NODE_ID_BASE_OFFSET, "upscale"),
+    ]
+    turns = workflow_turns(workflow) if nodes_by_id else []
+    roles = {}
+    for turn_num in turns:
+        turn_ids = [
+            turn_node_ids(turn_num, node_keys) for node_keys, _, _ in turn_kinds
+        ]
+        ids = next(
+            (
+                ids
+                for ids, (_, key, node_type) in zip(turn_ids, turn_kinds)
+                if nodes_by_id.get(ids[key], {}).get("type") == node_type
             ),
-            create_node(
-                "RAMCleanup", ids["ram_cleanup_final"], [x_pos + 1500, 500], []
+            next(
+                (
+                    ids
+                    for ids in turn_ids
+                    if nodes_by_id.get(ids["turn_video"], {}).get("type")
+                    == "VHS_VideoCombine"
+                ),
+                turn_ids[-1],
             ),
-            create_node(
-                "ImageBatchMulti",
-                ids["batch_images"],
-                [x_pos + 1800, 300],
-                [BATCH_INPUT_COUNT, None],
+        )
+        roles.update(
+            (node_id, (turn_num, key))
+            for key, node_id in ids.items()
+            if node_id in nodes_by_id
+        )
+    for node_id in nodes_by_id:
+        turn_num = node_turn(node_id, turns)
+        if node_id in roles:
+            continue
+        if turn_num is None:
+            roles[node_id] = (None, "final")
+            continue
+        offset = node_id % NODE_ID_BASE_OFFSET
+        roles[node_id] = (
+            turn_num,
+            next(
+                (role for start, end, role in id_roles if start <= offset < end),
+                "other",
             ),
-            create_node(
-                "VHS_VideoCombine",
-                ids["turn_video"],
-                [x_pos + 1500, 700],
-                [
-                    FRAME_RATE,
-                    VIDEO_LOOP_COUNT,
-                    f"{workflow_name}_turn{turn_idx}",
-                    VIDEO_FORMAT,
-                    VIDEO_PINGPONG,
-                    VIDEO_SAVE_OUTPUT,
-                    VIDEO_PIXEL_FORMAT,
-                    VIDEO_CRF,
-                    VIDEO_SAVE_METADATA,
-                    VIDEO_TRIM_TO_AUDIO,
-                ],
-                f"Save Turn {turn_idx} Video",
+        )
+    return roles
+
+
+def record_prompt_metrics(entry, node_seconds=None):
+    workflow = prompt_workflow(entry)
+    prompt = entry.get("prompt") or []
+    api_prompt = prompt[2] if len(prompt) > 2 else {}
+    roles = node_roles(workflow)
+    error = prompt_error(entry)
+    update_metric(
+        "script2workflow_prompts_total",
+        status="success" if error is None else "error",
+    )
+    total_seconds = history_total_seconds(entry)
+    if total_seconds is not None:
+        observe_metric("script2workflow_prompt_seconds", total_seconds)
+
+    def role_labels(node_id):
+        turn_num, role = roles.get(int(node_id), (None, "other"))
+        return {"turn": turn_num if turn_num is not None else "", "role": role}
+
+    for node_id, seconds in (node_seconds or {}).items():
+        observe_metric(
+            "script2workflow_stage_seconds",
+            seconds,
+            stage=HISTORY_STAGES.get(
+                api_prompt.get(node_id, {}).get("class_type"), "other"
             ),
-        ]
+            **role_labels(node_id),
+        )
+
+    cached = {
+        str(node_id)
+        for event, data in entry.get("status", {}).get("messages", [])
+        if event == "execution_cached"
+        for node_id in data.get("nodes", [])
+    }
+    executed = (
+        set(api_prompt) - cached
+        if error is None
+        else {str(node_id) for node_id in error.get("executed", [])} - cached
+    )
+    update_metric(
+        "script2workflow_cache_lookups_total",
+        len(cached),
+        cache="comfyui_nodes",
+        result="hit",
+    )
+    update_metric(
+        "script2workflow_cache_lookups_total",
+        len(executed),
+        cache="comfyui_nodes",
+        result="miss",
+    )
+    for node_id in executed:
+        class_type = api_prompt.get(node_id, {}).get("class_type")
+        if HISTORY_STAGES.get(class_type) == "load":
+            update_metric(
+                "script2workflow_model_loads_total",
+                node_type=class_type,
+                **role_labels(node_id),
+            )
+
+
+def poll_server_metrics(server, poll_seconds=METRICS_POLL_SECONDS):
+    while True:
+        try:
+            queue_status = comfy_request(server, "/queue")
+            stats = comfy_request(server, "/system_stats")
+        except (OSError, RuntimeError, ValueError):
+            update_metric("script2workflow_server_up", 0, "set", server=server)
+        else:
+            update_metric("script2workflow_server_up", 1, "set", server=server)
+            update_metric(
+                "script2workflow_queue_depth",
+                len(queue_status.get("queue_running", []))
+                + len(queue_status.get("queue_pending", [])),
+                "set",
+                queue="comfyui",
+                server=server,
+            )
+            memory = [
+                ("vram", device.get("name", str(device_idx)), device)
+                for device_idx, device in enumerate(stats.get("devices", []))
+            ] + [("ram", "system", stats.get("system", {}))]
+            for kind, device_name, values in memory:
+                if f"{kind}_total" not in values:
+                    continue
+                used = values[f"{kind}_total"] - values.get(f"{kind}_free", 0)
+                labels = {"server": server, "device": device_name}
+                update_metric(
+                    f"script2workflow_{kind}_used_bytes", used, "set", **labels
+                )
+                update_metric(
+                    f"script2workflow_{kind}_high_water_bytes", used, "max", **labels
+                )
+        time.sleep(poll_seconds)
+
+
+def start_metrics_server(port, servers=(), host=METRICS_HOST):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_metrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+    for server in servers:
+        threading.Thread(
+            target=poll_server_metrics, args=(server,), daemon=True
+        ).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return metrics_server
+
+
+def changed_turns(old_turns, new_turns):
+    return sorted(
+        int(key)
+        for key in set(old_turns) | set(new_turns)
+        if key.isdigit() and old_turns.get(key) != new_turns.get(key)
     )
 
-    link_defs = [
-        (ids["unet_high"], 0, ids["sampler_high"], 0, "MODEL"),
-        (ids["unet_low"], 0, ids["sampler_low"], 0, "MODEL"),
-        (ids["sampler_high"], 0, ids["lora_high"], 0, "MODEL"),
-        (ids["sampler_low"], 0, ids["lora_low"], 0, "MODEL"),
-        (ids["clip_loader"], 0, ids["lora_high"], 1, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_pos"], 0, "CLIP"),
-        (ids["lora_high"], 1, ids["prompt_neg"], 0, "CLIP"),
-        (ids["lora_high"], 0, ids["ksampler_high"], 0, "MODEL"),
-        (ids["lora_low"], 0, ids["ksampler_low"], 0, "MODEL"),
-        (ids["prompt_pos"], 0, ids["i2v_latent"], 0, "CONDITIONING"),
-        (ids["prompt_neg"], 0, ids["i2v_latent"], 1, "CONDITIONING"),
-        (ids["vae_loader"], 0, ids["i2v_latent"], 2, "VAE"),
-        (ids["select_image"], 0, ids["image_scale"], 0, "IMAGE"),
-        (ids["image_scale"], 0, ids["i2v_latent"], 4, "IMAGE"),
-        (ids["i2v_latent"], 0, ids["ksampler_high"], 1, "CONDITIONING"),
-        (ids["i2v_latent"], 0, ids["ksampler_low"], 1, "CONDITIONING"),
-        (ids["i2v_latent"], 1, ids["ksampler_high"], 2, "CONDITIONING"),
-        (ids["i2v_latent"], 1, ids["ksampler_low"], 2, "CONDITIONING"),
-        (ids["i2v_latent"], 2, ids["ksampler_high"], 3, "LATENT"),
-        (ids["ksampler_high"], 0, ids["vram_cleanup_mid"], 0, "*"),
-        (ids["vram_cleanup_mid"], 0, ids["ram_cleanup_mid"], 0, "*"),
-        (ids["ram_cleanup_mid"], 0, ids["ksampler_low"], 3, "LATENT"),
-        (ids["ksampler_low"], 0, ids["vae_decode"], 0, "LATENT"),
-        (ids["vae_loader"], 0, ids["vae_decode"], 1, "VAE"),
-        (ids["vae_decode"], 0, ids["vram_cleanup_final"], 0, "*"),
-        (ids["vram_cleanup_final"], 0, ids["ram_cleanup_final"], 0, "*"),
-        (prev_turn_output_node_id, 0, ids["select_image"], 0, "IMAGE"),
-        (prev_turn_output_node_id, 0, ids["batch_images"], 0, "IMAGE"),
-        (ids["ram_cleanup_final"], 0, ids["batch_images"], 1, "IMAGE"),
-        (ids["vae_decode"], 0, ids["turn_video"], 0, "IMAGE"),
-    ]
 
-    return nodes, link_defs, ids["batch_images"]
+def prune_turn_cache(turn_cache, script_turns):
+    # Entries are keyed by the turn's number and data first, so those of
+    # edited or removed turns can never be hit again
+    for cache_key in list(turn_cache):
+        turn_num, turn_data = json.loads(cache_key)[:2]
+        if script_turns.get(str(turn_num)) != turn_data:
+            del turn_cache[cache_key]
+
+
+def invalidated_turns(script_turns, selected_turns, changed):
+    invalidated = set()
+    for turn_num in selected_turns:
+        if turn_num in changed:
+            invalidated.add(turn_num)
+        elif (
+            invalidated
+            and selected_turns.index(turn_num) > 0
+            and selected_turns[selected_turns.index(turn_num) - 1] in invalidated
+            and not script_turns[str(turn_num)].get("new_scene", False)
+        ):
+            invalidated.add(turn_num)
+    return invalidated
+
+
+def latest_handoff(comfy_dir, workflow_name, turn_num):
+    pattern = f"{HANDOFF_IMAGE_DIR}/{workflow_name}_turn{turn_num}_*.png"
+    if comfy_dir and glob.glob(os.path.join(comfy_dir, "output", pattern)):
+        return pattern
+    return None
+
+
+def watch_segments(script_turns, selected_turns, turns, workflow_name, comfy_dir):
+    # Consecutive runs of turns to re-render; a run that cannot start from a
+    # saved handoff frame is extended back to a turn that can
+    turns = set(turns)
+    while True:
+        segments = []
+        for turn_num in selected_turns:
+            if turn_num not in turns:
+                continue
+            if segments and selected_turns.index(turn_num) == (
+                selected_turns.index(segments[-1][-1]) + 1
+            ):
+                segments[-1].append(turn_num)
+            else:
+                segments.append([turn_num])
+        missing = [
+            segment[0]
+            for segment in segments
+            if segment[0] != selected_turns[0]
+            and not script_turns[str(segment[0])].get("new_scene", False)
+            and not latest_handoff(comfy_dir, workflow_name, segment[0])
+        ]
+        if not missing:
+            return segments
+        for turn_num in missing:
+            turns.add(selected_turns[selected_turns.index(turn_num) - 1])
+
+
+def quiet_call(function, *args, **kwargs):
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = function(*args, **kwargs)
+    for line in output.getvalue().splitlines():
+        if "Warning" in line:
+            print(line)
+    return result
+
+
+def quiet_generate_workflow(*args, **kwargs):
+    return quiet_call(generate_workflow, *args, **kwargs)
+
+
+def poll_watch_prompts(server, pending, history_db=None, comfy_dir=None):
+    for prompt_id, (segment, run_id) in list(pending.items()):
+        entry = comfy_request(server, f"/history/{prompt_id}").get(prompt_id)
+        if not entry or entry.get("status", {}).get("completed") is None:
+            continue
+        del pending[prompt_id]
+        node_seconds = prompt_node_seconds(server, prompt_id)
+        if history_db and run_id is not None:
+            record_submission(
+                history_db, run_id, server, prompt_id, entry, comfy_dir, node_seconds
+            )
+        store_clip_outputs(entry, comfy_dir)
+        record_prompt_metrics(entry, node_seconds)
+        error = prompt_error(entry)
+        if error is None:
+            print(f"Turns {segment} finished (prompt {prompt_id})")
+        else:
+            print(f"Turns {segment} failed: {describe_prompt_error(prompt_id, error)}")
+
+
+def queue_watch_segments(
+    server,
+    script_path,
+    script_turns,
+    selected_turns,
+    changed,
+    workflow_name,
+    image_path,
+    generate_args,
+    turn_cache,
+    pending,
+    comfy_dir=None,
+    history_db=None,
+):
+    invalidated = invalidated_turns(script_turns, selected_turns, changed)
+    queued = comfy_request(server, "/queue").get("queue_pending", [])
+    superseded = [
+        job[1]
+        for job in queued
+        if job[1] in pending and set(pending[job[1]][0]) & invalidated
+    ]
+    if superseded:
+        comfy_request(server, "/queue", {"delete": superseded})
+        for prompt_id in superseded:
+            invalidated.update(pending.pop(prompt_id)[0])
+        print(f"Removed {len(superseded)} superseded prompt(s) from the queue")
 
+    for segment in watch_segments(
+        script_turns, selected_turns, invalidated, workflow_name, comfy_dir
+    ):
+        segment_image = image_path
+        if segment[0] != selected_turns[0]:
+            segment_image = None
+            handoff_pattern = latest_handoff(comfy_dir, workflow_name, segment[0])
+            if handoff_pattern:
+                image_filename = f"{workflow_name}_turn{segment[0]}_handoff.png"
+                stage_comfy_output(comfy_dir, handoff_pattern, image_filename)
+                segment_image = os.path.join(comfy_dir, "input", image_filename)
+        segment_workflow = quiet_generate_workflow(
+            script_path,
+            segment,
+            segment_image,
+            save_handoffs=True,
+            turn_cache=turn_cache,
+            **generate_args,
+        )
+        run_id = (
+            record_run(history_db, "watch", script_path, segment_workflow)
+            if history_db
+            else None
+        )
+        prompt_id = queue_prompt(server, segment_workflow)
+        pending[prompt_id] = (segment, run_id)
+        print(f"Queued turns {segment} as prompt {prompt_id}")
 
-def generate_workflow(script_path, turns_range=None, image_path=None):
-    print(f"Loading movie script: {script_path}")
 
+def watch_script(
+    script_path,
+    turns_range,
+    image_path,
+    generate_args,
+    output_filename,
+    server=None,
+    comfy_dir=None,
+    history_db=None,
+    object_info_source=None,
+):
+    turn_cache, pending = {}, {}
+    script_turns, last_mtime = None, None
+    print(f"Watching {script_path} for changes (Ctrl+C to stop)...")
     try:
-        with open(script_path, "r", encoding="utf-8") as f:
-            movie_script = json.load(f)
-    except Exception as e:
-        print(f"Error loading script file: {e}")
-        raise
+        while True:
+            try:
+                mtime = os.path.getmtime(script_path)
+            except FileNotFoundError:
+                # Editors that save by renaming a new file over the script
+                # remove it for a moment
+                mtime = last_mtime
+            if mtime != last_mtime:
+                last_mtime = mtime
+                start_time = time.time()
+                try:
+                    with redirect_stdout(io.StringIO()):
+                        new_turns, workflow_name = load_movie_script(script_path)
+                    selected_turns = select_turns(new_turns, turns_range)
+                    workflow = quiet_generate_workflow(
+                        script_path,
+                        turns_range,
+                        image_path,
+                        save_handoffs=bool(server),
+                        turn_cache=turn_cache,
+                        **generate_args,
+                    )
+                    preflight_workflow(
+                        workflow, generate_args.get("models_dir"), object_info_source
+                    )
+                except ValueError as e:
+                    print(f"Not regenerated: {e}")
+                    time.sleep(WATCH_POLL_SECONDS)
+                    continue
+                prune_turn_cache(turn_cache, new_turns)
+                with open(output_filename, "w", encoding="utf-8") as f:
+                    json.dump(workflow, f, indent=2)
+                elapsed_ms = (time.time() - start_time) * 1000
 
-    workflow_name = os.path.splitext(os.path.basename(script_path))[0]
+                changed = (
+                    changed_turns(script_turns, new_turns)
+                    if script_turns is not None
+                    else selected_turns
+                )
+                changed = [
+                    turn_num for turn_num in changed if turn_num in selected_turns
+                ]
+                if script_turns is None:
+                    print(
+                        f"Generated {output_filename} in {elapsed_ms:.0f} ms "
+                        f"({len(selected_turns)} turns)"
+                    )
+                else:
+                    print(
+                        f"Regenerated {output_filename} in {elapsed_ms:.0f} ms "
+                        f"(changed turns: {changed})"
+                    )
+                if history_db and changed:
+                    record_run(
+                        history_db, "watch", script_path, workflow, output_filename
+                    )
 
-    script_turns = movie_script.get("turns", {})
-    available_turns = [int(k) for k in script_turns.keys() if k.isdigit()]
+                if server and script_turns is not None and changed:
+                    try:
+                        queue_watch_segments(
+                            server,
+                            script_path,
+                            new_turns,
+                            selected_turns,
+                            changed,
+                            workflow_name,
+                            image_path,
+                            generate_args,
+                            turn_cache,
+                            pending,
+                            comfy_dir,
+                            history_db,
+                        )
+                    except (RuntimeError, OSError) as e:
+                        # The next poll compares against the old script again,
+                        # so every edited turn is queued once the server is back
+                        print(f"Server error, retrying: {e}")
+                        last_mtime = None
+                        time.sleep(WATCH_POLL_SECONDS)
+                        continue
+                script_turns = new_turns
 
-    if not available_turns:
-        raise ValueError("Movie script contains no valid turns.")
+            if server and pending:
+                try:
+                    poll_watch_prompts(server, pending, history_db, comfy_dir)
+                except (RuntimeError, OSError) as e:
+                    print(f"Server error while polling, retrying: {e}")
+            time.sleep(WATCH_POLL_SECONDS)
+    except KeyboardInterrupt:
+        print("\nStopped watching")
 
-    if turns_range is None:
-        selected_turns = sorted(available_turns)
-    else:
-        selected_turns = []
-        for turn_num in turns_range:
-            if turn_num not in available_turns:
-                raise ValueError(
-                    f"Turn {turn_num} not found in script. Available turns: {available_turns}"
-                )
-            selected_turns.append(turn_num)
-        selected_turns = sorted(selected_turns)
+
+def generate_workflow(
+    script_path,
+    turns_range=None,
+    image_path=None,
+    variants=1,
+    variant_mode="seed",
+    batch_t2v=False,
+    save_latents=False,
+    vram_budget=None,
+    accel="none",
+    interpolate=1,
+    interpolation_model="rife",
+    render_profile="native",
+    bake_registry_path=None,
+    models_dir=None,
+    save_handoffs=False,
+    degradations=(),
+    turn_cache=None,
+    save_tail_handoff=False,
+    clip_store=None,
+    clip_store_quota=CLIP_STORE_QUOTA_GB,
+    comfy_dir=None,
+    image_name=None,
+    keyframes=None,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    selected_turns = select_turns(script_turns, turns_range)
+
+    unknown_degradations = set(degradations) - set(OOM_DEGRADATION_STEPS)
+    if unknown_degradations:
+        raise ValueError(
+            f"Unknown degradations {sorted(unknown_degradations)}. "
+            f"Available degradations: {OOM_DEGRADATION_STEPS}"
+        )
+    if variants < 1:
+        raise ValueError(f"Variant count must be at least 1, got {variants}")
+    if batch_t2v and variants > 1:
+        raise ValueError("T2V batching cannot be combined with variant sweeps")
+    if batch_t2v and save_latents:
+        raise ValueError("T2V batching cannot be combined with latent checkpoints")
+    if batch_t2v and interpolate > 1:
+        raise ValueError("T2V batching cannot be combined with frame interpolation")
+    if clip_store and not comfy_dir:
+        raise ValueError(
+            "The clip store needs the ComfyUI folder to stage stored clips"
+        )
+    if keyframes and (batch_t2v or save_latents):
+        raise ValueError(
+            "Keyframe segments cannot be combined with T2V batching or latent "
+            "checkpoints"
+        )
 
     if image_path:
-        image_filename = os.path.basename(image_path)
+        # image_name is the input name of an image uploaded under its hash
+        image_filename = image_name or os.path.basename(image_path)
         if not os.path.exists(image_path):
             raise ValueError(f"Image file not found: {image_path}")
         print(f"Using provided image: {image_filename}")
@@ -1614,6 +6790,66 @@ def generate_workflow(script_path, turns_range=None, image_path=None):
     print(f"Processing turns: {selected_turns}")
     print("Enhanced with multiple LoRAs: Lightning + Optional")
     print(f"Image upscaling: {UPSCALE_METHOD} method at {UPSCALE_FACTOR}x scale")
+    if variants > 1:
+        print(f"Variant sweep: {variants} {variant_mode} variants per turn")
+    if accel != "none":
+        print(f"Sampling acceleration profile: {accel}")
+    sampled_length = sampled_video_length(interpolate, config=config)
+    if interpolate > 1:
+        print(
+            f"Frame interpolation: sampling {sampled_length} frames, "
+            f"{interpolation_model.upper()} x{interpolate} to {config.frame_rate}fps"
+        )
+    render_width, render_height = render_resolution(render_profile, config=config)
+    output_width, output_height = output_resolution(render_profile, config=config)
+    if render_profile != "native":
+        print(
+            f"Render profile {render_profile}: sampling at {render_width}x{render_height}, "
+            f"upscaling to {output_width}x{output_height} with {POST_UPSCALE_MODEL}"
+        )
+    if save_latents:
+        print(f"Saving high-noise latents to {LATENT_OUTPUT_DIR}/ for refine passes")
+    if keyframes:
+        print("Rendering every turn on its own between its keyframe and the next")
+    if clip_store and (variants > 1 or save_latents):
+        print(
+            "Clip store skipped: variant sweeps and latent checkpoints render in full"
+        )
+    elif clip_store:
+        print(f"Reusing and storing finished turns in the clip store {clip_store}")
+    degraded_budget = (
+        vram_budget * OOM_DEGRADED_BUDGET_SCALE if vram_budget is not None else None
+    )
+    if degradations:
+        print(f"Degraded for out-of-memory recovery: {list(degradations)}")
+    if "shorter-length" in degradations:
+        sampled_length = shorter_video_length(sampled_length)
+        print(f"Sampling {sampled_length} frames per turn")
+    decode_budget = degraded_budget if "tiled-decode" in degradations else vram_budget
+    decode_tiling = choose_vae_decode_tiling(
+        render_width, render_height, sampled_length, decode_budget
+    )
+    if "tiled-decode" in degradations and decode_tiling is None:
+        decode_tiling = OOM_DECODE_TILING
+    if decode_tiling:
+        tile_size, overlap, temporal_size, temporal_overlap = decode_tiling
+        print(
+            f"Tiled VAE decode for {vram_budget} GB: {tile_size}px tiles (overlap {overlap}), "
+            f"{temporal_size} frames (overlap {temporal_overlap})"
+        )
+    elif vram_budget is not None:
+        print(f"Plain VAE decode fits in {vram_budget} GB")
+    resolved_models = {}
+    if models_dir:
+        print(f"Resolving GGUF quantizations from {models_dir}...")
+        resolved_models = resolve_model_quantization(
+            load_model_index(models_dir),
+            degraded_budget if "lower-quant" in degradations else vram_budget,
+            render_width,
+            render_height,
+            sampled_length,
+            config=config,
+        )
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     turns_str = (
@@ -1625,6 +6861,70 @@ def generate_workflow(script_path, turns_range=None, image_path=None):
     all_nodes, all_link_defs = [], []
     last_turn_output_node_id = None
     is_first_turn = True
+    latent_checkpoints, hash_memo, hash_salts = {}, {}, {}
+
+    t2v_turns = [
+        turn_num
+        for turn_num in selected_turns
+        if (turn_num == selected_turns[0] and not image_path)
+        or (
+            turn_num != selected_turns[0]
+            and script_turns[str(turn_num)].get("new_scene", False)
+        )
+    ]
+    batch_outputs = {}
+    if batch_t2v and len(t2v_turns) > 1:
+        for start in range(0, len(t2v_turns), T2V_BATCH_MAX_SIZE):
+            batch_turns = [
+                (
+                    turn_num,
+                    script_turns[str(turn_num)].get("positive_prompt", ""),
+                    script_turns[str(turn_num)].get("negative_prompt", ""),
+                )
+                for turn_num in t2v_turns[start : start + T2V_BATCH_MAX_SIZE]
+            ]
+            print(
+                f"Batching T2V turns {[turn[0] for turn in batch_turns]} into one sampler..."
+            )
+            nodes, link_defs, outputs = create_t2v_batch(
+                batch_turns, workflow_name, config=config
+            )
+            nodes, link_defs = apply_accel_profile(
+                batch_turns[0][0],
+                nodes,
+                link_defs,
+                script_turns[str(batch_turns[0][0])].get("accel", accel),
+                render_width,
+                render_height,
+            )
+            nodes, link_defs = apply_render_profile(
+                batch_turns[0][0],
+                nodes,
+                link_defs,
+                render_profile,
+                config=config,
+            )
+            # One decode covers every turn of the batch
+            batch_tiling = choose_vae_decode_tiling(
+                render_width,
+                render_height,
+                len(batch_turns) * sampled_length,
+                decode_budget,
+            )
+            if "tiled-decode" in degradations and batch_tiling is None:
+                batch_tiling = OOM_DECODE_TILING
+            nodes = apply_vae_decode_tiling(nodes, batch_tiling)
+            nodes = apply_model_quantization(nodes, resolved_models)
+            all_nodes.extend(nodes)
+            all_link_defs.extend(link_defs)
+            batch_outputs.update(outputs)
+
+    # Clip keys hash the graph as generated, seeds included, before stored
+    # clips replace turns
+    clip_hash_nodes = {node["id"]: node for node in all_nodes}
+    clip_hash_link_defs, clip_memo = list(all_link_defs), {}
+    stored_clips, stored_frames = {}, {}
+    handoff_frame_hash = handoff_frame_node = None
 
     for turn_num in selected_turns:
         turn_data = script_turns[str(turn_num)]
@@ -1633,19 +6933,118 @@ def generate_workflow(script_path, turns_range=None, image_path=None):
         positive_prompt = turn_data.get("positive_prompt", "")
         negative_prompt = turn_data.get("negative_prompt", "")
 
-        if is_first_turn:
+        # Per-turn subgraphs are kept in turn_cache (watch mode) so unchanged
+        # turns keep their nodes and seeds across regenerations
+        cache_key = None
+        if turn_cache is not None and turn_num not in batch_outputs:
+            cache_key = json.dumps(
+                [
+                    turn_num,
+                    turn_data,
+                    is_first_turn,
+                    turn_num in t2v_turns,
+                    last_turn_output_node_id,
+                    image_filename if image_path else None,
+                    workflow_name,
+                    variants,
+                    variant_mode,
+                    accel,
+                    render_profile,
+                    interpolate,
+                    interpolation_model,
+                    resolved_models,
+                    sorted(degradations),
+                    sampled_length,
+                    keyframes.get(turn_num) if keyframes else None,
+                ],
+                sort_keys=True,
+            )
+        turn_cached = cache_key is not None and cache_key in turn_cache
+        if cache_key is not None:
+            update_metric(
+                "script2workflow_cache_lookups_total",
+                cache="watch_turns",
+                result="hit" if turn_cached else "miss",
+            )
+
+        node_keys = I2V_TURN_NODE_KEYS
+        if turn_cached:
+            cached_graph, output_node_id, node_keys = turn_cache[cache_key]
+            nodes, link_defs = copy.deepcopy(cached_graph)
+            is_first_turn = False
+        elif keyframes:
+            # Each turn starts from its own keyframe, so it joins the previous
+            # turn's frames like a new scene instead of chaining from them
+            node_keys = FIRST_TURN_I2V_NODE_KEYS
+            start_path, end_path = keyframes[turn_num]
+            nodes, link_defs, output_node_id = create_first_turn_i2v(
+                turn_num,
+                positive_prompt,
+                negative_prompt,
+                os.path.basename(start_path),
+                workflow_name,
+                variants,
+                variant_mode,
+                config=config,
+            )
+            if end_path:
+                nodes, link_defs = apply_end_keyframe(
+                    turn_num, nodes, link_defs, os.path.basename(end_path)
+                )
+            if not is_first_turn:
+                join_nodes, join_link_defs, output_node_id = create_scene_join(
+                    turn_num, last_turn_output_node_id, output_node_id, config=config
+                )
+                nodes.extend(join_nodes)
+                link_defs.extend(join_link_defs)
+            is_first_turn = False
+        elif turn_num in batch_outputs:
+            node_keys = None
+            nodes, link_defs, output_node_id = [], [], batch_outputs[turn_num]
+            if not is_first_turn:
+                nodes, link_defs, output_node_id = create_scene_join(
+                    turn_num, last_turn_output_node_id, output_node_id, config=config
+                )
+            is_first_turn = False
+        elif turn_num in t2v_turns and not is_first_turn:
+            node_keys = T2V_TURN_NODE_KEYS
+            nodes, link_defs, output_node_id = create_t2v_turn(
+                turn_num,
+                positive_prompt,
+                negative_prompt,
+                workflow_name,
+                variants,
+                variant_mode,
+                config=config,
+            )
+            join_nodes, join_link_defs, output_node_id = create_scene_join(
+                turn_num, last_turn_output_node_id, output_node_id, config=config
+            )
+            nodes.extend(join_nodes)
+            link_defs.extend(join_link_defs)
+        elif is_first_turn:
             if image_path:
-                image_filename = os.path.basename(image_path)
+                node_keys = FIRST_TURN_I2V_NODE_KEYS
                 nodes, link_defs, output_node_id = create_first_turn_i2v(
                     turn_num,
                     positive_prompt,
                     negative_prompt,
                     image_filename,
                     workflow_name,
+                    variants,
+                    variant_mode,
+                    config=config,
                 )
             else:
+                node_keys = T2V_TURN_NODE_KEYS
                 nodes, link_defs, output_node_id = create_t2v_turn(
-                    turn_num, positive_prompt, negative_prompt, workflow_name
+                    turn_num,
+                    positive_prompt,
+                    negative_prompt,
+                    workflow_name,
+                    variants,
+                    variant_mode,
+                    config=config,
                 )
             is_first_turn = False
         else:
@@ -1659,101 +7058,894 @@ def generate_workflow(script_path, turns_range=None, image_path=None):
                 negative_prompt,
                 last_turn_output_node_id,
                 workflow_name,
+                variants,
+                variant_mode,
+                config=config,
+            )
+
+        if node_keys is FIRST_TURN_I2V_NODE_KEYS:
+            ids = turn_node_ids(turn_num, node_keys)
+            salted_images = {"load_image": image_path}
+            if keyframes:
+                salted_images = dict(
+                    zip(["load_image", "load_end_image"], keyframes[turn_num])
+                )
+            for key, path in salted_images.items():
+                # Keyframes not staged locally are keyed by their input name
+                if path:
+                    hash_salts[ids[key]] = (
+                        file_sha256(path)
+                        if os.path.exists(path)
+                        else os.path.basename(path)
+                    )
+        if node_keys is not None and not turn_cached:
+            nodes, link_defs = apply_accel_profile(
+                turn_num,
+                nodes,
+                link_defs,
+                turn_data.get("accel", accel),
+                render_width,
+                render_height,
+            )
+            nodes, link_defs = apply_render_profile(
+                turn_num,
+                nodes,
+                link_defs,
+                render_profile,
+                config=config,
+            )
+            nodes, link_defs = apply_frame_interpolation(
+                turn_num,
+                nodes,
+                link_defs,
+                interpolate,
+                interpolation_model,
+                config=config,
+            )
+            nodes = apply_model_quantization(nodes, resolved_models)
+            if "shorter-length" in degradations:
+                nodes = set_sampled_video_length(nodes, sampled_length)
+            if "aggressive-cleanup" in degradations:
+                nodes, link_defs = apply_aggressive_cleanup(turn_num, nodes, link_defs)
+        if cache_key is not None and not turn_cached:
+            turn_cache[cache_key] = (
+                copy.deepcopy((nodes, link_defs)),
+                output_node_id,
+                node_keys,
+            )
+
+        clip_hit = False
+        next_frame_hash = next_frame_node = None
+        if clip_store:
+            clip_hash_nodes.update((node["id"], node) for node in nodes)
+            # Chained turns hash the frame handed to them rather than the turn
+            # before, which a later run may render again or load from the store
+            clip_hash_link_defs.extend(
+                (
+                    (
+                        CLIP_HANDOFF_HASH_ID
+                        if link_def[0] == last_turn_output_node_id
+                        else link_def[0]
+                    ),
+                    *link_def[1:],
+                )
+                for link_def in link_defs
+            )
+        if clip_store and node_keys is not None and variants == 1 and not save_latents:
+            ids = turn_node_ids(turn_num, node_keys)
+            clip_node_id = next(
+                link_def[0]
+                for link_def in link_defs
+                if link_def[2] == ids["turn_video"] and link_def[3] == 0
+            )
+            clip_key = node_input_hash(
+                clip_node_id,
+                clip_hash_nodes,
+                index_inbound_links(clip_hash_link_defs),
+                clip_memo,
+                hash_salts,
+            )
+            # A turn chained after one rendered here is keyed once that turn's
+            # saved frame exists, so it always renders and is never a hit
+            chained = node_keys is I2V_TURN_NODE_KEYS
+            if chained and handoff_frame_hash:
+                clip_key = chained_clip_key(clip_key, handoff_frame_hash)
+            stored = None
+            if not chained or handoff_frame_hash:
+                stored = lookup_stored_clip(clip_store, clip_key)
+            staged = stage_stored_clip(*stored, clip_key, comfy_dir) if stored else None
+            update_metric(
+                "script2workflow_cache_lookups_total",
+                cache="clip_store",
+                result="hit" if staged else "miss",
+            )
+            if staged:
+                clip_hit = True
+                print(
+                    f"Turn {turn_num}: loading stored clip {clip_key[:CACHE_KEY_LENGTH]} "
+                    f"(seed {stored[1].get('seed')})"
+                )
+                turn_video_node = next(
+                    node for node in nodes if node["id"] == ids["turn_video"]
+                )
+                nodes, link_defs, output_node_id, frame_node_id = (
+                    create_stored_clip_turn(
+                        turn_num,
+                        *staged,
+                        turn_video_node,
+                        last_turn_output_node_id,
+                        config=config,
+                    )
+                )
+                stored_frames[output_node_id] = frame_node_id
+                next_frame_hash = file_sha256(
+                    os.path.join(comfy_dir, "input", staged[1])
+                )
+            else:
+                save_nodes, save_link_defs, save_id = create_clip_save(
+                    turn_num, clip_node_id, clip_key, config=config
+                )
+                stored_clips[clip_key] = {
+                    "script": workflow_name,
+                    "turn": turn_num,
+                    "video_node": ids["turn_video"],
+                    "frame_node": save_id,
+                    "seed": next(
+                        node["widgets_values"][1]
+                        for node in nodes
+                        if node["id"] == ids["ksampler_high"]
+                    ),
+                }
+                if chained and not handoff_frame_hash:
+                    stored_clips[clip_key]["after_frame_node"] = handoff_frame_node
+                next_frame_node = save_id
+                nodes = nodes + save_nodes
+                link_defs = link_defs + save_link_defs
+
+        all_nodes.extend(nodes)
+        all_link_defs.extend(link_defs)
+        last_turn_output_node_id = output_node_id
+
+        if save_latents and node_keys is not None:
+            ids = turn_node_ids(turn_num, node_keys)
+            all_nodes_by_id = {node["id"]: node for node in all_nodes}
+            cache_key = node_input_hash(
+                ids["ksampler_high"],
+                all_nodes_by_id,
+                index_inbound_links(all_link_defs),
+                hash_memo,
+                hash_salts,
+            )[:CACHE_KEY_LENGTH]
+            chained = node_keys is I2V_TURN_NODE_KEYS
+            nodes, link_defs = create_latent_checkpoint(
+                turn_num, ids, cache_key, workflow_name, chained
+            )
+            all_nodes.extend(nodes)
+            all_link_defs.extend(link_defs)
+
+            prefix = f"{workflow_name}_turn{turn_num}_{cache_key}"
+            latent_checkpoints[str(turn_num)] = {
+                "cache_key": cache_key,
+                "mode": "t2v" if node_keys is T2V_TURN_NODE_KEYS else "i2v",
+                "latent": f"{LATENT_OUTPUT_DIR}/{prefix}",
+                "handoff": f"{HANDOFF_IMAGE_DIR}/{prefix}" if chained else None,
+                "image": (
+                    image_filename if node_keys is FIRST_TURN_I2V_NODE_KEYS else None
+                ),
+                "seed": all_nodes_by_id[ids["ksampler_high"]]["widgets_values"][1],
+                "prompt_hash": prompt_hash(positive_prompt, negative_prompt),
+            }
+        elif save_handoffs and node_keys is I2V_TURN_NODE_KEYS and not clip_hit:
+            nodes, link_defs = create_handoff_save(
+                turn_num,
+                turn_node_ids(turn_num, node_keys),
+                f"{workflow_name}_turn{turn_num}_resume",
+            )
+            all_nodes.extend(nodes)
+            all_link_defs.extend(link_defs)
+        handoff_frame_hash, handoff_frame_node = next_frame_hash, next_frame_node
+
+    all_nodes = apply_vae_decode_tiling(all_nodes, decode_tiling)
+    all_nodes, all_link_defs = apply_baked_models(
+        all_nodes, all_link_defs, load_bake_registry(bake_registry_path)
+    )
+
+    print("Adding final video combination node...")
+    final_combine_id = max(selected_turns) * NODE_ID_BASE_OFFSET + 1
+    final_combine_pos = [max(selected_turns) * HORIZONTAL_SPACING, 300]
+    final_combine_node = create_node(
+        "VHS_VideoCombine",
+        final_combine_id,
+        final_combine_pos,
+        [
+            config.frame_rate,
+            config.video_loop_count,
+            f"{workflow_name}_turns{turns_str}_base_{timestamp}",
+            config.video_format,
+            config.video_pingpong,
+            config.video_save_output,
+            config.video_pixel_format,
+            config.video_crf,
+            config.video_save_metadata,
+            config.video_trim_to_audio,
+        ],
+    )
+    all_nodes.append(final_combine_node)
+    all_link_defs.append((last_turn_output_node_id, 0, final_combine_id, 0, "IMAGE"))
+    if save_tail_handoff:
+        nodes, link_defs = create_tail_handoff_save(
+            max(selected_turns), last_turn_output_node_id, workflow_name, config=config
+        )
+        all_nodes.extend(nodes)
+        all_link_defs.extend(link_defs)
+    if stored_frames:
+        # Turns after a stored clip start from its saved last frame rather
+        # than one decoded back out of the stored video
+        all_nodes_by_id = {node["id"]: node for node in all_nodes}
+        all_link_defs = [
+            (
+                (stored_frames[link_def[0]], 0, *link_def[2:])
+                if link_def[0] in stored_frames
+                and all_nodes_by_id[link_def[2]]["type"] == "VHS_SelectImages"
+                else link_def
+            )
+            for link_def in all_link_defs
+        ]
+
+    final_workflow = assemble_workflow(all_nodes, all_link_defs)
+    if stored_clips:
+        final_workflow["extra"]["clip_store"] = {
+            "dir": os.path.abspath(clip_store),
+            "quota_gb": clip_store_quota,
+            "clips": stored_clips,
+        }
+    if latent_checkpoints:
+        final_workflow["extra"]["latent_checkpoints"] = latent_checkpoints
+    if degradations:
+        final_workflow["extra"]["oom_degradations"] = list(degradations)
+    print(f"Processing turns: {selected_turns}")
+    print("Multi-LoRA configuration: Lightning + Optional applied to all turns")
+    print(f"Image upscaling: {UPSCALE_METHOD} @ {UPSCALE_FACTOR}x for I2V inputs")
+    print("Pipeline: T2V/I2V Generation → Final Combined Video")
+    print(
+        f"Final output: {workflow_name}_turns{turns_str}_base_{timestamp}.mp4 at {output_width}x{output_height}@{config.frame_rate}fps"
+    )
+
+    return final_workflow
+
+
+def single_turn_image(script_turns, turn_num, workflow_name, image_path, comfy_dir):
+    # Candidate and refine passes render one turn on its own, so a turn that
+    # continues the previous one needs that turn's last frame as its start image
+    if image_path:
+        if not os.path.exists(image_path):
+            raise ValueError(f"Image file not found: {image_path}")
+        return os.path.basename(image_path)
+    if turn_num == select_turns(script_turns)[0] or script_turns[str(turn_num)].get(
+        "new_scene", False
+    ):
+        return None
+    handoff_pattern = latest_handoff(comfy_dir, workflow_name, turn_num)
+    if not handoff_pattern:
+        raise ValueError(
+            f"Turn {turn_num} continues the previous turn; pass --image with that "
+            "turn's last frame, or --comfy-dir with a saved handoff frame"
+        )
+    image_filename = f"{workflow_name}_turn{turn_num}_handoff.png"
+    stage_comfy_output(comfy_dir, handoff_pattern, image_filename)
+    return image_filename
+
+
+def generate_candidate_workflow(
+    script_path,
+    turn_num,
+    candidates,
+    image_path=None,
+    comfy_dir=None,
+    accel="none",
+    interpolate=1,
+    render_profile="native",
+    bake_registry_path=None,
+    vram_budget=None,
+    models_dir=None,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    select_turns(script_turns, [turn_num])
+    turn_data = script_turns[str(turn_num)]
+    image_filename = single_turn_image(
+        script_turns, turn_num, workflow_name, image_path, comfy_dir
+    )
+
+    print(f"Generating {candidates} high-noise candidates for Turn {turn_num}...")
+    nodes, link_defs = create_candidate_previews(
+        turn_num,
+        turn_data.get("positive_prompt", ""),
+        turn_data.get("negative_prompt", ""),
+        workflow_name,
+        candidates,
+        image_filename,
+        config=config,
+    )
+    render_width, render_height = render_resolution(render_profile, config=config)
+    nodes, link_defs = apply_accel_profile(
+        turn_num,
+        nodes,
+        link_defs,
+        turn_data.get("accel", accel),
+        render_width,
+        render_height,
+    )
+    nodes = set_sampled_video_length(
+        nodes, sampled_video_length(interpolate, config=config)
+    )
+    nodes = set_render_resolution(nodes, render_width, render_height)
+    if models_dir:
+        nodes = apply_model_quantization(
+            nodes,
+            resolve_model_quantization(
+                load_model_index(models_dir),
+                vram_budget,
+                render_width,
+                render_height,
+                sampled_video_length(interpolate, config=config),
+                config=config,
+            ),
+        )
+    nodes, link_defs = apply_baked_models(
+        nodes, link_defs, load_bake_registry(bake_registry_path)
+    )
+
+    final_workflow = assemble_workflow(nodes, link_defs)
+    print(f"Preview VAE: {PREVIEW_VAE_NAME}")
+    print(
+        f"Previews: {candidate_prefix(workflow_name, turn_num)}<K>_preview.mp4, "
+        f"latents: {LATENT_OUTPUT_DIR}/{candidate_prefix(workflow_name, turn_num)}<K>"
+    )
+
+    return final_workflow
+
+
+def generate_refine_workflow(
+    script_path,
+    turn_num,
+    choice,
+    image_path=None,
+    comfy_dir=None,
+    score_hook=None,
+    vram_budget=None,
+    accel="none",
+    interpolate=1,
+    interpolation_model="rife",
+    render_profile="native",
+    bake_registry_path=None,
+    models_dir=None,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    select_turns(script_turns, [turn_num])
+    turn_data = script_turns[str(turn_num)]
+    image_filename = single_turn_image(
+        script_turns, turn_num, workflow_name, image_path, comfy_dir
+    )
+
+    _, latent_filename = pick_candidate(
+        workflow_name, turn_num, choice, comfy_dir, score_hook, config=config
+    )
+    print(f"Generating low-noise refine pass for Turn {turn_num}...")
+    nodes, link_defs = create_low_noise_refine(
+        turn_num,
+        turn_data.get("positive_prompt", ""),
+        turn_data.get("negative_prompt", ""),
+        workflow_name,
+        latent_filename,
+        image_filename,
+        config=config,
+    )
+    render_width, render_height = render_resolution(render_profile, config=config)
+    nodes, link_defs = apply_accel_profile(
+        turn_num,
+        nodes,
+        link_defs,
+        turn_data.get("accel", accel),
+        render_width,
+        render_height,
+    )
+    nodes = apply_vae_decode_tiling(
+        nodes,
+        choose_vae_decode_tiling(
+            render_width,
+            render_height,
+            sampled_video_length(interpolate, config=config),
+            vram_budget,
+        ),
+    )
+    nodes, link_defs = apply_render_profile(
+        turn_num,
+        nodes,
+        link_defs,
+        render_profile,
+        config=config,
+    )
+    nodes, link_defs = apply_frame_interpolation(
+        turn_num, nodes, link_defs, interpolate, interpolation_model, config=config
+    )
+    if models_dir:
+        nodes = apply_model_quantization(
+            nodes,
+            resolve_model_quantization(
+                load_model_index(models_dir),
+                vram_budget,
+                render_width,
+                render_height,
+                sampled_video_length(interpolate, config=config),
+                config=config,
+            ),
+        )
+    nodes, link_defs = apply_baked_models(
+        nodes, link_defs, load_bake_registry(bake_registry_path)
+    )
+
+    final_workflow = assemble_workflow(nodes, link_defs)
+    print(f"Final output: {workflow_name}_turn{turn_num}.mp4")
+
+    return final_workflow
+
+
+def update_latent_manifest(manifest_path, latent_checkpoints):
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    manifest.update(latent_checkpoints)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def parse_lora_overrides(override_strs):
+    overrides = {}
+    for override_str in override_strs or []:
+        key, sep, strength = override_str.partition("=")
+        if not sep:
+            raise ValueError(
+                f"LoRA override must look like 'KEY=STRENGTH', got '{override_str}'"
+            )
+        overrides[key.strip()] = float(strength)
+    return overrides
+
+
+def generate_latent_refine_workflow(
+    script_path,
+    turn_num,
+    manifest_path,
+    comfy_dir=None,
+    low_lora_overrides=None,
+    vram_budget=None,
+    accel="none",
+    interpolate=1,
+    interpolation_model="rife",
+    render_profile="native",
+    bake_registry_path=None,
+    models_dir=None,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    select_turns(script_turns, [turn_num])
+    turn_data = script_turns[str(turn_num)]
+    positive_prompt = turn_data.get("positive_prompt", "")
+    negative_prompt = turn_data.get("negative_prompt", "")
+
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"Latent manifest not found: {manifest_path}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        checkpoint = json.load(f).get(str(turn_num))
+    if not checkpoint:
+        raise ValueError(
+            f"No saved high-noise latent recorded for Turn {turn_num} in {manifest_path}"
+        )
+    if checkpoint["prompt_hash"] != prompt_hash(positive_prompt, negative_prompt):
+        print(
+            f"Warning: Turn {turn_num} prompts changed since its latent was saved; "
+            "the refine pass will use the new prompts with the old composition"
+        )
+
+    latent_filename = f"{os.path.basename(checkpoint['latent'])}.latent"
+    staged_files = [(f"{checkpoint['latent']}_*.latent", latent_filename)]
+    image_filename = checkpoint["image"]
+    if checkpoint["handoff"]:
+        image_filename = f"{os.path.basename(checkpoint['handoff'])}.png"
+        staged_files.append((f"{checkpoint['handoff']}_*.png", image_filename))
+    for output_pattern, input_filename in staged_files:
+        if comfy_dir:
+            stage_comfy_output(comfy_dir, output_pattern, input_filename)
+        else:
+            print(
+                f"Copy the latest output/{output_pattern} into ComfyUI's input folder "
+                f"as {input_filename}"
+            )
+
+    low_lora_dict = copy_lora_stack(
+        config.t2v_low_noise_lora
+        if checkpoint["mode"] == "t2v"
+        else config.i2v_low_noise_lora
+    )
+    for key, strength in (low_lora_overrides or {}).items():
+        if key not in low_lora_dict:
+            raise ValueError(
+                f"Unknown low-noise LoRA '{key}'. Available: {list(low_lora_dict)}"
             )
+        low_lora_dict[key]["enabled"] = True
+        low_lora_dict[key]["strength"] = strength
+
+    print(
+        f"Generating low-noise refine pass for Turn {turn_num} "
+        f"(cache key {checkpoint['cache_key']}, seed {checkpoint['seed']})..."
+    )
+    nodes, link_defs = create_low_noise_refine(
+        turn_num,
+        positive_prompt,
+        negative_prompt,
+        workflow_name,
+        latent_filename,
+        image_filename,
+        low_lora_dict,
+        config=config,
+    )
+    render_width, render_height = render_resolution(render_profile, config=config)
+    nodes, link_defs = apply_accel_profile(
+        turn_num,
+        nodes,
+        link_defs,
+        turn_data.get("accel", accel),
+        render_width,
+        render_height,
+    )
+    nodes = apply_vae_decode_tiling(
+        nodes,
+        choose_vae_decode_tiling(
+            render_width,
+            render_height,
+            sampled_video_length(interpolate, config=config),
+            vram_budget,
+        ),
+    )
+    nodes, link_defs = apply_render_profile(
+        turn_num,
+        nodes,
+        link_defs,
+        render_profile,
+        config=config,
+    )
+    nodes, link_defs = apply_frame_interpolation(
+        turn_num, nodes, link_defs, interpolate, interpolation_model, config=config
+    )
+    if models_dir:
+        nodes = apply_model_quantization(
+            nodes,
+            resolve_model_quantization(
+                load_model_index(models_dir),
+                vram_budget,
+                render_width,
+                render_height,
+                sampled_video_length(interpolate, config=config),
+                config=config,
+            ),
+        )
+    nodes, link_defs = apply_baked_models(
+        nodes, link_defs, load_bake_registry(bake_registry_path)
+    )
+
+    final_workflow = assemble_workflow(nodes, link_defs)
+    print(f"Final output: {workflow_name}_turn{turn_num}.mp4")
+
+    return final_workflow
+
+
+def generate_keyframe_workflow(
+    script_path,
+    turns_range=None,
+    image_path=None,
+    accel="none",
+    render_profile="native",
+    bake_registry_path=None,
+    vram_budget=None,
+    models_dir=None,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    selected_turns = select_turns(script_turns, turns_range)
+    if image_path and not os.path.exists(image_path):
+        raise ValueError(f"Image file not found: {image_path}")
+
+    # Keyframes are sampled at the render size; WanImageToVideo rescales its
+    # start and end images, so the render profile's upscale is not needed
+    render_width, render_height = render_resolution(render_profile, config=config)
+    resolved_models = (
+        resolve_model_quantization(
+            load_model_index(models_dir),
+            vram_budget,
+            render_width,
+            render_height,
+            KEYFRAME_LENGTH,
+            config=config,
+        )
+        if models_dir
+        else {}
+    )
+    all_nodes, all_link_defs, keyframes = [], [], {}
+    for turn_num in selected_turns:
+        turn_data = script_turns[str(turn_num)]
+        positive_prompt = turn_data.get("positive_prompt", "")
+        negative_prompt = turn_data.get("negative_prompt", "")
+        keyframe = {
+            "keyframe": keyframe_prefix(workflow_name, turn_num),
+            "image": None,
+            "seed": None,
+            "prompt_hash": prompt_hash(positive_prompt, negative_prompt),
+        }
+        if image_path and turn_num == selected_turns[0]:
+            print(f"Turn {turn_num} keyframe: {os.path.basename(image_path)}")
+            keyframes[str(turn_num)] = {
+                **keyframe,
+                "keyframe": None,
+                "image": os.path.basename(image_path),
+            }
+            continue
 
+        print(f"Generating keyframe for Turn {turn_num}...")
+        nodes, link_defs = create_turn_still(
+            turn_num,
+            positive_prompt,
+            negative_prompt,
+            workflow_name,
+            keyframe_prefix(workflow_name, turn_num),
+            f"Save Turn {turn_num} Keyframe",
+            config=config,
+        )
+        nodes, link_defs = apply_accel_profile(
+            turn_num,
+            nodes,
+            link_defs,
+            turn_data.get("accel", accel),
+            render_width,
+            render_height,
+        )
+        nodes = set_render_resolution(nodes, render_width, render_height)
+        nodes = apply_model_quantization(nodes, resolved_models)
+        ids = turn_node_ids(turn_num, T2V_TURN_NODE_KEYS)
+        keyframe["seed"] = next(
+            node["widgets_values"][1]
+            for node in nodes
+            if node["id"] == ids["ksampler_high"]
+        )
+        keyframes[str(turn_num)] = keyframe
         all_nodes.extend(nodes)
         all_link_defs.extend(link_defs)
-        last_turn_output_node_id = output_node_id
 
-    print("Adding final video combination node...")
-    final_combine_id = max(selected_turns) * NODE_ID_BASE_OFFSET + 1
-    final_combine_pos = [max(selected_turns) * HORIZONTAL_SPACING, 300]
-    final_combine_node = create_node(
-        "VHS_VideoCombine",
-        final_combine_id,
-        final_combine_pos,
-        [
-            FRAME_RATE,
-            VIDEO_LOOP_COUNT,
-            f"{workflow_name}_turns{turns_str}_base_{timestamp}",
-            VIDEO_FORMAT,
-            VIDEO_PINGPONG,
-            VIDEO_SAVE_OUTPUT,
-            VIDEO_PIXEL_FORMAT,
-            VIDEO_CRF,
-            VIDEO_SAVE_METADATA,
-            VIDEO_TRIM_TO_AUDIO,
-        ],
+    if not all_nodes:
+        raise ValueError("No keyframes to render: the only turn starts from --image")
+    all_nodes, all_link_defs = apply_baked_models(
+        all_nodes, all_link_defs, load_bake_registry(bake_registry_path)
     )
-    all_nodes.append(final_combine_node)
-    all_link_defs.append((last_turn_output_node_id, 0, final_combine_id, 0, "IMAGE"))
+    final_workflow = assemble_workflow(all_nodes, all_link_defs)
+    final_workflow["extra"]["keyframes"] = keyframes
+    print(f"Keyframes: {KEYFRAME_IMAGE_DIR}/{workflow_name}_turn<N>_keyframe")
 
-    print("Applying all connections...")
-    final_links = []
-    nodes_by_id = {node["id"]: node for node in all_nodes}
-    link_id_counter = 1
+    return final_workflow
 
-    for link_def in all_link_defs:
-        if len(link_def) != 5:
-            print(f"Warning: Invalid link definition: {link_def}")
-            continue
 
-        origin_id, origin_slot, target_id, target_slot, link_type = link_def
+def generate_storyboard_workflow(
+    script_path,
+    turns_range=None,
+    accel="none",
+    render_profile="native",
+    bake_registry_path=None,
+    vram_budget=None,
+    models_dir=None,
+    steps=STORYBOARD_STEPS,
+    config=DEFAULT_CONFIG,
+):
+    script_turns, workflow_name = load_movie_script(script_path)
+    selected_turns = select_turns(script_turns, turns_range)
+    if steps < 2:
+        raise ValueError(f"Storyboard steps must be at least 2, got {steps}")
 
-        final_links.append(
-            [link_id_counter, origin_id, origin_slot, target_id, target_slot, link_type]
+    render_width, render_height = render_resolution(render_profile, config=config)
+    resolved_models = (
+        resolve_model_quantization(
+            load_model_index(models_dir),
+            vram_budget,
+            render_width,
+            render_height,
+            KEYFRAME_LENGTH,
+            config=config,
         )
+        if models_dir
+        else {}
+    )
+    print(f"Storyboard: {len(selected_turns)} stills at {steps} steps")
+    all_nodes, all_link_defs = [], []
+    for turn_num in selected_turns:
+        turn_data = script_turns[str(turn_num)]
+        nodes, link_defs = create_turn_still(
+            turn_num,
+            turn_data.get("positive_prompt", ""),
+            turn_data.get("negative_prompt", ""),
+            workflow_name,
+            f"{STORYBOARD_IMAGE_DIR}/{workflow_name}/turn{turn_num:03d}",
+            f"Storyboard Turn {turn_num}",
+            config=config,
+        )
+        nodes, link_defs = apply_accel_profile(
+            turn_num,
+            nodes,
+            link_defs,
+            turn_data.get("accel", accel),
+            render_width,
+            render_height,
+        )
+        nodes = set_sampler_steps(nodes, steps)
+        nodes = set_render_resolution(nodes, render_width, render_height)
+        nodes = apply_model_quantization(nodes, resolved_models)
+        all_nodes.extend(nodes)
+        all_link_defs.extend(link_defs)
 
-        origin_node = nodes_by_id.get(origin_id)
-        target_node = nodes_by_id.get(target_id)
-
-        if not origin_node:
-            print(f"Warning: Origin node {origin_id} not found for link")
-            continue
+    all_nodes, all_link_defs = apply_baked_models(
+        all_nodes, all_link_defs, load_bake_registry(bake_registry_path)
+    )
+    final_workflow = assemble_workflow(all_nodes, all_link_defs)
+    print(f"Stills: {STORYBOARD_IMAGE_DIR}/{workflow_name}/turn<NNN>_<counter>_.png")
 
-        if not target_node:
-            print(f"Warning: Target node {target_id} not found for link")
-            continue
+    return final_workflow
 
-        if "outputs" not in origin_node or origin_slot >= len(origin_node["outputs"]):
-            print(f"Warning: Invalid origin slot {origin_slot} for node {origin_id}")
-            continue
 
-        if origin_node["outputs"][origin_slot].get("links") is None:
-            origin_node["outputs"][origin_slot]["links"] = []
-        origin_node["outputs"][origin_slot]["links"].append(link_id_counter)
+def workflow_model_signature(nodes):
+    # The UNet files (their names carry the quantization, or the bake) and the
+    # LoRAs enabled on them: what has to be resident to run the workflow
+    unets = sorted(
+        {
+            node["widgets_values"][0]
+            for node in nodes
+            if node["type"] in ("UnetLoaderGGUF", "UNETLoader")
+        }
+    )
+    loras = sorted(
+        {
+            lora
+            for node in nodes
+            if node["type"] == "Power Lora Loader (rgthree)"
+            for lora in enabled_loras(node["widgets_values"])
+        }
+    )
+    return json.dumps({"unets": unets, "loras": [list(lora) for lora in loras]})
 
-        if "inputs" not in target_node or target_slot >= len(target_node["inputs"]):
-            print(f"Warning: Invalid target slot {target_slot} for node {target_id}")
-            continue
 
-        target_node["inputs"][target_slot]["link"] = link_id_counter
+def generate_warmup_workflow(
+    model_kinds,
+    render_profile="native",
+    interpolate=1,
+    vram_budget=None,
+    models_dir=None,
+    bake_registry_path=None,
+    config=DEFAULT_CONFIG,
+):
+    unknown = [kind for kind in model_kinds if kind not in WARMUP_MODEL_KINDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown warm-up model kinds {unknown}. "
+            f"Available kinds: {WARMUP_MODEL_KINDS}"
+        )
 
-        link_id_counter += 1
+    # Quantizations resolve for the job's size and length rather than the
+    # still's, so the loaders match the job's own
+    resolved_models = (
+        resolve_model_quantization(
+            load_model_index(models_dir),
+            vram_budget,
+            *render_resolution(render_profile, config=config),
+            sampled_video_length(interpolate, config=config),
+            config=config,
+        )
+        if models_dir
+        else {}
+    )
+    all_nodes, all_link_defs = [], []
+    for turn_idx, kind in enumerate(model_kinds, start=1):
+        nodes, link_defs = create_turn_still(
+            turn_idx,
+            "",
+            "",
+            WARMUP_IMAGE_DIR,
+            f"{WARMUP_IMAGE_DIR}/{kind}",
+            f"Warm-up {kind.upper()} Models",
+            config=config,
+        )
+        if kind == "i2v":
+            # The I2V UNets and LoRAs in the T2V still; the warm-up only has to
+            # load them, not condition on an image
+            ids = turn_node_ids(turn_idx, T2V_TURN_NODE_KEYS)
+            i2v_widgets = {
+                ids["unet_high"]: [config.i2v_high_noise_unet],
+                ids["unet_low"]: [config.i2v_low_noise_unet],
+                ids["lora_high"]: create_multi_lora_config(config.i2v_high_noise_lora),
+                ids["lora_low"]: create_multi_lora_config(config.i2v_low_noise_lora),
+            }
+            for node in nodes:
+                if node["id"] in i2v_widgets:
+                    node["widgets_values"] = i2v_widgets[node["id"]]
+        nodes = set_sampler_steps(nodes, WARMUP_STEPS)
+        nodes = set_render_resolution(nodes, WARMUP_WIDTH, WARMUP_HEIGHT)
+        nodes = apply_model_quantization(nodes, resolved_models)
+        all_nodes.extend(nodes)
+        all_link_defs.extend(link_defs)
 
-    print(f"Generated {len(all_nodes)} nodes and {len(final_links)} links")
-    print(f"Processing turns: {selected_turns}")
-    print("Multi-LoRA configuration: Lightning + Optional applied to all turns")
-    print(f"Image upscaling: {UPSCALE_METHOD} @ {UPSCALE_FACTOR}x for I2V inputs")
-    print("Pipeline: T2V/I2V Generation → Final Combined Video")
-    print(
-        f"Final output: {workflow_name}_turns{turns_str}_base_{timestamp}.mp4 at {VIDEO_WIDTH}x{VIDEO_HEIGHT}@{FRAME_RATE}fps"
+    all_nodes, all_link_defs = apply_baked_models(
+        all_nodes, all_link_defs, load_bake_registry(bake_registry_path)
     )
+    return assemble_workflow(all_nodes, all_link_defs)
 
-    final_workflow = {
-        "id": str(uuid.uuid4()),
-        "revision": 0,
-        "last_node_id": max(n["id"] for n in all_nodes) if all_nodes else 0,
-        "last_link_id": max(link[0] for link in final_links) if final_links else 0,
-        "nodes": all_nodes,
-        "links": final_links,
-        "groups": [],
-        "config": {},
-        "extra": {"ds": {"scale": 0.7, "offset": [0, 0]}, "frontendVersion": "1.24.4"},
-        "version": 0.4,
-    }
 
-    return final_workflow
+def resolve_keyframes(script_path, turns_range, manifest_path, comfy_dir=None):
+    # Each turn runs from its own keyframe to the next turn's, unless the next
+    # turn starts a new scene or is the last one, which leaves the end free
+    script_turns, workflow_name = load_movie_script(script_path)
+    selected_turns = select_turns(script_turns, turns_range)
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"Keyframe manifest not found: {manifest_path}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    staged = set()
+
+    def keyframe_path(turn_num):
+        keyframe = manifest.get(str(turn_num))
+        if not keyframe:
+            raise ValueError(
+                f"No keyframe recorded for Turn {turn_num} in {manifest_path}; "
+                "render it first with --keyframes"
+            )
+        turn_data = script_turns[str(turn_num)]
+        if keyframe["prompt_hash"] != prompt_hash(
+            turn_data.get("positive_prompt", ""), turn_data.get("negative_prompt", "")
+        ):
+            print(
+                f"Warning: Turn {turn_num} prompts changed since its keyframe was "
+                "rendered; re-run --keyframes for that turn to match"
+            )
+        input_filename = keyframe["image"]
+        if keyframe["keyframe"]:
+            input_filename = f"{os.path.basename(keyframe['keyframe'])}.png"
+            if input_filename not in staged:
+                output_pattern = f"{keyframe['keyframe']}_*.png"
+                if comfy_dir:
+                    stage_comfy_output(comfy_dir, output_pattern, input_filename)
+                else:
+                    print(
+                        f"Copy the latest output/{output_pattern} into ComfyUI's "
+                        f"input folder as {input_filename}"
+                    )
+                staged.add(input_filename)
+        return (
+            os.path.join(comfy_dir, "input", input_filename)
+            if comfy_dir
+            else input_filename
+        )
+
+    keyframes = {}
+    for turn_num in selected_turns:
+        next_turn = script_turns.get(str(turn_num + 1))
+        end_path = None
+        if next_turn and not next_turn.get("new_scene", False):
+            if str(turn_num + 1) in manifest:
+                end_path = keyframe_path(turn_num + 1)
+            else:
+                print(
+                    f"Warning: no keyframe for Turn {turn_num + 1}; Turn {turn_num} "
+                    "will end unconstrained"
+                )
+        keyframes[turn_num] = (keyframe_path(turn_num), end_path)
+    print(f"Loaded keyframes for {workflow_name} turns {selected_turns}")
+    return keyframes
 
 
 if __name__ == "__main__":
@@ -1773,6 +7965,222 @@ if __name__ == "__main__":
         type=str,
         help="Path to image file for first turn I2V (overrides T2V for first turn)",
     )
+    parser.add_argument(
+        "--variants",
+        type=int,
+        default=1,
+        help="Number of sampler variants to emit per turn, sharing loaders and prompts",
+    )
+    parser.add_argument(
+        "--variant-mode",
+        type=str,
+        choices=VARIANT_MODES,
+        default="seed",
+        help="Vary the noise seed or sweep LoRA strength_grid values across variants",
+    )
+    parser.add_argument(
+        "--batch-t2v",
+        action="store_true",
+        help="Sample independent T2V turns (first turn, new_scene turns) as one batch",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        help="Run K high-noise candidates with cheap previews for a single turn",
+    )
+    parser.add_argument(
+        "--pick-candidate",
+        type=str,
+        help="Finish a single turn from candidate K ('auto' scores previews with --score-hook)",
+    )
+    parser.add_argument(
+        "--score-hook",
+        type=str,
+        help="Candidate scoring function as 'module:function' or 'path/to/file.py:function'",
+    )
+    parser.add_argument(
+        "--comfy-dir",
+        type=str,
+        help="ComfyUI root folder, used to find candidate outputs and stage latents",
+    )
+    parser.add_argument(
+        "--save-latents",
+        action="store_true",
+        help="Save each turn's high-noise latent, keyed by a hash of its inputs",
+    )
+    parser.add_argument(
+        "--refine",
+        action="store_true",
+        help="Re-run only the low-noise pass of a single turn from its saved latent",
+    )
+    parser.add_argument(
+        "--latent-manifest",
+        type=str,
+        help="Latent manifest path (default: <script_name>_latents.json)",
+    )
+    parser.add_argument(
+        "--storyboard",
+        action="store_true",
+        help="Render one still per turn with fewer steps instead of the videos",
+    )
+    parser.add_argument(
+        "--storyboard-steps",
+        type=int,
+        default=STORYBOARD_STEPS,
+        help=f"Sampler steps per storyboard still (default: {STORYBOARD_STEPS})",
+    )
+    parser.add_argument(
+        "--keyframes",
+        action="store_true",
+        help="Render a single-frame keyframe for the start of each turn",
+    )
+    parser.add_argument(
+        "--from-keyframes",
+        action="store_true",
+        help="Render every turn on its own, from its keyframe to the next turn's",
+    )
+    parser.add_argument(
+        "--keyframe-manifest",
+        type=str,
+        help=f"Keyframe manifest path (default: <script_name>{KEYFRAME_MANIFEST_SUFFIX})",
+    )
+    parser.add_argument(
+        "--low-lora",
+        action="append",
+        help="Override a low-noise LoRA strength for --refine, e.g. '1=0.9' (repeatable)",
+    )
+    parser.add_argument(
+        "--vram-budget",
+        type=float,
+        help="GPU memory in GB; switches to a tiled VAE decode sized to fit when needed",
+    )
+    parser.add_argument(
+        "--accel",
+        type=str,
+        choices=list(ACCEL_PROFILES),
+        default="none",
+        help="Sampling acceleration profile (turns may override it with an 'accel' key)",
+    )
+    parser.add_argument(
+        "--interpolate",
+        type=int,
+        default=1,
+        help="Sample 1/N of the frames and interpolate them back up to the frame rate",
+    )
+    parser.add_argument(
+        "--interpolation-model",
+        type=str,
+        choices=list(INTERPOLATION_MODELS),
+        default="rife",
+        help="Frame interpolation model used with --interpolate",
+    )
+    parser.add_argument(
+        "--config",
+        type=str,
+        help="JSON file of GenerationConfig fields (models, LoRA stacks, size, "
+        "sampler settings) to use instead of the defaults",
+    )
+    parser.add_argument(
+        "--render-profile",
+        type=str,
+        choices=list(RENDER_PROFILES),
+        default="native",
+        help="Sample at a lower resolution and model-upscale the decoded frames",
+    )
+    parser.add_argument(
+        "--models-dir",
+        type=str,
+        help="ComfyUI models folder; checks every model reference and picks the best "
+        "GGUF quantization that fits --vram-budget",
+    )
+    parser.add_argument(
+        "--object-info",
+        type=str,
+        help="object_info snapshot file, or ComfyUI server URL to fetch it from once, "
+        "used to validate every node before the workflow is written",
+    )
+    parser.add_argument(
+        "--submit",
+        type=str,
+        help="ComfyUI server URL to queue the generated workflow on and wait for; "
+        "without --comfy-dir, --image is uploaded to it",
+    )
+    parser.add_argument(
+        "--download",
+        type=str,
+        help="With --submit, download the finished clips into this folder",
+    )
+    parser.add_argument(
+        "--oom-retries",
+        type=int,
+        default=0,
+        help="With --submit and --comfy-dir: retries per turn after out-of-memory "
+        "errors, each resuming from the last handoff frame with one more degradation",
+    )
+    parser.add_argument(
+        "--low-noise-server",
+        type=str,
+        help="With --submit: run each turn's high-noise pass on the --submit server "
+        "and its low-noise pass, decode and save on this one",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and regenerate the workflow whenever the script is saved; "
+        "with --submit, queue only the edited turns and the turns chained after them",
+    )
+    parser.add_argument(
+        "--history-db",
+        type=str,
+        default=RUN_HISTORY_NAME,
+        help=f"SQLite run history of generated and submitted workflows (default: {RUN_HISTORY_NAME})",
+    )
+    parser.add_argument(
+        "--no-history",
+        action="store_true",
+        help="Do not record this run in the history database",
+    )
+    parser.add_argument(
+        "--history-query",
+        type=str,
+        choices=["fastest", "clips"],
+        help="Print the fastest recorded configs for this resolution, or the "
+        "recorded clips for --turns, and exit",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="Serve Prometheus metrics for --submit and --watch on this local port",
+    )
+    parser.add_argument(
+        "--clip-store",
+        type=str,
+        help="Shared folder of finished turns keyed by their render inputs; with "
+        "--comfy-dir, matching turns load the stored clip instead of rendering",
+    )
+    parser.add_argument(
+        "--clip-store-quota",
+        type=float,
+        default=CLIP_STORE_QUOTA_GB,
+        help=f"Clip store size in GB before least recently used clips are evicted "
+        f"(default: {CLIP_STORE_QUOTA_GB})",
+    )
+    parser.add_argument(
+        "--bake",
+        action="store_true",
+        help="Emit a workflow that merges the enabled LoRAs into saved UNet files",
+    )
+    parser.add_argument(
+        "--bake-registry",
+        type=str,
+        default=BAKE_REGISTRY_NAME,
+        help=f"Baked model registry path (default: {BAKE_REGISTRY_NAME})",
+    )
+    parser.add_argument(
+        "--install-baked",
+        action="store_true",
+        help="Copy finished bakes from --comfy-dir's output into its models folder",
+    )
     args = parser.parse_args()
 
     if not os.path.exists(args.script_path):
@@ -1788,58 +8196,418 @@ if __name__ == "__main__":
             sys.exit(1)
 
     try:
-        new_workflow = generate_workflow(args.script_path, turns_range, args.image)
         base_script_name = os.path.splitext(os.path.basename(args.script_path))[0]
-        turns_suffix = f"_turns_{args.turns.replace(':', '-')}" if args.turns else ""
-        image_suffix = "_i2v" if args.image else ""
-        output_filename = (
-            f"{base_script_name}{turns_suffix}{image_suffix}_workflow.json"
+        manifest_path = (
+            args.latent_manifest or f"{base_script_name}{LATENT_MANIFEST_SUFFIX}"
+        )
+        keyframe_manifest_path = (
+            args.keyframe_manifest or f"{base_script_name}{KEYFRAME_MANIFEST_SUFFIX}"
         )
+        history_db = None if args.no_history else args.history_db
+        run_id = None
+        generation_config = (
+            load_generation_config(args.config) if args.config else DEFAULT_CONFIG
+        )
+        if args.metrics_port:
+            start_metrics_server(
+                args.metrics_port, [args.submit] if args.submit else []
+            )
+        if args.history_query:
+            print_history_query(
+                args.history_db,
+                args.history_query,
+                args.script_path,
+                turns_range,
+                args.render_profile,
+                args.interpolate,
+                generation_config,
+            )
+            sys.exit(0)
+        if args.install_baked:
+            if not args.comfy_dir:
+                raise ValueError("--install-baked needs --comfy-dir")
+            if not os.path.exists(args.bake_registry):
+                raise ValueError(f"Bake registry not found: {args.bake_registry}")
+            registry = install_baked_models(
+                load_bake_registry(args.bake_registry), args.comfy_dir
+            )
+            save_bake_registry(args.bake_registry, registry)
+            for entry in registry.values():
+                if entry["installed"]:
+                    print(f"Installed: {entry['model']}")
+            sys.exit(0)
 
-        with open(output_filename, "w", encoding="utf-8") as f:
-            json.dump(new_workflow, f, indent=2)
+        if args.bake:
+            new_workflow = generate_bake_workflow(
+                args.bake_registry, config=generation_config
+            )
+            print("\n" + "=" * 50)
+            if new_workflow:
+                preflight_workflow(new_workflow, args.models_dir, args.object_info)
+                output_filename = "bake_workflow.json"
+                with open(output_filename, "w", encoding="utf-8") as f:
+                    json.dump(new_workflow, f, indent=2)
+                if history_db:
+                    run_id = record_run(
+                        history_db,
+                        "bake",
+                        args.script_path,
+                        new_workflow,
+                        output_filename,
+                    )
+                print("✅ Success! LoRA bake workflow generated!")
+                print(f"Saved as: {output_filename}")
+                print(
+                    "After it runs, install the baked models with --install-baked "
+                    "--comfy-dir"
+                )
+            else:
+                print("Nothing new to bake.")
+            print(f"Registry: {args.bake_registry}")
+            print("=" * 50)
+        elif args.storyboard:
+            new_workflow = generate_storyboard_workflow(
+                args.script_path,
+                turns_range,
+                args.accel,
+                args.render_profile,
+                args.bake_registry,
+                args.vram_budget,
+                args.models_dir,
+                args.storyboard_steps,
+                config=generation_config,
+            )
+            preflight_workflow(new_workflow, args.models_dir, args.object_info)
+            turns_suffix = (
+                f"_turns_{args.turns.replace(':', '-')}" if args.turns else ""
+            )
+            output_filename = (
+                f"{base_script_name}{turns_suffix}_storyboard_workflow.json"
+            )
+            with open(output_filename, "w", encoding="utf-8") as f:
+                json.dump(new_workflow, f, indent=2)
+            if history_db:
+                run_id = record_run(
+                    history_db,
+                    "storyboard",
+                    args.script_path,
+                    new_workflow,
+                    output_filename,
+                )
 
-        print("\n" + "=" * 50)
-        print(
-            "✅ Success! Video generation workflow with image upscaling and multi-LoRA support generated!"
-        )
-        print(f"Saved as: {output_filename}")
-        print(
-            f"Generated {len(new_workflow['nodes'])} nodes and {len(new_workflow['links'])} links"
-        )
-        if args.turns:
-            print(f"Processed turns: {args.turns}")
-        if args.image:
-            print(f"First turn initialized with image: {os.path.basename(args.image)}")
-        print("\nImage upscaling configuration:")
-        print(f"- Method: {UPSCALE_METHOD}")
-        print(f"- Scale factor: {UPSCALE_FACTOR}x")
-        print("- Applied to all I2V input images")
-        print("\nApplied LoRAs to all turns:")
-
-        enabled_high = [
-            config
-            for config in T2V_HIGH_NOISE_LORA.values()
-            if config.get("enabled", True)
-        ]
-        enabled_low = [
-            config
-            for config in T2V_LOW_NOISE_LORA.values()
-            if config.get("enabled", True)
-        ]
+            print("\n" + "=" * 50)
+            print("✅ Success! Storyboard workflow generated!")
+            print(f"Saved as: {output_filename}")
+            print("=" * 50)
+        elif args.keyframes:
+            new_workflow = generate_keyframe_workflow(
+                args.script_path,
+                turns_range,
+                args.image,
+                args.accel,
+                args.render_profile,
+                args.bake_registry,
+                args.vram_budget,
+                args.models_dir,
+                config=generation_config,
+            )
+            preflight_workflow(new_workflow, args.models_dir, args.object_info)
+            turns_suffix = (
+                f"_turns_{args.turns.replace(':', '-')}" if args.turns else ""
+            )
+            output_filename = (
+                f"{base_script_name}{turns_suffix}_keyframes_workflow.json"
+            )
+            with open(output_filename, "w", encoding="utf-8") as f:
+                json.dump(new_workflow, f, indent=2)
+            update_latent_manifest(
+                keyframe_manifest_path, new_workflow["extra"]["keyframes"]
+            )
+            if history_db:
+                run_id = record_run(
+                    history_db,
+                    "keyframes",
+                    args.script_path,
+                    new_workflow,
+                    output_filename,
+                )
 
-        print(f"- High noise LoRAs: {len(enabled_high)} enabled")
-        print(f"- Low noise LoRAs: {len(enabled_low)} enabled")
-        print("\nOutput files:")
-        print(f"- Per-turn videos: {base_script_name}_turn<N>.mp4")
-        print(
-            f"- Combined video: {base_script_name}_turns{args.turns or 'all'}_base_<timestamp>.mp4"
-        )
-        print("\nVideo specifications:")
-        print(f"- Resolution: {VIDEO_WIDTH}x{VIDEO_HEIGHT}")
-        print(f"- Frame rate: {FRAME_RATE}fps")
-        print(f"- Length: {VIDEO_LENGTH} frames")
-        print("=" * 50)
+            print("\n" + "=" * 50)
+            print("✅ Success! Keyframe workflow generated!")
+            print(f"Saved as: {output_filename}")
+            print(f"Keyframe manifest: {keyframe_manifest_path}")
+            print(
+                "After it runs, render the turns with --from-keyframes, on any "
+                "number of servers"
+            )
+            print("=" * 50)
+        elif args.candidates or args.pick_candidate or args.refine:
+            if not turns_range or len(turns_range) != 1:
+                raise ValueError(
+                    "Candidate and refine workflows work on a single turn; pass --turns N"
+                )
+            if args.candidates:
+                new_workflow = generate_candidate_workflow(
+                    args.script_path,
+                    turns_range[0],
+                    args.candidates,
+                    args.image,
+                    args.comfy_dir,
+                    args.accel,
+                    args.interpolate,
+                    args.render_profile,
+                    args.bake_registry,
+                    args.vram_budget,
+                    args.models_dir,
+                    config=generation_config,
+                )
+                mode_suffix = "candidates"
+            elif args.refine:
+                new_workflow = generate_latent_refine_workflow(
+                    args.script_path,
+                    turns_range[0],
+                    manifest_path,
+                    args.comfy_dir,
+                    parse_lora_overrides(args.low_lora),
+                    args.vram_budget,
+                    args.accel,
+                    args.interpolate,
+                    args.interpolation_model,
+                    args.render_profile,
+                    args.bake_registry,
+                    args.models_dir,
+                    config=generation_config,
+                )
+                mode_suffix = "refine"
+            else:
+                new_workflow = generate_refine_workflow(
+                    args.script_path,
+                    turns_range[0],
+                    args.pick_candidate,
+                    args.image,
+                    args.comfy_dir,
+                    args.score_hook,
+                    args.vram_budget,
+                    args.accel,
+                    args.interpolate,
+                    args.interpolation_model,
+                    args.render_profile,
+                    args.bake_registry,
+                    args.models_dir,
+                    config=generation_config,
+                )
+                mode_suffix = "refine"
+            output_filename = (
+                f"{base_script_name}_turn{turns_range[0]}_{mode_suffix}_workflow.json"
+            )
+            preflight_workflow(new_workflow, args.models_dir, args.object_info)
+
+            with open(output_filename, "w", encoding="utf-8") as f:
+                json.dump(new_workflow, f, indent=2)
+            if history_db:
+                run_id = record_run(
+                    history_db,
+                    mode_suffix,
+                    args.script_path,
+                    new_workflow,
+                    output_filename,
+                )
+
+            print("\n" + "=" * 50)
+            print(
+                f"✅ Success! Turn {turns_range[0]} {mode_suffix} workflow generated!"
+            )
+            print(f"Saved as: {output_filename}")
+            print("=" * 50)
+        else:
+            if args.oom_retries and not (args.submit and args.comfy_dir):
+                raise ValueError(
+                    "--oom-retries needs --submit and --comfy-dir to resume from "
+                    "handoff frames"
+                )
+            if args.low_noise_server and not args.submit:
+                raise ValueError(
+                    "--low-noise-server needs --submit for the high-noise server"
+                )
+            if args.low_noise_server and (args.oom_retries or args.watch):
+                raise ValueError(
+                    "--low-noise-server cannot be combined with --oom-retries or --watch"
+                )
+            generate_args = {
+                "variants": args.variants,
+                "variant_mode": args.variant_mode,
+                "batch_t2v": args.batch_t2v,
+                "save_latents": args.save_latents,
+                "vram_budget": args.vram_budget,
+                "accel": args.accel,
+                "interpolate": args.interpolate,
+                "interpolation_model": args.interpolation_model,
+                "render_profile": args.render_profile,
+                "bake_registry_path": args.bake_registry,
+                "models_dir": args.models_dir,
+                "clip_store": args.clip_store,
+                "clip_store_quota": args.clip_store_quota,
+                "comfy_dir": args.comfy_dir,
+                "config": generation_config,
+            }
+            if args.from_keyframes:
+                generate_args["keyframes"] = resolve_keyframes(
+                    args.script_path,
+                    turns_range,
+                    keyframe_manifest_path,
+                    args.comfy_dir,
+                )
+            if args.submit and args.image and not args.comfy_dir:
+                generate_args["image_name"] = upload_asset(args.submit, args.image)
+            turns_suffix = (
+                f"_turns_{args.turns.replace(':', '-')}" if args.turns else ""
+            )
+            image_suffix = "_i2v" if args.image else ""
+            variants_suffix = (
+                f"_{args.variants}{args.variant_mode}" if args.variants > 1 else ""
+            )
+            output_filename = f"{base_script_name}{turns_suffix}{image_suffix}{variants_suffix}_workflow.json"
+            if args.watch:
+                if args.oom_retries:
+                    raise ValueError("--watch cannot be combined with --oom-retries")
+                watch_script(
+                    args.script_path,
+                    turns_range,
+                    args.image,
+                    generate_args,
+                    output_filename,
+                    args.submit,
+                    args.comfy_dir,
+                    history_db,
+                    args.object_info,
+                )
+                sys.exit(0)
+            new_workflow = generate_workflow(
+                args.script_path,
+                turns_range,
+                args.image,
+                save_handoffs=args.oom_retries > 0,
+                **generate_args,
+            )
+            preflight_workflow(new_workflow, args.models_dir, args.object_info)
+
+            with open(output_filename, "w", encoding="utf-8") as f:
+                json.dump(new_workflow, f, indent=2)
+            if history_db:
+                run_id = record_run(
+                    history_db,
+                    "generate",
+                    args.script_path,
+                    new_workflow,
+                    output_filename,
+                )
+            if "latent_checkpoints" in new_workflow["extra"]:
+                update_latent_manifest(
+                    manifest_path, new_workflow["extra"]["latent_checkpoints"]
+                )
+
+            print("\n" + "=" * 50)
+            print(
+                "✅ Success! Video generation workflow with image upscaling and multi-LoRA support generated!"
+            )
+            print(f"Saved as: {output_filename}")
+            print(
+                f"Generated {len(new_workflow['nodes'])} nodes and {len(new_workflow['links'])} links"
+            )
+            if args.turns:
+                print(f"Processed turns: {args.turns}")
+            if args.image:
+                print(
+                    f"First turn initialized with image: {os.path.basename(args.image)}"
+                )
+            print("\nImage upscaling configuration:")
+            print(f"- Method: {UPSCALE_METHOD}")
+            print(f"- Scale factor: {UPSCALE_FACTOR}x")
+            print("- Applied to all I2V input images")
+            print("\nApplied LoRAs to all turns:")
+
+            enabled_high = [
+                config
+                for config in generation_config.t2v_high_noise_lora.values()
+                if config.get("enabled", True)
+            ]
+            enabled_low = [
+                config
+                for config in generation_config.t2v_low_noise_lora.values()
+                if config.get("enabled", True)
+            ]
+
+            print(f"- High noise LoRAs: {len(enabled_high)} enabled")
+            print(f"- Low noise LoRAs: {len(enabled_low)} enabled")
+            print("\nOutput files:")
+            print(f"- Per-turn videos: {base_script_name}_turn<N>.mp4")
+            if args.variants > 1:
+                print(
+                    f"- Variant videos: {base_script_name}_turn<N>_v<2..{args.variants}>.mp4"
+                )
+            print(
+                f"- Combined video: {base_script_name}_turns{args.turns or 'all'}_base_<timestamp>.mp4"
+            )
+            print("\nVideo specifications:")
+            output_width, output_height = output_resolution(
+                args.render_profile, config=generation_config
+            )
+            print(f"- Resolution: {output_width}x{output_height}")
+            print(f"- Frame rate: {generation_config.frame_rate}fps")
+            print(f"- Length: {generation_config.video_length} frames")
+            if args.interpolate > 1:
+                print(
+                    f"- Sampled: "
+                    f"{sampled_video_length(args.interpolate, config=generation_config)} "
+                    "frames, "
+                    f"interpolated x{args.interpolate}"
+                )
+            print("=" * 50)
+
+        if args.submit and new_workflow and args.low_noise_server:
+            entries = submit_pipeline(
+                args.submit,
+                args.low_noise_server,
+                args.script_path,
+                turns_range,
+                args.image,
+                args.comfy_dir,
+                generate_args,
+                args.object_info,
+                history_db,
+            )
+            if args.download:
+                for entry in entries:
+                    download_outputs(args.low_noise_server, entry, args.download)
+        elif args.submit and new_workflow and args.oom_retries:
+            submit_with_oom_recovery(
+                args.submit,
+                new_workflow,
+                args.script_path,
+                turns_range,
+                args.image,
+                args.comfy_dir,
+                args.oom_retries,
+                generate_args,
+                args.object_info,
+                history_db,
+                run_id,
+            )
+        elif args.submit and new_workflow:
+            _, entry = submit_workflow(
+                args.submit, new_workflow, history_db, run_id, args.comfy_dir
+            )
+            if args.download:
+                download_outputs(
+                    args.submit,
+                    entry,
+                    args.download,
+                    (
+                        ["images"]
+                        if args.storyboard or args.keyframes
+                        else DOWNLOAD_OUTPUT_KINDS
+                    ),
+                )
 
     except Exception as e:
         print(f"\nAn error occurred: {e}", file=sys.stderr)
@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+import zlib
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_SCRIPT = os.path.join(REPO_DIR, "test_movie_script3.json")
+SIM_START_SECONDS = 15.0
+
+sys.path.insert(0, REPO_DIR)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def write_png(path, width=64, height=64):
+    def chunk(kind, data):
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+        )
+
+    rows = b"".join(b"\x00" + b"\x80" * width * 3 for _ in range(height))
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(rows)))
+        f.write(chunk(b"IEND", b""))
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+@pytest.fixture
+def comfy_dir(tmp_path):
+    comfy_dir = tmp_path / "comfy"
+    (comfy_dir / "input").mkdir(parents=True)
+    write_png(comfy_dir / "input" / "start.png")
+    return comfy_dir
+
+
+@pytest.fixture
+def start_sim(comfy_dir):
+    # Every sim shares comfy_dir, as servers on one host share a ComfyUI folder
+    sims = []
+
+    def start(vram_gb=24.0):
+        port = free_port()
+        sim = subprocess.Popen(
+            [
+                sys.executable,
+                os.path.join(REPO_DIR, "comfy_sim.py"),
+                "--port",
+                str(port),
+                "--vram-gb",
+                str(vram_gb),
+                "--time-scale",
+                "0",
+                "--output-dir",
+                str(comfy_dir / "output"),
+                "--input-dir",
+                str(comfy_dir / "input"),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        sims.append(sim)
+        server = f"http://127.0.0.1:{port}"
+        deadline = time.time() + SIM_START_SECONDS
+        while True:
+            try:
+                get_json(f"{server}/system_stats")
+                return server
+            except OSError:
+                if time.time() > deadline or sim.poll() is not None:
+                    raise
+                time.sleep(0.1)
+
+    yield start
+    for sim in sims:
+        sim.kill()
+        sim.wait()
+
+
+def cli_command(program, *args):
+    return [sys.executable, os.path.join(REPO_DIR, program), *map(str, args)]
+
+
+@pytest.fixture
+def run_cli(tmp_path):
+    def run(program, *args):
+        return subprocess.run(
+            cli_command(program, *args),
+            cwd=tmp_path,
+            capture_output=True,
+            text=True,
+            timeout=300,
+        )
+
+    return run
+
+
+@pytest.fixture
+def script_path(tmp_path):
+    return shutil.copy(TEST_SCRIPT, tmp_path / "script.json")
@@ -0,0 +1,231 @@
+import sqlite3
+import subprocess
+import time
+from contextlib import closing
+
+import pytest
+
+from conftest import cli_command, get_json
+
+import script2workflow
+from custom_nodes import script2workflow_nodes
+
+QUEUE_TIMEOUT_SECONDS = 120.0
+
+
+def prompt_node_types(server):
+    return [
+        {node["class_type"] for node in entry["prompt"][2].values()}
+        for entry in get_json(f"{server}/history").values()
+    ]
+
+
+def prompt_unet_names(server):
+    return [
+        {
+            node["inputs"]["unet_name"]
+            for node in entry["prompt"][2].values()
+            if node["class_type"] == "UnetLoaderGGUF"
+        }
+        for entry in get_json(f"{server}/history").values()
+    ]
+
+
+def test_submit(start_sim, run_cli, tmp_path, comfy_dir, script_path):
+    server = start_sim()
+    history_db = tmp_path / "history.sqlite"
+    result = run_cli(
+        "script2workflow.py",
+        script_path,
+        "--turns",
+        "1:2",
+        "--image",
+        comfy_dir / "input" / "start.png",
+        "--submit",
+        server,
+        "--comfy-dir",
+        comfy_dir,
+        "--history-db",
+        history_db,
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "finished" in result.stdout
+    outputs = sorted(path.name for path in (comfy_dir / "output").glob("*.mp4"))
+    assert "script_turn1_00001.mp4" in outputs
+    assert "script_turn2_00001.mp4" in outputs
+    # Stage timings come from the executing events on /ws
+    with closing(sqlite3.connect(history_db)) as connection:
+        stages = {
+            (turn_num, stage)
+            for turn_num, stage in connection.execute(
+                "SELECT turn, stage FROM stage_timings"
+            )
+        }
+    assert {(1, "sampling"), (2, "sampling"), (2, "decode")} <= stages
+
+
+def test_oom_retry_degrades_until_it_fits(start_sim, run_cli, comfy_dir, script_path):
+    # The samplers need 19.3 GB at full length and 17.9 GB at the shorter one
+    server = start_sim(vram_gb=18.5)
+    result = run_cli(
+        "script2workflow.py",
+        script_path,
+        "--turns",
+        "1:2",
+        "--image",
+        comfy_dir / "input" / "start.png",
+        "--submit",
+        server,
+        "--comfy-dir",
+        comfy_dir,
+        "--oom-retries",
+        "3",
+        "--no-history",
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "Turn 1 ran out of memory" in result.stdout
+    assert "turn 1 retry 2: shorter-length" in result.stdout
+    assert (comfy_dir / "output" / "script_turn2_00001.mp4").exists()
+
+
+def test_oom_retries_exhausted(start_sim, run_cli, comfy_dir, script_path):
+    server = start_sim(vram_gb=8)
+    result = run_cli(
+        "script2workflow.py",
+        script_path,
+        "--turns",
+        "1",
+        "--image",
+        comfy_dir / "input" / "start.png",
+        "--submit",
+        server,
+        "--comfy-dir",
+        comfy_dir,
+        "--oom-retries",
+        "1",
+        "--no-history",
+    )
+
+    assert result.returncode != 0
+    assert "torch.OutOfMemoryError" in result.stdout
+
+
+def test_render_queue_run(start_sim, run_cli, tmp_path, comfy_dir, script_path):
+    server = start_sim()
+    queue_db = tmp_path / "queue.sqlite"
+    added = run_cli(
+        "render_queue.py", "--queue-db", queue_db, "add", script_path, "--turns", "1:3"
+    )
+    assert added.returncode == 0, added.stdout + added.stderr
+
+    worker = subprocess.Popen(
+        cli_command(
+            "render_queue.py",
+            "--queue-db",
+            queue_db,
+            "run",
+            "--server",
+            server,
+            "--comfy-dir",
+            comfy_dir,
+            "--no-history",
+        ),
+        cwd=tmp_path,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + QUEUE_TIMEOUT_SECONDS
+        with closing(sqlite3.connect(queue_db)) as connection:
+            while time.time() < deadline:
+                (status,) = connection.execute(
+                    "SELECT status FROM submissions"
+                ).fetchone()
+                if status != "active":
+                    break
+                time.sleep(0.5)
+            jobs = connection.execute(
+                "SELECT turns, status FROM jobs ORDER BY seq"
+            ).fetchall()
+    finally:
+        worker.kill()
+        worker.wait()
+
+    assert status == "done", jobs
+    assert [job_status for _, job_status in jobs] == ["done"] * 3
+    # Each chunk after the first starts from the frame the one before handed off
+    assert len(list((comfy_dir / "output" / "handoff").glob("*.png"))) >= 2
+
+
+def test_two_server_pipeline(start_sim, run_cli, comfy_dir, script_path):
+    high_server, low_server = start_sim(), start_sim()
+    result = run_cli(
+        "script2workflow.py",
+        script_path,
+        "--turns",
+        "1:2",
+        "--image",
+        comfy_dir / "input" / "start.png",
+        "--submit",
+        high_server,
+        "--low-noise-server",
+        low_server,
+        "--comfy-dir",
+        comfy_dir,
+        "--no-history",
+    )
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    high_prompts, low_prompts = (
+        prompt_node_types(high_server),
+        prompt_node_types(low_server),
+    )
+    assert len(high_prompts) == len(low_prompts) == 2
+    # The high-noise server hands latents over and never decodes
+    assert all("SaveLatent" in types for types in high_prompts)
+    assert not any("VHS_VideoCombine" in types for types in high_prompts)
+    assert all("LoadLatent" in types for types in low_prompts)
+    # Each server only loads its own UNet
+    assert all(
+        all("HighNoise" in name for name in names)
+        for names in prompt_unet_names(high_server)
+    )
+    assert all(
+        names and all("LowNoise" in name for name in names)
+        for names in prompt_unet_names(low_server)
+    )
+    assert (comfy_dir / "output" / "script_turn2_00001.mp4").exists()
+
+
+@pytest.mark.parametrize("node_type", list(script2workflow_nodes.NODE_CLASS_MAPPINGS))
+def test_custom_node_template_matches_node(node_type):
+    node_class = script2workflow_nodes.NODE_CLASS_MAPPINGS[node_type]
+    input_types = node_class.INPUT_TYPES()
+    node_inputs = {**input_types["required"], **input_types.get("optional", {})}
+    template = script2workflow.NODE_TEMPLATES[node_type]
+
+    assert [node_input["name"] for node_input in template["inputs"]] == list(
+        node_inputs
+    )
+    assert all(
+        node_input["type"]
+        == (
+            "COMBO"
+            if isinstance(node_inputs[node_input["name"]][0], list)
+            else node_inputs[node_input["name"]][0]
+        )
+        for node_input in template["inputs"]
+    )
+    optional = [
+        node_input["name"]
+        for node_input in template["inputs"]
+        if node_input.get("shape") == 7
+    ]
+    assert optional == list(input_types.get("optional", {}))
+    assert template["outputs"][0]["type"] == node_class.RETURN_TYPES[0]
+    assert (
+        script2workflow.CONDITIONING_BATCH_INPUTS
+        == script2workflow_nodes.CONDITIONING_BATCH_INPUTS
+    )
@@ -0,0 +1,468 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from conftest import TEST_SCRIPT, write_png
+
+import script2workflow
+
+
+def latent_lengths(workflow):
+    return [
+        node["widgets_values"][2]
+        for node in workflow["nodes"]
+        if node["type"] in script2workflow.LATENT_VIDEO_NODE_TYPES
+    ]
+
+
+def test_sampled_video_length():
+    config = script2workflow.GenerationConfig(video_length=25)
+
+    assert script2workflow.interpolation_multipliers(config=config) == [1, 2, 3, 6]
+    assert script2workflow.sampled_video_length(1, config=config) == 25
+    assert script2workflow.sampled_video_length(3, config=config) == 9
+    with pytest.raises(ValueError, match="cannot restore 25 frames"):
+        script2workflow.sampled_video_length(4, config=config)
+
+
+def test_interpolation_with_config_video_length():
+    workflow = script2workflow.generate_workflow(
+        TEST_SCRIPT,
+        turns_range=script2workflow.parse_turns_range("1:2"),
+        interpolate=3,
+        config=script2workflow.GenerationConfig(video_length=25),
+    )
+
+    assert latent_lengths(workflow) == [9, 9]
+
+
+@pytest.mark.parametrize(
+    "image_path, node_keys",
+    [
+        (None, script2workflow.T2V_TURN_NODE_KEYS),
+        ("start.png", script2workflow.FIRST_TURN_I2V_NODE_KEYS),
+    ],
+)
+def test_split_pipeline_stages(tmp_path, image_path, node_keys):
+    if image_path:
+        image_path = tmp_path / image_path
+        write_png(image_path)
+    workflow = script2workflow.generate_workflow(
+        TEST_SCRIPT, turns_range=[1], image_path=image_path, save_tail_handoff=True
+    )
+    high, low = script2workflow.split_pipeline_stages(workflow, 1, node_keys, "script")
+    high_types = [node["type"] for node in high["nodes"]]
+    low_types = [node["type"] for node in low["nodes"]]
+    unet_names = {
+        stage: [
+            node["widgets_values"][0]
+            for node in stage_workflow["nodes"]
+            if node["type"] == "UnetLoaderGGUF"
+        ]
+        for stage, stage_workflow in (("high", high), ("low", low))
+    }
+
+    assert high_types.count("KSamplerAdvanced") == 1
+    assert "SaveLatent" in high_types and "VAEDecode" not in high_types
+    assert "LoadLatent" in low_types and "SaveLatent" not in low_types
+    assert [("HighNoise" in name) for name in unet_names["high"]] == [True]
+    assert [("LowNoise" in name) for name in unet_names["low"]] == [True]
+    assert low_types.count("Power Lora Loader (rgthree)") == 1
+    # The low stage's prompts encode with the CLIP loader itself
+    low_ids = {node["id"]: node for node in low["nodes"]}
+    clip_origins = {
+        low_ids[link[1]]["type"] for link in low["links"] if link[5] == "CLIP"
+    }
+    assert clip_origins == {"CLIPLoaderGGUF"}
+    # Every link stays inside its stage
+    for stage_workflow in (high, low):
+        stage_ids = {node["id"] for node in stage_workflow["nodes"]}
+        assert all(
+            link[1] in stage_ids and link[3] in stage_ids
+            for link in stage_workflow["links"]
+        )
+
+
+def script_turns(**edits):
+    with open(TEST_SCRIPT, "r", encoding="utf-8") as f:
+        turns = json.load(f)["turns"]
+    for turn_num, fields in edits.items():
+        turns[turn_num.removeprefix("turn")].update(fields)
+    return turns
+
+
+def write_script(path, turns):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"turns": turns}, f)
+    return path
+
+
+def test_clip_store_keys(tmp_path):
+    def clip_keys(turns, name):
+        workflow = script2workflow.generate_workflow(
+            write_script(tmp_path / f"{name}.json", turns),
+            turns_range=[1, 2],
+            clip_store=tmp_path / "store",
+            comfy_dir=tmp_path / "comfy",
+            # Seeds are part of the key, so they are fixed here
+            config=script2workflow.GenerationConfig(first_sampler_noise_seed=42),
+        )
+        clips = workflow["extra"]["clip_store"]["clips"]
+        return {clip["turn"]: (key, clip) for key, clip in clips.items()}
+
+    base = clip_keys(script_turns(), "script")
+    edited = clip_keys(
+        script_turns(turn2={"positive_prompt": "A different second shot."}), "script"
+    )
+    renamed = clip_keys(script_turns(), "renamed")
+
+    assert clip_keys(script_turns(), "script") == base
+    assert edited[1][0] == base[1][0] and edited[2][0] != base[2][0]
+    # The script name is metadata, not part of what gets rendered
+    assert {turn: key for turn, (key, _) in renamed.items()} == {
+        turn: key for turn, (key, _) in base.items()
+    }
+    # Turn 2 starts from turn 1's last frame, so its stored key also takes in
+    # that frame once it exists
+    assert "after_frame_node" not in base[1][1]
+    assert "after_frame_node" in base[2][1]
+    chained = script2workflow.chained_clip_key(base[2][0], "frame-a")
+    assert chained == script2workflow.chained_clip_key(base[2][0], "frame-a")
+    assert chained != script2workflow.chained_clip_key(base[2][0], "frame-b")
+
+
+def test_watch_invalidation(tmp_path):
+    old_turns = script_turns()
+    new_turns = script_turns(turn3={"positive_prompt": "A new third shot."})
+    selected_turns = [1, 2, 3, 4, 5]
+
+    changed = script2workflow.changed_turns(old_turns, new_turns)
+    assert changed == [3]
+    assert script2workflow.invalidated_turns(new_turns, selected_turns, changed) == {
+        3,
+        4,
+        5,
+    }
+    new_scene_turns = script_turns(turn5={"new_scene": True})
+    assert script2workflow.invalidated_turns(
+        new_scene_turns, selected_turns, changed
+    ) == {3, 4}
+
+    # Without a saved handoff frame, the segment reaches back to the first turn
+    assert script2workflow.watch_segments(
+        new_turns, selected_turns, {3, 4, 5}, "script", tmp_path
+    ) == [[1, 2, 3, 4, 5]]
+    handoff_dir = tmp_path / "output" / script2workflow.HANDOFF_IMAGE_DIR
+    os.makedirs(handoff_dir)
+    write_png(handoff_dir / "script_turn3_00001_.png")
+    assert script2workflow.watch_segments(
+        new_turns, selected_turns, {3, 4, 5}, "script", tmp_path
+    ) == [[3, 4, 5]]
+    assert script2workflow.watch_segments(
+        new_turns, selected_turns, {2, 3}, "script", tmp_path
+    ) == [[1, 2, 3]]
+
+
+def test_prune_turn_cache(tmp_path):
+    turn_cache = {}
+    turns = script_turns()
+    for edit in range(3):
+        turns["2"]["positive_prompt"] = f"Second shot, take {edit}."
+        script2workflow.generate_workflow(
+            write_script(tmp_path / "script.json", turns),
+            turns_range=[1, 2, 3],
+            turn_cache=turn_cache,
+        )
+        script2workflow.prune_turn_cache(turn_cache, turns)
+        assert len(turn_cache) == 3
+    del turns["3"]
+    script2workflow.prune_turn_cache(turn_cache, turns)
+
+    assert sorted(json.loads(cache_key)[0] for cache_key in turn_cache) == [1, 2]
+
+
+@pytest.mark.parametrize("vram_budget_gb", [4, 8, 12, 16])
+def test_choose_vae_decode_tiling(vram_budget_gb):
+    tiling = script2workflow.choose_vae_decode_tiling(1280, 720, 81, vram_budget_gb)
+    tile_size, overlap, temporal_size, temporal_overlap = tiling
+
+    assert tile_size in script2workflow.VAE_DECODE_TILE_SIZES
+    assert temporal_size in script2workflow.VAE_DECODE_TEMPORAL_SIZES
+    assert (
+        script2workflow.estimate_vae_decode_bytes(
+            min(1280, tile_size + 2 * overlap),
+            min(720, tile_size + 2 * overlap),
+            min(81, temporal_size + temporal_overlap),
+        )
+        <= vram_budget_gb * 1024**3 * script2workflow.VAE_DECODE_BUDGET_FRACTION
+    )
+
+
+def test_choose_vae_decode_tiling_limits():
+    assert script2workflow.choose_vae_decode_tiling(1280, 720, 81, None) is None
+    # A full decode that fits needs no tiles
+    assert script2workflow.choose_vae_decode_tiling(1280, 720, 81, 24) is None
+    assert script2workflow.choose_vae_decode_tiling(1280, 720, 81, 0.5) == [
+        script2workflow.VAE_DECODE_TILE_SIZES[-1],
+        32,
+        script2workflow.VAE_DECODE_TEMPORAL_SIZES[-1],
+        4,
+    ]
+
+
+def write_models(models_dir, sizes_gb):
+    for name, size_gb in sizes_gb.items():
+        path = models_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.truncate(int(size_gb * 1024**3))
+
+
+@pytest.mark.parametrize(
+    "vram_budget_gb, unet_quant, clip_quant",
+    [
+        (None, "F16", "F16"),
+        (24, "Q8_0", "F16"),
+        (16, "Q4_K_M", "F16"),
+        (4, "Q3_K_S", "Q4_K_M"),
+    ],
+)
+def test_resolve_model_quantization(tmp_path, vram_budget_gb, unet_quant, clip_quant):
+    unet_sizes = {"F16": 28.6, "Q8_0": 15.4, "Q4_K_M": 9.7, "Q3_K_S": 6.5}
+    sizes_gb = {
+        f"unet/wan/Wan2.2-T2V-A14B-{noise}Noise-{quant}.gguf": size_gb
+        for noise in ("High", "Low")
+        for quant, size_gb in unet_sizes.items()
+    }
+    sizes_gb.update(
+        {
+            "text_encoders/umt5-xxl-encoder-F16.gguf": 10.6,
+            "text_encoders/umt5-xxl-encoder-Q4_K_M.gguf": 3.4,
+            "loras/Wan2.2-T2V-A14B-HighNoise-Q8_0.gguf": 1.0,
+        }
+    )
+    write_models(tmp_path / "models", sizes_gb)
+    model_index = script2workflow.load_model_index(
+        tmp_path / "models", cache_path=tmp_path / "model_index.json"
+    )
+
+    resolved = script2workflow.resolve_model_quantization(
+        model_index, vram_budget_gb, 1280, 720, 81
+    )
+    config = script2workflow.DEFAULT_CONFIG
+
+    assert resolved == {
+        config.t2v_high_noise_unet: f"wan/Wan2.2-T2V-A14B-HighNoise-{unet_quant}.gguf",
+        config.t2v_low_noise_unet: f"wan/Wan2.2-T2V-A14B-LowNoise-{unet_quant}.gguf",
+        config.clip_gguf_name: f"umt5-xxl-encoder-{clip_quant}.gguf",
+    }
+
+
+def object_info_fixture():
+    with open(
+        os.path.join(os.path.dirname(__file__), "object_info.json"), encoding="utf-8"
+    ) as f:
+        return json.load(f)
+
+
+def schema_errors(workflow, object_info):
+    return [
+        error
+        for error in script2workflow.validate_node_schemas(workflow, object_info)
+        if "not available on the server" not in error
+    ]
+
+
+def test_validate_node_schemas_against_server_object_info():
+    # object_info.json is a trimmed /object_info response from a ComfyUI
+    # server with ComfyUI-GGUF and VideoHelperSuite, not built from templates
+    object_info = object_info_fixture()
+    workflow = script2workflow.generate_workflow(TEST_SCRIPT, turns_range=[1, 2])
+    assert schema_errors(workflow, object_info) == []
+
+    nodes = {node["type"]: node for node in workflow["nodes"]}
+    nodes["KSamplerAdvanced"]["widgets_values"][5] = "euler_a"
+    nodes["CLIPLoaderGGUF"]["widgets_values"] = ["umt5-xxl-encoder-Q5_K_S.gguf"]
+    nodes["EmptyHunyuanLatentVideo"]["widgets_values"][2] = 81.0
+    errors = schema_errors(workflow, object_info)
+
+    assert any(
+        "widget 'sampler_name' = 'euler_a', not one of" in error for error in errors
+    )
+    assert any("(CLIPLoaderGGUF): 1 widget values" in error for error in errors)
+    assert any("widget 'length' = 81.0, expected INT" in error for error in errors)
+
+
+@pytest.mark.parametrize("variants", [1, 3])
+def test_render_profile_upscales_each_decode(variants):
+    workflow = script2workflow.generate_workflow(
+        TEST_SCRIPT,
+        turns_range=[1],
+        variants=variants,
+        render_profile="480p-to-1080p",
+    )
+    nodes = {node["id"]: node for node in workflow["nodes"]}
+    decode_ids = {
+        node_id
+        for node_id, node in nodes.items()
+        if node["type"] in ("VAEDecode", "VAEDecodeTiled")
+    }
+    upscales = [
+        node
+        for node in nodes.values()
+        if node["type"] == "ImageUpscaleToSize (script2workflow)"
+    ]
+
+    assert [node["type"] for node in nodes.values()].count("UpscaleModelLoader") == 1
+    assert len(upscales) == len(decode_ids) == variants
+    assert all(node["widgets_values"][1:3] == [1920, 1080] for node in upscales)
+    # Nothing reads the decoded frames but the upscale nodes
+    upscale_ids = {node["id"] for node in upscales}
+    assert all(
+        link[3] in upscale_ids for link in workflow["links"] if link[1] in decode_ids
+    )
+
+
+def write_bake_registry(path, config=script2workflow.DEFAULT_CONFIG):
+    registry = {}
+    for target, (unet_field, lora_field) in script2workflow.BAKE_TARGETS.items():
+        unet_name = getattr(config, unet_field)
+        loras = script2workflow.enabled_loras(
+            script2workflow.create_multi_lora_config(getattr(config, lora_field))
+        )
+        registry[script2workflow.bake_key(unet_name, loras)] = {
+            "base": unet_name,
+            "loras": loras,
+            "model": f"baked/{target}.safetensors",
+            "installed": True,
+        }
+    script2workflow.save_bake_registry(path, registry)
+    return path
+
+
+def test_bake_workflow_needs_unquantized_unets(tmp_path):
+    registry_path = tmp_path / "baked_models.json"
+    with pytest.raises(ValueError, match="is quantized"):
+        script2workflow.generate_bake_workflow(registry_path)
+
+    config = script2workflow.GenerationConfig(
+        **{
+            unet_field: getattr(script2workflow.DEFAULT_CONFIG, unet_field).replace(
+                "Q8_0", "F16"
+            )
+            for unet_field, _ in script2workflow.BAKE_TARGETS.values()
+        }
+    )
+    workflow = script2workflow.generate_bake_workflow(registry_path, config=config)
+    registry = script2workflow.load_bake_registry(registry_path)
+
+    assert [node["type"] for node in workflow["nodes"]].count("ModelSave") == len(
+        registry
+    )
+    assert {entry["base_quant"] for entry in registry.values()} == {"F16"}
+
+
+def test_accel_profile_after_baked_models(tmp_path):
+    workflow = script2workflow.generate_workflow(
+        TEST_SCRIPT,
+        turns_range=[1],
+        bake_registry_path=write_bake_registry(tmp_path / "baked_models.json"),
+    )
+    nodes, link_defs = script2workflow.apply_accel_profile(
+        1,
+        workflow["nodes"],
+        [tuple(link[1:]) for link in workflow["links"]],
+        "sage",
+        script2workflow.VIDEO_WIDTH,
+        script2workflow.VIDEO_HEIGHT,
+    )
+    types = {node["id"]: node["type"] for node in nodes}
+
+    assert "Power Lora Loader (rgthree)" not in types.values()
+    sampler_models = [
+        types[link_def[0]]
+        for link_def in link_defs
+        if types[link_def[2]] == "KSamplerAdvanced" and link_def[4] == "MODEL"
+    ]
+    assert sampler_models == ["PathchSageAttentionKJ"] * 2
+
+
+def history_entry(workflow, prompt_id="prompt-1"):
+    # A ComfyUI history entry: no per-node durations, only status timestamps
+    return {
+        "prompt": [
+            0,
+            prompt_id,
+            script2workflow.workflow_to_api_prompt(workflow),
+            {"extra_pnginfo": {"workflow": workflow}},
+            [],
+        ],
+        "outputs": {},
+        "status": {
+            "status_str": "success",
+            "completed": True,
+            "messages": [
+                ["execution_start", {"prompt_id": prompt_id, "timestamp": 1000}],
+                ["execution_success", {"prompt_id": prompt_id, "timestamp": 4500}],
+            ],
+        },
+        "meta": {},
+    }
+
+
+def test_record_node_timing():
+    listener = {"running": {}, "seconds": {}}
+    for node_id, now in (("12", 10.0), ("13", 12.5), (None, 14.0)):
+        script2workflow.record_node_timing(
+            listener,
+            {"type": "executing", "data": {"node": node_id, "prompt_id": "p"}},
+            now=now,
+        )
+    script2workflow.record_node_timing(
+        listener, {"type": "progress", "data": {"prompt_id": "p"}}, now=20.0
+    )
+
+    assert listener == {"running": {}, "seconds": {"p": {"12": 2.5, "13": 1.5}}}
+
+
+def test_record_submission_without_sim_block(tmp_path):
+    workflow = script2workflow.generate_workflow(TEST_SCRIPT, turns_range=[1])
+    db_path = tmp_path / "history.sqlite"
+    run_id = script2workflow.record_run(db_path, "submit", TEST_SCRIPT, workflow)
+    script2workflow.record_submission(
+        db_path,
+        run_id,
+        "http://127.0.0.1:8188",
+        "prompt-1",
+        history_entry(workflow),
+        node_seconds={"12": 2.0, "13": 1.0, "15": 0.25},
+    )
+
+    with closing(sqlite3.connect(db_path)) as connection:
+        (total_seconds,) = connection.execute(
+            "SELECT total_seconds FROM submissions"
+        ).fetchone()
+        stages = dict(
+            connection.execute("SELECT stage, seconds FROM stage_timings").fetchall()
+        )
+    assert total_seconds == 3.5
+    assert stages == {"sampling": 3.0, "decode": 0.25}
+
+
+def test_prompt_metrics_without_sim_block(monkeypatch):
+    monkeypatch.setattr(script2workflow, "METRICS", {})
+    workflow = script2workflow.generate_workflow(TEST_SCRIPT, turns_range=[1])
+    script2workflow.record_prompt_metrics(
+        history_entry(workflow), node_seconds={"12": 2.0, "13": 1.0}
+    )
+
+    stage_sums = {
+        dict(labels)["role"]: value
+        for (name, labels), value in script2workflow.METRICS.items()
+        if name == "script2workflow_stage_seconds_sum"
+    }
+    assert stage_sums == {"ksampler_high": 2.0, "ksampler_low": 1.0}
+    assert script2workflow.METRICS[("script2workflow_prompt_seconds_sum", ())] == 3.5